@@ -83,3 +83,49 @@ CREATE TABLE soildata (
 	zinc_extractable FLOAT4,
 	geometry GEOMETRY
 );
+
+CREATE TABLE jobs (
+	job_id VARCHAR(36) PRIMARY KEY,
+	user_id VARCHAR(36),
+	kind VARCHAR(50) NOT NULL,
+	status VARCHAR(20) NOT NULL,
+	payload JSONB,
+	progress INT2 DEFAULT 0,
+	result_ref TEXT,
+	error TEXT,
+	created_at TIMESTAMPTZ NOT NULL,
+	started_at TIMESTAMPTZ,
+	finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX jobs_user_id_created_at_idx ON jobs (user_id, created_at DESC);
+CREATE INDEX jobs_kind_created_at_idx ON jobs (kind, created_at DESC);
+
+-- queue wait and run time per job, for capacity planning
+CREATE VIEW jobdurations AS
+SELECT
+	job_id,
+	kind,
+	status,
+	created_at,
+	started_at - created_at AS queue_wait,
+	finished_at - started_at AS run_time
+FROM jobs;
+
+-- raw Sentinel-2 observations of stored farms, appended by the scheduled refresh
+CREATE TABLE vitimeseries (
+	uuid VARCHAR(36),
+	date DATE,
+	ndvi FLOAT4,
+	ndmi FLOAT4,
+	PRIMARY KEY (uuid, date)
+);
+
+-- latest observation date (watermark) and last refresh time per farm
+CREATE TABLE farmrefreshstate (
+	uuid VARCHAR(36) PRIMARY KEY,
+	last_observation_date DATE,
+	refreshed_at TIMESTAMPTZ
+);
+
+CREATE INDEX farmrefreshstate_refreshed_at_idx ON farmrefreshstate (refreshed_at);
@@ -12,6 +12,7 @@ from flask import (
     url_for
 ) 
 from supabase import create_client
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.wrappers import Response
 
 from config_loader import init_config
@@ -19,6 +20,10 @@ from config_loader import init_config
 init_config() # noqa: E402
 
 from auth.supabase_auth import supabase_auth
+from routes.events import events_bp
+from routes.metrics import metrics_bp
+from routes.status import status_bp
+from routes.thumbnails import thumbnails_bp
 
 from src.dashboards.initial_market_data.dash0_main import init_dash0
 from src.dashboards.polygon_generator.dash1_main import init_dash1
@@ -34,6 +39,7 @@ logger = logging.getLogger(__name__)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SESSION_SECRET_KEY = os.getenv("SESSION_SECRET_KEY")
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 1)) # reverse proxies (nginx, load balancer) in front of gunicorn
 
 # Initialize Supabase client
 try:
@@ -43,6 +49,12 @@ except Exception as e:
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = SESSION_SECRET_KEY
+# `request.remote_addr` is the client address appended by our own proxies, never a client-supplied X-Forwarded-For entry
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+app.register_blueprint(events_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(status_bp)
+app.register_blueprint(thumbnails_bp)
 
 @app.route("/login", methods=["POST"])
 def login() -> Response:
@@ -9,4 +9,6 @@ bind = f"0.0.0.0:{port}"
 timeout = 600
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "gthread"
+# Each open job event stream (/events/jobs) holds a thread for its lifetime
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
 preload_app = True
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Soil-fetch throughput benchmark for `services.isda_soil_data`.
+
+Starts the local iSDA stand-in (`scripts/isda_stub_server.py`) in a background
+thread and drives `main()` with batches of random polygons in Kenya. For each
+batch size it reports throughput, p50/p99 request latency and the number of
+connections opened. The soil cache is bypassed so every cell hits the stub.
+
+    python scripts/benchmark_isda.py --sizes 1 10 100 1000 --latency 0.05
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+from isda_stub_server import StubConfig, create_app # noqa: E402
+from services.isda_soil_data import SAMPLING_MODE, IsdaClient, main # noqa: E402
+
+KENYA_BOUNDS = (34.0, -4.5, 41.5, 4.5) # lon_min, lat_min, lon_max, lat_max
+
+def random_polygons(n: int, seed: int = 0) -> pd.DataFrame:
+    # Random squares of roughly 5-50 acres scattered across Kenya
+    rng = np.random.default_rng(seed)
+    lon_min, lat_min, lon_max, lat_max = KENYA_BOUNDS
+    lons = rng.uniform(lon_min, lon_max, n)
+    lats = rng.uniform(lat_min, lat_max, n)
+    sides = rng.uniform(0.0013, 0.0041, n) # degrees
+
+    geometries = [
+        f"POLYGON(({x} {y}, {x + d} {y}, {x + d} {y + d}, {x} {y + d}, {x} {y}))"
+        for x, y, d in zip(lons, lats, sides)
+    ]
+
+    return pd.DataFrame({"uuid": [f"bench-{i}" for i in range(n)], "geometry": geometries})
+
+def start_stub(config: StubConfig, host: str, port: int) -> None:
+    # Runs the stub server on its own event loop so it does not compete with the client
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    async def serve() -> None:
+        runner = web.AppRunner(create_app(config), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        started.set()
+
+    def run() -> None:
+        loop.run_until_complete(serve())
+        loop.run_forever()
+
+    threading.Thread(target=run, name="isda-stub", daemon=True).start()
+    started.wait(timeout=10)
+
+def make_trace_config(metrics: SimpleNamespace) -> aiohttp.TraceConfig:
+    # Collects per-request latency and the number of connections opened by the client
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params) -> None:
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params) -> None:
+        if params.url.path.endswith("/soilproperty"):
+            metrics.latencies.append(time.perf_counter() - context.start)
+
+    async def on_connection_create_end(session, context, params) -> None:
+        metrics.connections += 1
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+
+    return trace_config
+
+async def run_batch(df: pd.DataFrame, base_url: str, max_concurrency: int, sampling: str) -> SimpleNamespace:
+    metrics = SimpleNamespace(latencies=[], connections=0)
+    client = IsdaClient(
+        "bench",
+        "bench",
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        trace_configs=[make_trace_config(metrics)]
+    )
+
+    start = time.perf_counter()
+    try:
+        await main(df, client=client, use_cache=False, sampling=sampling)
+    finally:
+        await client.close()
+    metrics.elapsed = time.perf_counter() - start
+
+    return metrics
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark iSDA soil-fetch throughput against a local stand-in.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--sampling", choices=["centroid", "area"], default=SAMPLING_MODE)
+
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    host = "127.0.0.1"
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit
+    )
+    start_stub(config, host, args.port)
+
+    header = f"{'polygons':>9} {'requests':>9} {'elapsed s':>10} {'req/s':>9} {'poly/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'conns':>6}"
+    print(header)
+    print("-" * len(header))
+
+    for size in args.sizes:
+        df = random_polygons(size)
+        metrics = asyncio.run(run_batch(df, f"http://{host}:{args.port}", args.max_concurrency, args.sampling))
+        latencies_ms = np.array(metrics.latencies) * 1000
+
+        print(
+            f"{size:>9} {len(latencies_ms):>9} {metrics.elapsed:>10.2f} "
+            f"{len(latencies_ms) / metrics.elapsed:>9.1f} {size / metrics.elapsed:>9.1f} "
+            f"{np.percentile(latencies_ms, 50):>8.1f} {np.percentile(latencies_ms, 99):>8.1f} "
+            f"{metrics.connections:>6}"
+        )
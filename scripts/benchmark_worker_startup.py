@@ -0,0 +1,104 @@
+"""
+Cold-task latency benchmark for the Celery worker warm start.
+
+Each run starts a fresh interpreter, imports `regen_queue.tasks` as a worker
+does at boot and times the first and second executions of the VI processing
+stage (cleaning and farm statistics on synthetic series). In the `warm` mode
+the interpreter first runs the warm-up done by the `regen_queue.worker` hooks,
+whose duration is reported as startup cost; the `cold` mode is the behaviour
+without them.
+
+    python scripts/benchmark_worker_startup.py --runs 5 --polygons 5
+    python scripts/benchmark_worker_startup.py --with-ee  # also time Earth Engine authentication
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+def run_child(mode: str, polygons: int, with_ee: bool) -> dict:
+    # Runs inside a fresh interpreter so that every import and initialization is cold
+    sys.path.insert(0, str(ROOT_DIR / "src"))
+
+    start = time.perf_counter()
+    import pandas as pd
+    from analytics.farm_stats import FarmDataProcessor, FarmStatsCalculator
+    from regen_queue import tasks # noqa: F401
+    from regen_queue.worker import synthetic_timeseries, warm_up_preprocessing, warm_up_worker
+    from services.earth_engine_timeseries import clean_vi_timeseries, initialize_ee, label_timeseries
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if mode == "warm" and with_ee:
+        warm_up_worker()
+    elif mode == "warm":
+        warm_up_preprocessing()
+    warm_up_seconds = time.perf_counter() - start
+
+    def task() -> None:
+        if with_ee:
+            initialize_ee()
+
+        frames = [
+            label_timeseries(clean_vi_timeseries(synthetic_timeseries()), {"uuid": f"bench-{i}", "region": "Kenya"})
+            for i in range(polygons)
+        ]
+        FarmStatsCalculator(FarmDataProcessor()).calculate_stats(pd.concat(frames, ignore_index=True))
+
+    latencies = []
+    for _ in range(2):
+        start = time.perf_counter()
+        task()
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "import": import_seconds,
+        "warm_up": warm_up_seconds,
+        "first": latencies[0],
+        "second": latencies[1],
+    }
+
+def run_mode(mode: str, polygons: int, with_ee: bool) -> dict:
+    command = [sys.executable, __file__, "--child", mode, "--polygons", str(polygons)]
+    if with_ee:
+        command.append("--with-ee")
+
+    env = {**os.environ, "DISABLE_PANDERA_IMPORT_WARNING": "True"}
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark cold-task latency with and without the worker warm start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--polygons", type=int, default=5)
+    parser.add_argument("--with-ee", action="store_true", help="include Earth Engine authentication (needs credentials)")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.polygons, args.with_ee)))
+        sys.exit(0)
+
+    header = f"{'mode':>5} {'import s':>9} {'warm-up s':>10} {'1st task ms':>12} {'2nd task ms':>12}"
+    print(header)
+    print("-" * len(header))
+
+    for mode in ("cold", "warm"):
+        results = [run_mode(mode, args.polygons, args.with_ee) for _ in range(args.runs)]
+        median = {key: statistics.median(result[key] for result in results) for key in results[0]}
+
+        print(
+            f"{mode:>5} {median['import']:>9.2f} {median['warm_up']:>10.2f} "
+            f"{median['first'] * 1000:>12.1f} {median['second'] * 1000:>12.1f}"
+        )
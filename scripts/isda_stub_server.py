@@ -0,0 +1,166 @@
+"""
+Local stand-in for the iSDA soil API, used for benchmarking `isda_soil_data`
+without the real service or its credentials.
+
+Implements `POST /login` and `GET /isdasoil/v2/soilproperty` with configurable
+latency, error rate and rate limiting, plus `GET /_stats` and `POST /_reset`
+for the benchmark. Run with
+
+    python scripts/isda_stub_server.py --port 8765 --latency 0.05 --rate-limit 200
+
+and point the app at it with `ISDA_BASE_URL=http://127.0.0.1:8765`.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+TEXTURE_CLASSES = ["Clay", "Clay Loam", "Loam", "Sandy Clay Loam", "Sandy Loam"]
+
+@dataclass
+class StubConfig:
+    latency: float = 0.05 # mean response latency in seconds
+    jitter: float = 0.02 # uniform +/- jitter around the mean latency
+    error_rate: float = 0.0 # fraction of requests answered with HTTP 503
+    rate_limit: float = 0.0 # requests per second before HTTP 429; 0 disables
+    token_ttl: int = 3600 # lifetime of issued access tokens in seconds
+
+@dataclass
+class StubStats:
+    logins: int = 0
+    requests: int = 0
+    errors: int = 0
+    throttled: int = 0
+    unauthorized: int = 0
+    transports: set = field(default_factory=set)
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "logins": self.logins,
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "unauthorized": self.unauthorized,
+            "connections": len(self.transports),
+        }
+
+class TokenBucket:
+    # Simple token bucket used to emulate the upstream rate limit
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+def _make_token(ttl: int) -> str:
+    # Unsigned JWT-shaped token so the client can read the `exp` claim
+    def encode(obj: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time()) + ttl})}.stub"
+
+def create_app(config: StubConfig) -> web.Application:
+    stats = StubStats()
+    bucket = TokenBucket(config.rate_limit) if config.rate_limit > 0 else None
+    issued_tokens: set[str] = set()
+
+    async def respond_later() -> None:
+        delay = config.latency + random.uniform(-config.jitter, config.jitter)
+        await asyncio.sleep(max(delay, 0.0))
+
+    async def login(request: web.Request) -> web.Response:
+        stats.transports.add(request.transport)
+        stats.logins += 1
+        await respond_later()
+
+        token = _make_token(config.token_ttl)
+        issued_tokens.add(token)
+
+        return web.json_response({"access_token": token, "token_type": "bearer"})
+
+    async def soil_property(request: web.Request) -> web.Response:
+        stats.transports.add(request.transport)
+        stats.requests += 1
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in issued_tokens:
+            stats.unauthorized += 1
+            return web.json_response({"detail": "Not authenticated"}, status=401)
+
+        if bucket and not bucket.try_acquire():
+            stats.throttled += 1
+            return web.json_response({"detail": "Too many requests"}, status=429, headers={"Retry-After": "1"})
+
+        await respond_later()
+
+        if random.random() < config.error_rate:
+            stats.errors += 1
+            return web.json_response({"detail": "Service unavailable"}, status=503)
+
+        prop = request.query.get("property", "")
+        lat = float(request.query.get("lat", 0))
+        lon = float(request.query.get("lon", 0))
+
+        # Deterministic per location so repeated lookups agree
+        rng = random.Random(f"{prop}:{lat:.5f}:{lon:.5f}")
+        value = rng.choice(TEXTURE_CLASSES) if prop == "texture_class" else round(rng.uniform(0, 100), 2)
+
+        return web.json_response({
+            "property": {
+                prop: [{
+                    "value": {"type": "mean", "unit": None, "value": value},
+                    "depth": {"value": request.query.get("depth", "0-20"), "unit": "cm"}
+                }]
+            }
+        })
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats.as_dict())
+
+    async def reset_stats(request: web.Request) -> web.Response:
+        nonlocal stats
+        stats = StubStats()
+        return web.json_response({"reset": True})
+
+    app = web.Application()
+    app.router.add_post("/login", login)
+    app.router.add_get("/isdasoil/v2/soilproperty", soil_property)
+    app.router.add_get("/_stats", get_stats)
+    app.router.add_post("/_reset", reset_stats)
+
+    return app
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Local stand-in for the iSDA soil API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=StubConfig.latency)
+    parser.add_argument("--jitter", type=float, default=StubConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--rate-limit", type=float, default=StubConfig.rate_limit)
+
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = StubConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit
+    )
+    web.run_app(create_app(config), host=args.host, port=args.port)
@@ -4,15 +4,23 @@ from uuid import uuid4
 from dash import Input, Output, State, ctx
 from dash.exceptions import PreventUpdate
 
+from services.earth_engine_images import snap_to_acquisition
+
 def register(app):
     @app.callback(
         Output("clicked_point_store", "data"),
         Input("ndvi_plot", "clickData"),
         Input("ndmi_plot", "clickData"),
         State("geometry_map_store", "data"),
+        State("acquisition_dates_store", "data"),
         prevent_initial_call=True,
     )
-    def run(click_data_ndvi: Optional[dict], click_data_ndmi: Optional[dict], geometry_map: dict[str, str]) -> dict[str, Any]:
+    def run(
+            click_data_ndvi: Optional[dict],
+            click_data_ndmi: Optional[dict],
+            geometry_map: dict[str, str],
+            acquisition_dates: Optional[dict[str, list[str]]]
+    ) -> dict[str, Any]:
         """
         This function retrieves data from `click events` occurring on the NDVI/NDMI plots
         to be used for generating Sentinel-2 raster images on specific dates.
@@ -20,6 +28,7 @@ def register(app):
         Args: (i) ndvi_plot - data from NDVI time-series plot
               (ii) ndmi_plot - data from NDMI time-series plot
               (iii) geometry_map_store - a dictionary mapping uuid to geometry wkt
+              (iv) acquisition_dates_store - a dictionary mapping uuid to its acquisition dates
 
         Returns: a dictionary-valued `click data` object stored in dcc.Store
         """
@@ -41,6 +50,9 @@ def register(app):
 
         clicked_wkt = geometry_map[clicked_uuid]
 
+        # Snap the click to the nearest real acquisition of this polygon
+        clicked_date = snap_to_acquisition((acquisition_dates or {}).get(clicked_uuid, []), clicked_date) or clicked_date
+
         return {
             "clicked_uuid": clicked_uuid,
             "clicked_wkt": clicked_wkt,
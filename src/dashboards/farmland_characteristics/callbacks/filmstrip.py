@@ -0,0 +1,154 @@
+from typing import Any, Optional
+
+from celery.result import AsyncResult
+from dash import Input, Output, State, dash
+from dash.exceptions import PreventUpdate
+from flask import request, session
+
+from regen_queue.admission import AdmissionRejected, admit_render, client_weight
+from regen_queue.celery_app import celery_app
+from regen_queue.tasks import enqueue_rgb_filmstrip
+from services.earth_engine_images import filmstrip_dates
+from services.thumbnail_cache import filmstrip_metadata
+
+def season_dates(
+        clicked_uuid: str,
+        farm_stats: Optional[dict[str, Any]],
+        acquisition_dates: Optional[dict[str, list[str]]]
+) -> list[str]:
+    """
+    This function returns the filmstrip dates of a polygon: its NDVI peaks
+    snapped to real acquisitions, or its full acquisition index when no peaks
+    were found.
+    """
+    acquisitions = (acquisition_dates or {}).get(clicked_uuid, [])
+    peak_dates = [
+        str(peak["ndvi_peak_date"])[:10]
+        for peak in (farm_stats or {}).get("df_ndvipeaksperfarm", [])
+        if peak["uuid"] == clicked_uuid and peak["ndvi_peak_date"]
+    ]
+
+    if not peak_dates:
+        return filmstrip_dates(acquisitions)
+
+    return filmstrip_dates(peak_dates, acquisitions)
+
+def register(app):
+    @app.callback(
+        Output("filmstrip_task_store", "data"),
+        Output("filmstrip_store", "data"),
+        Output("filmstrip_poll", "disabled"),
+        Output("filmstrip_status", "children"),
+        Input("filmstrip_button", "n_clicks"),
+        State("clicked_point_store", "data"),
+        State("farm_stats", "data"),
+        State("acquisition_dates_store", "data"),
+        prevent_initial_call=True
+    )
+    def request_filmstrip(
+            n_clicks: int,
+            clicked_data: Optional[dict],
+            farm_stats: Optional[dict[str, Any]],
+            acquisition_dates: Optional[dict[str, list[str]]]
+    ) -> tuple[Optional[dict], Optional[dict], bool, str]:
+        """
+        This function requests the season filmstrip of the clicked polygon. All
+        frames are rendered by one task, so paging through them afterwards needs
+        no further requests.
+        """
+        if not n_clicks or not clicked_data:
+            raise PreventUpdate
+
+        wkt = clicked_data["clicked_wkt"]
+        dates = season_dates(clicked_data["clicked_uuid"], farm_stats, acquisition_dates)
+
+        if not dates:
+            return None, None, True, "No acquisitions available for this polygon."
+
+        user_id = session.get("user_id")
+        try:
+            admit_render(user_id or request.remote_addr or "anonymous", client_weight(user_id))
+        except AdmissionRejected as e:
+            return None, None, True, f"❌ {e}"
+
+        key, dates, task_id = enqueue_rgb_filmstrip(wkt, dates)
+
+        if key is not None:
+            return None, filmstrip_metadata(key, dates), True, ""
+
+        return {"task_id": task_id}, None, False, f"Rendering {len(dates)} frames..."
+
+    @app.callback(
+        Output("filmstrip_store", "data", allow_duplicate=True),
+        Output("filmstrip_poll", "disabled", allow_duplicate=True),
+        Output("filmstrip_status", "children", allow_duplicate=True),
+        Input("filmstrip_poll", "n_intervals"),
+        State("filmstrip_task_store", "data"),
+        prevent_initial_call=True
+    )
+    def poll_filmstrip_task(n_intervals: int, task_data: Optional[dict]) -> tuple[Optional[dict], bool, str]:
+        # Polls the filmstrip render task
+        if not task_data:
+            raise PreventUpdate
+
+        result = AsyncResult(task_data["task_id"], app=celery_app)
+
+        if not result.ready():
+            return dash.no_update, False, dash.no_update
+
+        if result.failed() or result.result.get("key") is None:
+            return None, True, "❌ No satellite images available for these dates."
+
+        return filmstrip_metadata(result.result["key"], result.result["dates"]), True, ""
+
+    @app.callback(
+        Output("filmstrip_store", "data", allow_duplicate=True),
+        Output("filmstrip_task_store", "data", allow_duplicate=True),
+        Output("filmstrip_poll", "disabled", allow_duplicate=True),
+        Output("filmstrip_status", "children", allow_duplicate=True),
+        Input("clicked_point_store", "data"),
+        prevent_initial_call=True
+    )
+    def reset_filmstrip(clicked_data: Optional[dict]) -> tuple[None, None, bool, str]:
+        # A new click may belong to another polygon
+        return None, None, True, ""
+
+    @app.callback(
+        Output("filmstrip_slider", "max"),
+        Output("filmstrip_slider", "value"),
+        Input("filmstrip_store", "data"),
+        prevent_initial_call=True
+    )
+    def reset_filmstrip_slider(filmstrip: Optional[dict]) -> tuple[int, int]:
+        return max((filmstrip or {}).get("frames", 1) - 1, 0), 0
+
+    # Paging happens in the browser by offsetting into the already loaded strip
+    app.clientside_callback(
+        """
+        function(index, filmstrip) {
+            if (!filmstrip || !filmstrip.frames) {
+                return [{"display": "none"}, ""];
+            }
+            const frames = filmstrip.frames;
+            const position = frames > 1 ? (100 * index) / (frames - 1) : 0;
+            const aspect = filmstrip.frame_width && filmstrip.frame_height
+                ? filmstrip.frame_width + " / " + filmstrip.frame_height
+                : "1 / 1";
+            return [
+                {
+                    "width": "100%",
+                    "aspectRatio": aspect,
+                    "backgroundImage": "url(" + filmstrip.url + ")",
+                    "backgroundSize": "100% " + (100 * frames) + "%",
+                    "backgroundPosition": "0 " + position + "%",
+                    "backgroundRepeat": "no-repeat"
+                },
+                "Frame " + (index + 1) + " of " + frames + ": " + filmstrip.dates[index]
+            ];
+        }
+        """,
+        Output("filmstrip_frame", "style"),
+        Output("filmstrip_date", "children"),
+        Input("filmstrip_slider", "value"),
+        Input("filmstrip_store", "data")
+    )
@@ -6,7 +6,9 @@ from dash import Input, Output, State
 
 from auth.supabase_auth import get_supabase_client
 from config import USE_LOCAL_DB, LOCAL_DB_CONFIG
-from db.db_utils import db_connect
+from db.db_client import local_db_connection
+from regen_queue.tasks import enqueue_choropleth_rebuild
+from services.region_cache import bump_table_versions
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,10 @@ if USE_LOCAL_DB:
 else:
     logger.info("Running in SUPABASE mode.")
 
+def farm_uuids(stored_data: dict[str, list[dict[str, Any]]], tables: list[str]) -> list[str]:
+    # Farms with rows in any of the inserted tables
+    return list({row["uuid"] for table in tables for row in stored_data.get(f"df_{table}") or []})
+
 def register(app):
     @app.callback(
         Output("insert_farm_stats_notification", "children"),
@@ -51,11 +57,9 @@ def register(app):
         try:
 
             if USE_LOCAL_DB:
-                conn = db_connect()
-
                 # ====== Local PostgreSQL mode ====== #
 
-                with conn.cursor() as cursor:
+                with local_db_connection() as conn, conn.cursor() as cursor:
                     for TABLE in tables:
                         dataset = stored_data[f"df_{TABLE}"]
 
@@ -80,6 +84,10 @@ def register(app):
 
                         messages.append(f"✅ {TABLE}: Inserted {len(dataset)} rows (Local DB).")
 
+                    conn.commit()
+
+                bump_table_versions(*tables)
+                enqueue_choropleth_rebuild(farm_uuids(stored_data, tables), tables)
                 return " | ".join(messages), "success", True
 
             else:
@@ -103,6 +111,8 @@ def register(app):
                             )
 
                 if messages:
+                    bump_table_versions(*tables)
+                    enqueue_choropleth_rebuild(farm_uuids(stored_data, tables), tables)
                     return " | ".join(messages), "success", True
                 else:
                     return "⚠️ No data to insert.", "warning", True
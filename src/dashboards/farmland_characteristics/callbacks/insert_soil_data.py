@@ -7,7 +7,9 @@ from dash import Input, Output, State
 
 from auth.supabase_auth import get_supabase_client
 from config import USE_LOCAL_DB, LOCAL_DB_CONFIG
-from db.db_utils import db_connect
+from db.db_client import local_db_connection
+from regen_queue.tasks import enqueue_choropleth_rebuild
+from services.region_cache import bump_table_versions
 
 logger = logging.getLogger(__name__)
 
@@ -66,8 +68,7 @@ def register(app):
 
                 # ====== Local PostgreSQL mode ====== #
 
-                conn = db_connect()
-                with conn.cursor() as cursor:
+                with local_db_connection() as conn, conn.cursor() as cursor:
                     dataset = stored_data
 
                     logging.info(f"Processing {table_name}: {type(dataset)} -> {dataset[:2] if dataset else 'Empty'}")
@@ -93,6 +94,10 @@ def register(app):
                         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
                         cursor.execute(query, values)
 
+                    conn.commit()
+
+                bump_table_versions(table_name)
+                enqueue_choropleth_rebuild([row["uuid"] for row in stored_data], [table_name])
                 return f"✅ {table_name}: Inserted {len(dataset)} rows (Local DB).", "success", True
             else:
 
@@ -115,6 +120,8 @@ def register(app):
                 response = client.table(table_name).insert(dataset).execute()
 
                 if response.data:
+                    bump_table_versions(table_name)
+                    enqueue_choropleth_rebuild([row["uuid"] for row in dataset], [table_name])
                     return f"Inserted {len(response.data)} polygons successfully.", "success", True
                 else:
                     return f"Insert failed: {response.error if hasattr(response, 'error') else 'Unknown error'}", "danger", True
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from typing import Any, Optional
 from uuid import uuid4
@@ -6,16 +5,20 @@ from uuid import uuid4
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from aiohttp import ClientError
 from celery.result import AsyncResult
 from dash import Input, Output, State, ctx, no_update
 from dash.exceptions import PreventUpdate
+from flask import request, session
 from plotly.graph_objects import Figure
 
+from regen_queue.admission import AdmissionRejected
 from regen_queue.celery_app import celery_app
-from regen_queue.tasks import fetch_timeseries
-from utils.farm_stats import FarmDataProcessor, FarmStatsCalculator
-from utils.isda_soil_data import main as get_soil_data
+from regen_queue.dedupe import submit_vi_request
+from regen_queue.jobs import FAILED, SUCCEEDED, get_job_status
+from regen_queue.tasks import prefetch_thumbnails
+from analytics.farm_stats import FarmDataProcessor, FarmStatsCalculator
+from services.result_store import read_result
+from utils.geometry import canonical_wkts, valid_polygon_mask, wkt_to_geometries
 from utils.parse_contents import parse_contents
 
 OutputType = tuple[
@@ -24,8 +27,9 @@ OutputType = tuple[
     dict[str, Any],
     dict[str, Any],
     Optional[str],
-    list[dict[str, Any]],
+    dict[str, str],
     dict[str, Any],
+    dict[str, list[str]],
 ]
 
 def build_vi_figures(df: pd.DataFrame) -> tuple[go.Figure, go.Figure, dict[str, str]]:
@@ -34,16 +38,13 @@ def build_vi_figures(df: pd.DataFrame) -> tuple[go.Figure, go.Figure, dict[str,
     fig_ndvi = go.Figure()
     fig_ndmi = go.Figure()
 
-    geometry_map = {row["uuid"]: row["geometry"] for _, row in df.iterrows()}
+    geometry_map = dict(zip(df["uuid"], df["geometry"]))
 
     for uuid in uuid_list:
         df_uuid = df[df["uuid"] == uuid]
         label = uuid[0:8]
 
-        customdata = np.array([
-            [row["uuid"], row["region"]]
-            for _, row in df_uuid.iterrows()
-        ])
+        customdata = df_uuid[["uuid", "region"]].to_numpy()
 
         fig_ndvi.add_trace(
             go.Scatter(
@@ -94,11 +95,45 @@ def build_vi_figures(df: pd.DataFrame) -> tuple[go.Figure, go.Figure, dict[str,
 
     return fig_ndvi, fig_ndmi, geometry_map
 
+def align_to_roi(
+        df: pd.DataFrame,
+        acquisition_dates: dict[str, list[str]],
+        soil_records: list[dict[str, Any]],
+        df_roi: pd.DataFrame
+) -> tuple[pd.DataFrame, dict[str, list[str]], list[dict[str, Any]]]:
+    """
+    This function maps the results of a reused submission onto the submitted
+    polygons. Results carry the uuids of the request that created them, so they
+    are matched to the submitted rows by canonical geometry and relabelled with
+    the submitter's uuid, region and area.
+    """
+    result_geometries = df.groupby("uuid", sort=False)["geometry"].first()
+    roi_uuids = dict(zip(canonical_wkts(df_roi["geometry"].astype(str)), df_roi["uuid"]))
+    uuid_map = {
+        result_uuid: roi_uuids[key]
+        for result_uuid, key in zip(result_geometries.index, canonical_wkts(result_geometries))
+        if key in roi_uuids
+    }
+
+    df = df.assign(uuid=df["uuid"].map(uuid_map))
+    roi_by_uuid = df_roi.set_index("uuid")
+    for col in ("region", "area (acres)", "geometry"):
+        if col in roi_by_uuid.columns:
+            df[col] = df["uuid"].map(roi_by_uuid[col])
+
+    acquisition_dates = {uuid_map[uuid]: dates for uuid, dates in acquisition_dates.items() if uuid in uuid_map}
+    soil_records = [
+        {**record, "uuid": uuid_map[record["uuid"]]}
+        for record in soil_records
+        if record["uuid"] in uuid_map
+    ]
+
+    return df, acquisition_dates, soil_records
+
 def register(app):
     @app.callback(
         Output("vi_task_store", "data"),
         Output("vi_roi_store", "data"),
-        Output("vi_task_poll", "disabled"),
         Output("vi_task_status", "children"),
         Input("upload_button", "n_clicks"),
         Input("upload-data", "contents"),
@@ -113,9 +148,12 @@ def register(app):
             file_name: Optional[str],
             polygon_wkt: Optional[str],
             is_valid: bool
-    ) -> tuple[dict[str, int], dict[str, Any], bool, str]:
+    ) -> tuple[dict[str, int], dict[str, Any], str]:
         """
-        Callback that enqueues time-series retrieval tasks to Celery.
+        Callback that enqueues time-series and soil data retrieval tasks to Celery.
+        Both tasks run in parallel on the workers. Submissions pass admission
+        control first, which may refuse them (too many requests in progress,
+        server busy) or report an estimated wait.
 
         Args:
             n_clicks (int): clicks on the submit button
@@ -125,9 +163,8 @@ def register(app):
             is_valid (bool): check for WKT validity
 
         Returns:
-            dict[str, int]: a dictionary containing task_id
+            dict[str, int]: a dictionary containing the VI and soil task and job ids
             dict[str, Any]: input dataframe in dictionary format
-            bool: task polling status
             str: task status information
         """
         trigger = ctx.triggered_id
@@ -146,53 +183,135 @@ def register(app):
         elif trigger == "upload-data":
             df_roi = parse_contents(file_contents, file_name)
 
+            # Validate all uploaded geometries in one vectorized pass
+            geometries = wkt_to_geometries(df_roi["geometry"].astype(str), on_invalid="ignore")
+            is_valid_polygon = valid_polygon_mask(geometries)
+
+            if not is_valid_polygon.any():
+                return no_update, no_update, "❌ No valid POLYGON geometries found in the uploaded file."
+            if not is_valid_polygon.all():
+                logging.warning("Dropping %d invalid geometries from upload.", (~is_valid_polygon).sum())
+                df_roi = df_roi[is_valid_polygon].reset_index(drop=True)
+
         else:
             raise PreventUpdate
 
-        # Enqueue task to Celery app; can return task_id and status
-        task = fetch_timeseries.delay(df_roi.to_dict("records"))
+        # Polygons without a uuid get one here so results can be matched back to the upload
+        if "uuid" not in df_roi.columns:
+            df_roi["uuid"] = None
+        missing_uuid = df_roi["uuid"].isna()
+        df_roi.loc[missing_uuid, "uuid"] = [str(uuid4()) for _ in range(missing_uuid.sum())]
+
+        # Each task is tracked as a job; identical recent submissions reuse the same jobs
+        roi_records = df_roi.to_dict("records")
+
+        try:
+            submission = submit_vi_request(
+                roi_records,
+                user_id=session.get("user_id"),
+                client=request.remote_addr # resolved by ProxyFix from the trusted proxy hops
+            )
+        except AdmissionRejected as e:
+            return no_update, no_update, f"⏳ {e}"
+        except ValueError as e:
+            # Rejected by `validate_roi_dataframe` before anything was enqueued
+            return no_update, no_update, f"❌ {e}"
+        except Exception as e:
+            logging.error("Failed to submit VI request: %s", e)
+            return no_update, no_update, "❌ Could not submit the request, please try again."
+
+        status = "Fetching NDVI and NDMI data..."
+        if submission.estimated_wait:
+            status = f"Queued, estimated wait {submission.estimated_wait} min..."
 
         return (
-            {"task_id": task.id},
-            df_roi.to_dict("records"),
-            False,
-            "Fetching NDVI and NDMI data..."
+            submission.as_dict(),
+            roi_records,
+            status
         )
 
+    # Job status is pushed over Server-Sent Events; the page opens one stream per submission
+    app.clientside_callback(
+        """
+        function(taskData) {
+            if (window.viJobEvents) {
+                window.viJobEvents.close();
+                window.viJobEvents = null;
+            }
+            if (!taskData || !taskData.job_id) {
+                return window.dash_clientside.no_update;
+            }
+
+            const label = (job) => !job || job.status === "queued" ? "queued" : (job.progress || 0) + "%";
+            const jobs = {};
+            const source = new EventSource(
+                "/events/jobs?ids=" + taskData.job_id + "," + taskData.soil_job_id
+            );
+            window.viJobEvents = source;
+
+            source.addEventListener("job", (event) => {
+                const job = JSON.parse(event.data);
+                jobs[job.job_id] = job;
+                window.dash_clientside.set_props("vi_task_status", {
+                    children: "Fetching vegetation and moisture data... " + label(jobs[taskData.job_id])
+                        + " | Soil data... " + label(jobs[taskData.soil_job_id])
+                });
+            });
+            source.addEventListener("done", () => {
+                source.close();
+                window.viJobEvents = null;
+                window.dash_clientside.set_props("vi_jobs_done_store", {data: {...taskData, finished_at: Date.now()}});
+            });
+
+            return window.dash_clientside.no_update;
+        }
+        """,
+        Output("vi_jobs_done_store", "data"),
+        Input("vi_task_store", "data"),
+        prevent_initial_call=True
+    )
+
     @app.callback(
         Output("vi_result_store", "data"),
-        Output("vi_task_poll", "disabled", allow_duplicate=True),
         Output("vi_task_status", "children", allow_duplicate=True),
-        Input("vi_task_poll", "n_intervals"),
-        State("vi_task_store", "data"),
+        Input("vi_jobs_done_store", "data"),
         prevent_initial_call=True,
     )
-    def poll_vi_task(n_intervals, task_data) -> tuple[list[dict[str, Any]] | Any, bool, str]:
+    def collect_vi_results(task_data) -> tuple[dict[str, Any] | Any, str]:
         """
-        Callback for polling task status.
+        Callback collecting task results once the event stream reports that both
+        jobs have finished.
 
         Args:
-            n_intervals (int): polling interval
-            task_data (dict[str, Any]): input dataframe in dictionary format generated from data upload
+            task_data (dict[str, Any]): task and job ids of the finished submission
 
         Returns:
-            list[dict[str, Any]] | Any: update depending on polling status
-            bool: polling status
+            dict[str, Any] | Any: VI result reference and acquisition dates merged with the soil data
             str: task status message
         """
         if not task_data:
             raise PreventUpdate
 
-        # Poll task metadata
-        result = AsyncResult(task_data["task_id"], app=celery_app)
+        job = get_job_status(task_data["job_id"]) or {}
+        soil_job = get_job_status(task_data["soil_job_id"]) or {}
 
-        if result.state in {"PENDING", "RECEIVED", "STARTED", "RETRY"}:
-            return no_update, False, f"Fetching vegetation and moisture data... {result.state.lower()}"
+        if job.get("status") != SUCCEEDED:
+            return no_update, "Vegetation and moisture data failed to load."
 
-        if result.failed():
-            return no_update, True, "Vegetation and moisture data failed to load."
+        result = AsyncResult(task_data["task_id"], app=celery_app)
+        soil_result = AsyncResult(task_data["soil_task_id"], app=celery_app)
 
-        return result.result, True, "Vegetation and moisture data loaded."
+        # A soil failure does not block the VI results
+        if soil_job.get("status") == FAILED or soil_result.failed():
+            logging.error("Failed to retrieve iSDA soil data: %s", soil_job.get("error"))
+            soil_records = []
+        else:
+            soil_records = soil_result.result
+
+        return (
+            {**result.result, "soil": soil_records, "reused": task_data.get("reused", False)},
+            "Vegetation and moisture data loaded."
+        )
 
     @app.callback(
         Output("ndvi_plot", "figure"),
@@ -202,16 +321,17 @@ def register(app):
         Output("polygon_wkt_store", "data"),
         Output("ndvi_timeseries", "data"),
         Output("geometry_map_store", "data"),
+        Output("acquisition_dates_store", "data"),
         Input("vi_result_store", "data"),
         State("vi_roi_store", "data"),
         prevent_initial_call=True,
     )
-    def process_vi_result(df_records, roi_records) -> OutputType:
+    def process_vi_result(task_results, roi_records) -> OutputType:
         """
-        Callback that processes outputs after task completion.
+        Callback that processes outputs after both tasks have completed.
 
         Args:
-            df_records (dict[str, Any]): data generated from Celery task
+            task_results (dict[str, Any]): merged VI and soil data generated from Celery tasks
             roi_records (dict[str, Any]): input data from user
 
         Returns:
@@ -220,26 +340,36 @@ def register(app):
             dict[str, Any]: farm statistics from the input data
             dict[str, Any]: ISDA soil data retrieved
             str: polygon WKT from polygon_wkt_store
-            list[dict[str, Any]]: NDVI/NDMI data retrieved
+            dict[str, str]: reference to the NDVI/NDMI data in the result store
             dict[str, Any]: UUID-geometry mapping
+            dict[str, list[str]]: UUID-acquisition dates mapping
         """
-        if not df_records or not roi_records:
+        if not task_results or not roi_records:
             raise PreventUpdate
 
-        df = pd.DataFrame(df_records)
+        # The series is loaded from the result store; only its reference crosses the browser
+        df = read_result(task_results["result_ref"])
         df_roi = pd.DataFrame(roi_records)
+        acquisition_dates = task_results["acquisition_dates"]
+        df_soil_data = task_results["soil"]
+
+        if task_results.get("reused"):
+            df, acquisition_dates, df_soil_data = align_to_roi(df, acquisition_dates, df_soil_data, df_roi)
 
         fig_ndvi, fig_ndmi, geometry_map = build_vi_figures(df)
 
-        preprocessor = FarmDataProcessor()
-        farm_stats = FarmStatsCalculator(preprocessor)
-        df_stats = farm_stats.calculate_stats(df)
+        # Statistics are computed by the merge task, except for reused results relabelled above
+        if task_results.get("reused"):
+            df_stats = FarmStatsCalculator(FarmDataProcessor()).calculate_stats(df)
+        else:
+            df_stats = task_results["stats"]
 
-        try:
-            df_soil_data = asyncio.run(get_soil_data(df_roi))
-        except ClientError as e:
-            logging.exception("Failed to retrieve iSDA soil data")
-            df_soil_data = []
+        # Enqueue renders of the most commonly clicked points on the workers
+        prefetch_thumbnails(
+            (geometry_map[peak["uuid"]], str(peak["ndvi_peak_date"])[:10])
+            for peak in df_stats["df_ndvipeaksperfarm"]
+            if peak["uuid"] in geometry_map
+        )
 
         return (
             fig_ndvi,
@@ -247,6 +377,7 @@ def register(app):
             df_stats,
             df_soil_data,
             df_roi["geometry"].iloc[0],
-            df.to_dict("records"),
+            {"result_ref": task_results["result_ref"]},
             geometry_map,
+            acquisition_dates,
         )
\ No newline at end of file
@@ -1,58 +1,87 @@
-from typing import Optional
+from typing import Any, Optional
 
+from celery.result import AsyncResult
 from dash import Input, Output, State, dash, ctx
 from dash.exceptions import PreventUpdate
 
-from utils.gee_images import get_rgb_image, convert_wkt_to_ee_geometry
+from regen_queue.celery_app import celery_app
+from regen_queue.tasks import enqueue_rgb_thumbnail
+from services.thumbnail_cache import thumbnail_url
+
+NO_IMAGE_TITLE = "❌ No satellite image available for this date."
 
 def register(app):
     @app.callback(
         Output("image-modal", "is_open"),
         Output("gee-image", "src"),
         Output("modal_title", "children"),
+        Output("image_status", "children"),
+        Output("image_task_store", "data"),
+        Output("image_task_poll", "disabled"),
         Input("clicked_point_store", "data"),
         Input("close-modal", "n_clicks"),
         State("image-modal", "is_open"),
         prevent_initial_call=True
     )
     def toggle_image_modal(clicked_data: Optional[dict], close_clicks: Optional[int], is_open: bool) -> tuple[
-        bool, str, str]:
+        bool, str, str, str, Optional[dict], bool]:
         """
         This function produces a popup containing GEE raster upon click events on
-        the NDVI time-series points.
+        the NDVI time-series points. Cached thumbnails are shown immediately; on a
+        cache miss the modal opens with a progress message while a Celery task
+        renders the image, and `poll_image_task` fills it in.
         """
         trigger_id = ctx.triggered_id
 
-        # Close modal
+        # Close modal and stop polling
         if trigger_id == "close-modal":
-            return False, dash.no_update, dash.no_update
+            return False, dash.no_update, dash.no_update, "", None, True
 
         if not clicked_data or "clicked_wkt" not in clicked_data or "clicked_date" not in clicked_data:
             raise PreventUpdate
 
-        clicked_wkt = clicked_data["clicked_wkt"]
         clicked_date = clicked_data["clicked_date"]
+        modal_title = f"Satellite RGB Image on {clicked_date}"
+
+        key, task_id = enqueue_rgb_thumbnail(clicked_data["clicked_wkt"], clicked_date)
 
-        # Convert WKT to EE geometry
-        ee_geom = convert_wkt_to_ee_geometry(clicked_wkt)
+        if key is not None:
+            return True, thumbnail_url(key), modal_title, "", None, True
+
+        return (
+            True,
+            "",
+            modal_title,
+            "Rendering satellite image...",
+            {"task_id": task_id, "date": clicked_date},
+            False
+        )
+
+    @app.callback(
+        Output("gee-image", "src", allow_duplicate=True),
+        Output("modal_title", "children", allow_duplicate=True),
+        Output("image_status", "children", allow_duplicate=True),
+        Output("image_task_poll", "disabled", allow_duplicate=True),
+        Input("image_task_poll", "n_intervals"),
+        State("image_task_store", "data"),
+        prevent_initial_call=True
+    )
+    def poll_image_task(n_intervals: int, task_data: Optional[dict[str, Any]]) -> tuple[str, str, str, bool]:
+        """
+        This function polls the thumbnail render task and shows the image once it
+        is ready.
+        """
+        if not task_data:
+            raise PreventUpdate
 
-        # Generate RGB image
-        rgb_image = get_rgb_image(ee_geom, clicked_date)
+        result = AsyncResult(task_data["task_id"], app=celery_app)
 
-        if rgb_image is None:
-            return True, "", "❌ No satellite image available for this date."
+        if not result.ready():
+            return dash.no_update, dash.no_update, "Rendering satellite image...", False
 
-        # Generate thumbnail URL with dummy param to avoid caching
-        vis_params = {
-            "region": ee_geom.bounds().getInfo(),
-            "scale": 10,
-            "bands": ["B4", "B3", "B2"],
-            "min": 0.0,
-            "max": 0.4,
-            "gamma": 1.3
-        }
+        key = None if result.failed() else result.result.get("key")
 
-        image_url = rgb_image.getThumbURL(vis_params)
-        modal_title = f"Satellite RGB Image on {clicked_date}"
+        if key is None:
+            return "", NO_IMAGE_TITLE, "", True
 
-        return True, image_url, modal_title
\ No newline at end of file
+        return thumbnail_url(key), f"Satellite RGB Image on {task_data['date']}", "", True
@@ -14,6 +14,7 @@ from shapely.geometry import Polygon
 
 from .callbacks import (
     capture_click,
+    filmstrip,
     insert_all_farm_stats,
     insert_soil_data,
     plot_vi_data,
@@ -37,6 +38,7 @@ def init_dash2(server: Flask) -> Dash:
 
     # Registered callbacks
     capture_click.register(app)
+    filmstrip.register(app)
     insert_all_farm_stats.register(app)
     insert_soil_data.register(app)
     plot_vi_data.register(app)
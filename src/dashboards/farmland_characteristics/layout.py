@@ -50,14 +50,20 @@ layout = dbc.Container([
     dcc.Store(id="farm_stats"),
     dcc.Store(id="isda_soil_data"),
     dcc.Store(id="polygon_wkt_store"),
-    dcc.Store(id="ndvi_timeseries", data=[]),
+    dcc.Store(id="ndvi_timeseries"),
     dcc.Store(id="clicked_point_store"),
     dcc.Store(id="geometry_map_store"),
+    dcc.Store(id="acquisition_dates_store"),
     # Polling stores
     dcc.Store(id="vi_task_store"),
     dcc.Store(id="vi_roi_store"),
     dcc.Store(id="vi_result_store"),
-    dcc.Interval(id="vi_task_poll", interval=2000, disabled=True, n_intervals=0),
+    dcc.Store(id="vi_jobs_done_store"),
+    dcc.Store(id="image_task_store"),
+    dcc.Interval(id="image_task_poll", interval=1000, disabled=True, n_intervals=0),
+    dcc.Store(id="filmstrip_task_store"),
+    dcc.Store(id="filmstrip_store"),
+    dcc.Interval(id="filmstrip_poll", interval=1000, disabled=True, n_intervals=0),
     html.Div(id="vi_task_status"),
     # Layout proper
     dbc.Row([
@@ -151,22 +157,26 @@ layout = dbc.Container([
                 dbc.ModalTitle(id="modal_title", children="Satellite RGB Image")
             ),
             dbc.ModalBody([
+                html.Div(id="image_status", className="text-muted"),
                 dcc.Loading(
                     id="loading-image",
                     children=[
                         html.Img(id="gee-image", style={"width": "100%", "height": "auto"}),
                     ]
                 ),
-                # html.P(id="image-date-text"),
-                # dcc.Slider(
-                #     id="date-slider", 
-                #     min=0, 
-                #     max=1, 
-                #     step=1, 
-                #     value=0, 
-                #     marks=None, 
-                #     tooltip={"placement": "bottom", "always_visible": True}
-                # )
+                html.Hr(),
+                dbc.Button("Season filmstrip", id="filmstrip_button", color="secondary", size="sm", n_clicks=0),
+                html.Div(id="filmstrip_status", className="text-muted"),
+                html.Div(id="filmstrip_frame", style={"display": "none"}),
+                html.P(id="filmstrip_date"),
+                dcc.Slider(
+                    id="filmstrip_slider",
+                    min=0,
+                    max=0,
+                    step=1,
+                    value=0,
+                    marks=None
+                )
             ]),
             dbc.ModalFooter(
                 dbc.Button("Close", id="close-modal", className="ms-auto", n_clicks=0)
@@ -1,173 +1,168 @@
 import logging
-import os
 
 from dash import Dash, Input, Output
 import dash_bootstrap_components as dbc
 from flask import Flask
-import geopandas as gpd
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.graph_objects import Figure
-from sqlalchemy import text
-from sqlalchemy.exc import OperationalError
-from sqlmodel import create_engine
 
 from .layout import layout
-from ...utils.region_bboxes import region_bboxes_to_geojson
+from db.engine import get_engine
+from services.choropleth import get_choropleth_artifact
+from services.region_cache import cached_region_result, init_region_cache
+from services.region_data import load_region_tables
 
 logger = logging.getLogger(__name__)
 
-def init_dash3(server: Flask) -> Dash:
-    app = Dash(
-        __name__,
-        server=server,
-        routes_pathname_prefix="/farmland_statistics/",
-        external_stylesheets=[dbc.themes.DARKLY]
+def high_ndmi_days_figure(df: pd.DataFrame) -> Figure:
+    fig = go.Figure()
+    for year in sorted(df["year"].unique()):
+        fig.add_trace(go.Histogram(
+            y=df[df["year"] == year]["high_ndmi_days"],
+            name=str(year),
+            nbinsy=50,
+            marker=dict(
+                line=dict(
+                    color="white",
+                    width=0.25
+                )
+        ))
+    )
+    fig.update_layout(
+        title="Distribution of high moisture-level occurrences",
+        plot_bgcolor="#222",
+        paper_bgcolor="#222",
+        font=dict(color="white"),
+        xaxis_title="Number of farms",
+        yaxis_title="High moisture-level days",
+        barmode="stack"
     )
-    app.title = "Farmland Statistics"
-    app.layout = layout
 
-    # Create SQLAlchemy engine
-    try:
-        DB_URL = os.getenv("DB_URL")
-        engine = create_engine(DB_URL, echo=True)
-    except OperationalError as e:
-        logging.error(f"Connection failed: {e}")
+    return fig
+
+def ndvi_peak_monthly_figure(df: pd.DataFrame) -> Figure:
+    month_order = [
+        "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+        "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"
+    ]
+
+    fig = go.Figure()
+    for year in sorted(df["ndvi_peak_year"].unique()):
+        subset = df[df["ndvi_peak_year"]==year]
+        fig.add_trace(
+            go.Bar(
+                x=subset["ndvi_peak_month"],
+                y=subset["ndvi_peaks_per_month"],
+                name=str(year),
+                marker=dict(line=dict(color="white", width=0.25))
+            )
+        )
 
-    # Callbacks
-    @app.callback(
-        Output("high_ndmi", "figure"),
-        Input("location-dropdown", "value")
+    fig.update_layout(
+        title="Distribution of peak growing seasons",
+        plot_bgcolor="#222",
+        paper_bgcolor="#222",
+        font=dict(color="white"),
+        xaxis_title="Month",
+        yaxis_title="Number of green peaks",
+        xaxis=dict(categoryorder="array", categoryarray=month_order),
     )
-    def plot_high_ndmi_days(location: str) -> Figure:
-        query = text("SELECT * FROM highndmidays WHERE region = :region")
-        df = pd.read_sql(query, engine, params={"region": location})
 
-        fig = go.Figure()
-        for year in sorted(df["year"].unique()):
-            fig.add_trace(go.Histogram(
-                y=df[df["year"] == year]["high_ndmi_days"],
+    return fig
+
+def ndvi_peak_annual_figure(df: pd.DataFrame) -> Figure:
+    fig = go.Figure()
+    for year in sorted(df["ndvi_peak_year"].unique()):
+        fig.add_trace(
+            go.Bar(
+                x=df[df["ndvi_peak_year"]==year]["number_of_peaks_per_farm"],
+                y=df[df["ndvi_peak_year"]==year]["uuid_count"],
                 name=str(year),
-                nbinsy=50,
                 marker=dict(
                     line=dict(
                         color="white",
                         width=0.25
                     )
-            ))
-        )
-        fig.update_layout(
-            title="Distribution of high moisture-level occurrences",
-            plot_bgcolor="#222",
-            paper_bgcolor="#222",
-            font=dict(color="white"),
-            xaxis_title="Number of farms",
-            yaxis_title="High moisture-level days",
-            barmode="stack"
+                )
+            )
         )
-
-        return fig
-
-    @app.callback(
-        Output("ndvi_peak_monthly", "figure"),
-        Input("location-dropdown", "value")
+    fig.update_layout(
+        title="Distribution of annual planting cycles",
+        plot_bgcolor="#222",
+        paper_bgcolor="#222",
+        font=dict(color="white"),
+        xaxis_title="Number of planting cycles",
+        yaxis_title="Number of farms"
     )
-    def plot_ndvi_peak_monthly(location: str) -> Figure:
-        query = text("SELECT * FROM ndvipeaksmonthly WHERE region = :region")
-        df = pd.read_sql(query, engine, params={"region": location})
 
-        month_order = [
-            "Jan", "Feb", "Mar", "Apr", "May", "Jun",
-            "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"
-        ]
+    return fig
 
-        fig = go.Figure()
-        for year in sorted(df["ndvi_peak_year"].unique()):
-            subset = df[df["ndvi_peak_year"]==year]
-            fig.add_trace(
-                go.Bar(
-                    x=subset["ndvi_peak_month"],
-                    y=subset["ndvi_peaks_per_month"],
-                    name=str(year),
-                    marker=dict(line=dict(color="white", width=0.25))
-                )
+def moisture_level_figure(df: pd.DataFrame) -> Figure:
+    fig = go.Figure(
+        data=go.Pie(
+            labels=df["moisture_content"].unique(),
+            values=df["counts"]
+        )
+    )
+    fig.update_traces(
+        textinfo='label+percent',
+        pull=[0, 0.1, 0, 0],
+        marker=dict(
+            line=dict(color="white", width=0.25)
             )
-
-        fig.update_layout(
-            title="Distribution of peak growing seasons",
-            plot_bgcolor="#222",
-            paper_bgcolor="#222",
-            font=dict(color="white"),
-            xaxis_title="Month",
-            yaxis_title="Number of green peaks",
-            xaxis=dict(categoryorder="array", categoryarray=month_order),
         )
+    fig.update_layout(
+        title="Moisture-level breakdown",
+        plot_bgcolor="#222",
+        paper_bgcolor="#222",
+        font=dict(color="white")
+    )
 
-        return fig
+    return fig
 
-    @app.callback(
-        Output("ndvi_peak_annual", "figure"),
-        Input("location-dropdown", "value")
+def init_dash3(server: Flask) -> Dash:
+    app = Dash(
+        __name__,
+        server=server,
+        routes_pathname_prefix="/farmland_statistics/",
+        external_stylesheets=[dbc.themes.DARKLY]
     )
-    def plot_ndvi_peak_annual(location: str) -> Figure:
-        query = text("SELECT * FROM ndvipeaksannual WHERE region = :region")
-        df = pd.read_sql(query, engine, params={"region": location})
+    app.title = "Farmland Statistics"
+    app.layout = layout
 
-        fig = go.Figure()
-        for year in sorted(df["ndvi_peak_year"].unique()):
-            fig.add_trace(
-                go.Bar(
-                    x=df[df["ndvi_peak_year"]==year]["number_of_peaks_per_farm"],
-                    y=df[df["ndvi_peak_year"]==year]["uuid_count"],
-                    name=str(year),
-                    marker=dict(
-                        line=dict(
-                            color="white",
-                            width=0.25
-                        )
-                    )
-                )
-            )
-        fig.update_layout(
-            title="Distribution of annual planting cycles",
-            plot_bgcolor="#222",
-            paper_bgcolor="#222",
-            font=dict(color="white"),
-            xaxis_title="Number of planting cycles",
-            yaxis_title="Number of farms"
-        )
+    init_region_cache(server)
 
-        return fig
+    # Pooled engine shared with the rest of the process
+    engine = get_engine()
 
+    # Callbacks
     @app.callback(
+        Output("high_ndmi", "figure"),
+        Output("ndvi_peak_monthly", "figure"),
+        Output("ndvi_peak_annual", "figure"),
         Output("moisture_level", "figure"),
         Input("location-dropdown", "value")
     )
-    def plot_moisture_level(location: str) -> Figure:
-        query = text("SELECT * FROM moisturecontent WHERE region = :region")
-        df = pd.read_sql(query, engine, params={"region": location})
-
-        fig = go.Figure(
-            data=go.Pie(
-                labels=df["moisture_content"].unique(),
-                values=df["counts"]
-            )
-        )
-        fig.update_traces(
-            textinfo='label+percent',
-            pull=[0, 0.1, 0, 0],
-            marker=dict(
-                line=dict(color="white", width=0.25)
-                )
+    def plot_region_statistics(location: str) -> tuple[Figure, Figure, Figure, Figure]:
+        """
+        This function loads the four summary tables of a region in one round
+        trip and renders their figures.
+        """
+        def render() -> tuple[Figure, Figure, Figure, Figure]:
+            data = load_region_tables(engine, location)
+
+            return (
+                high_ndmi_days_figure(data["highndmidays"]),
+                ndvi_peak_monthly_figure(data["ndvipeaksmonthly"]),
+                ndvi_peak_annual_figure(data["ndvipeaksannual"]),
+                moisture_level_figure(data["moisturecontent"])
             )
-        fig.update_layout(
-            title="Moisture-level breakdown",
-            plot_bgcolor="#222",
-            paper_bgcolor="#222",
-            font=dict(color="white")
-        )
 
-        return fig
+        # The monthly and annual peaks are derived from `ndvipeaksperfarm`, the moisture content from `peakvidistribution`
+        tables = ("highndmidays", "ndvipeaksperfarm", "peakvidistribution")
+
+        return cached_region_result("region_statistics", tables, location, render)
 
     @app.callback(
         Output("choropleth_map", "figure"),
@@ -175,71 +170,13 @@ def init_dash3(server: Flask) -> Dash:
         Input("indicator-dropdown", "value")
     )
     def update_choropleth_map(location: str, map_indicator: str) -> Figure:
-        if map_indicator == "ndmi_max":
-            query = """
-                SELECT
-                    p.uuid,
-                    f.region,
-                    f.geometry,
-                    AVG(p.ndvi_max) AS ndvi_max,
-                    AVG(p.ndmi_max) AS ndmi_max
-                FROM peakvidistribution p
-                INNER JOIN farmpolygons f ON p.uuid = f.uuid
-                WHERE f.region = %(region)s
-                GROUP BY p.uuid, f.region, f.geometry;
-            """
-        else:
-            # query = """
-            #     SELECT * FROM soildata WHERE region = %(region)s;
-            # """
-            ALLOWED_PROPERTIES = [
-                "bulk_density",
-                "calcium_extractable",
-                "carbon_organic",
-                "carbon_total",
-                "clay_content",
-                "iron_extractable",
-                "magnesium_extractable",
-                "nitrogen_total",
-                "ph",
-                "phosphorous_extractable",
-                "potassium_extractable",
-                "sand_content",
-                "silt_content",
-                "stone_content",
-                "sulphur_extractable",
-                "texture_class",
-                "zinc_extractable"
-            ]
-
-            if map_indicator not in ALLOWED_PROPERTIES:
-                logging.error(f"Invalid map indicator: {map_indicator}")
-                raise ValueError(f"Invalid map indicator: {map_indicator}")
-
-            query = """
-                SELECT
-                    uuid,
-                    region,
-                    geometry,
-                    {indicator}
-                FROM soildata
-                WHERE region = %(region)s;
-            """.format(indicator=map_indicator)
-
-        # Read queried data into a geodataframe using `read_postgis()` method
-        gdf = gpd.read_postgis(query, engine, geom_col="geometry", params={"region": location})
-   
-        gdf["id"] = gdf["uuid"]
-
-        geojson = gdf.set_index("id").__geo_interface__
-
-        # Extract region bounding box polygons into GeoJSON
-        regions = region_bboxes_to_geojson()
+        # Simplified polygons, values and map centre are precomputed per region and indicator
+        artifact = get_choropleth_artifact(location, map_indicator)
 
         fig = go.Figure(go.Choroplethmapbox(
-            geojson=geojson,
-            locations=gdf["id"],
-            z=gdf[map_indicator],
+            geojson=artifact["geojson"],
+            locations=artifact["locations"],
+            z=artifact["values"],
             colorscale="rdylgn",
             marker_opacity=0.7,
             marker_line_width=0.5,
@@ -260,9 +197,10 @@ def init_dash3(server: Flask) -> Dash:
             autosize=True,
             mapbox_style="carto-darkmatter",
             mapbox_zoom=10,
-            mapbox_center={"lat": gdf.geometry.centroid.y.mean(), "lon": gdf.geometry.centroid.x.mean()},
             margin={"r": 0, "t": 0, "l": 0, "b": 0}
         )
+        if artifact["center"] is not None:
+            fig.update_layout(mapbox_center=artifact["center"])
 
         return fig
 
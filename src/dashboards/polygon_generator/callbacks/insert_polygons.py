@@ -6,7 +6,9 @@ from dash import Input, Output, State
 
 from auth.supabase_auth import get_supabase_client
 from config import USE_LOCAL_DB, LOCAL_DB_CONFIG
-from db.db_utils import db_connect
+from db.db_client import local_db_connection
+from regen_queue.tasks import enqueue_choropleth_rebuild
+from services.region_cache import bump_table_versions
 
 logger = logging.getLogger(__name__)
 
@@ -45,9 +47,7 @@ def register(app):
         try:
 
             if USE_LOCAL_DB:
-                conn = db_connect()
-                
-                with conn.cursor() as cursor:
+                with local_db_connection() as conn, conn.cursor() as cursor:
                     for row in stored_data:
                         row.setdefault("created_at", datetime.now().isoformat())
 
@@ -58,7 +58,10 @@ def register(app):
                         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
                         cursor.execute(query, values)
 
+                    conn.commit()
                     logger.info(f"Inserted {len(stored_data)} polygons successfully.")
+                    bump_table_versions(table_name)
+                    enqueue_choropleth_rebuild([row["uuid"] for row in stored_data], [table_name])
                     return f"Inserted {len(stored_data)} polygons successfully.", "success", True
 
             else:
@@ -71,6 +74,8 @@ def register(app):
 
                 if response.data:
                     logger.info(f"Inserted {len(response.data)} polygons successfully.")
+                    bump_table_versions(table_name)
+                    enqueue_choropleth_rebuild([row["uuid"] for row in stored_data], [table_name])
                     return f"Inserted {len(response.data)} polygons successfully.", "success", True
                 else:
                     logger.error(f"Insert failed: {response.error if hasattr(response, 'error') else 'Unknown error'}")
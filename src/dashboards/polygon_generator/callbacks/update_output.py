@@ -2,11 +2,12 @@ import logging
 from typing import Any
 from uuid import uuid4
 
+import numpy as np
 import pandas as pd
 from dash import dash_table, Input, Output 
-from pyproj import Transformer
 from shapely.geometry import shape 
-from shapely.ops import transform
+
+from utils.geometry import areas_acres
 
 OutputType = tuple[str | dict[str, Any], bool, str, bool, str, str | dict[str, Any]]
 
@@ -39,40 +40,41 @@ def register(app):
             show_area_alert = False
             area_alert_message = ""
 
-            for i, feature in enumerate(geojson["features"]):
-                if i < MAX_POLYGONS:
-                    geom = feature.get("geometry")
-                    if geom:
-                        try:
-                            polygon = shape(geom)
-
-                            # Project to Mercator for calculating physics area
-                            projection = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True).transform 
-                            projected = transform(projection, polygon)
-
-                            #area = polygon.area * (111_000**2) * 0.000247105 # area in acres (rough conversion to physical distance)
-                            area = projected.area * 0.000247105
-                            
-                            if area > MAX_AREA:
-                                show_area_alert = True
-                                area_alert_message = f"⚠️ Polygon {i+1} exceeds area limit of {MAX_AREA} acres and was not added."
-                                
-                                continue
-                            
-                            wkt = polygon.wkt
-                            wkt_list.append(f"polygon {i+1}:\n{wkt}\n")
-                            # Append to polygon_dict
-                            polygon_dict["uuid"].append(str(uuid4()))
-                            polygon_dict["region"].append(location)
-                            polygon_dict["area"].append(area)
-                            polygon_dict["geometry"].append(wkt)
-
-                        except Exception as e:
-                            logging.error(f"Error processing polygon {i+1}: {e}")
-                else:
-                    show_count_alert = True
-                    count_alert_message = "⚠️ You can only draw up to 5 polygons."
-            
+            features = geojson["features"]
+            if len(features) > MAX_POLYGONS:
+                show_count_alert = True
+                count_alert_message = "⚠️ You can only draw up to 5 polygons."
+
+            polygons = []
+            for i, feature in enumerate(features[:MAX_POLYGONS]):
+                geom = feature.get("geometry")
+                try:
+                    polygons.append(shape(geom) if geom else None)
+                except Exception as e:
+                    logging.error(f"Error processing polygon {i+1}: {e}")
+                    polygons.append(None)
+
+            # Physical areas of all polygons in one vectorized, equal-area projection
+            areas = areas_acres(np.array(polygons, dtype=object))
+
+            for i, (polygon, area) in enumerate(zip(polygons, areas)):
+                if polygon is None:
+                    continue
+
+                if area > MAX_AREA:
+                    show_area_alert = True
+                    area_alert_message = f"⚠️ Polygon {i+1} exceeds area limit of {MAX_AREA} acres and was not added."
+
+                    continue
+
+                wkt = polygon.wkt
+                wkt_list.append(f"polygon {i+1}:\n{wkt}\n")
+                # Append to polygon_dict
+                polygon_dict["uuid"].append(str(uuid4()))
+                polygon_dict["region"].append(location)
+                polygon_dict["area"].append(float(area))
+                polygon_dict["geometry"].append(wkt)
+
             polygon_df = pd.DataFrame(polygon_dict)
             polygon_table = dash_table.DataTable(
                 data=polygon_df.to_dict("records"),
@@ -5,7 +5,7 @@ import geopandas as gpd
 from dash import Input, Output
 from sqlalchemy import text
 
-from auth.db import engine
+from db.engine import get_engine
 
 def register(app):
     @app.callback(
@@ -41,7 +41,7 @@ def register(app):
         query = text(
             "SELECT uuid, region, area, geometry FROM farmpolygons WHERE region = :region"
         )
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             gdf = gpd.read_postgis(query, conn, geom_col="geometry", params={"region": location})
 
         if gdf.empty:
@@ -1,22 +1,5 @@
-# Script for creating a direct connection to database for `SELECT` commands
+# Shared engine for `SELECT` commands; see `db.engine` for pooling and timeouts
 
-import logging
-import os
+from db.engine import get_engine
 
-import dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.exc import OperationalError
-
-logger = logging.getLogger(__name__)
-
-#dotenv.load_dotenv(override=True)
-DB_URL = os.getenv("DB_URL")
-if not DB_URL:
-    raise ValueError("DB_URL environment variable is not set.")
-
-try:
-    engine = create_engine(DB_URL, echo=False)
-    logger.info("SQLAlchemy engine created successfully.")
-except OperationalError as e:
-    logger.warning(f"SQLAlchemy connection failed: {e}")
-    engine = None
+engine = get_engine()
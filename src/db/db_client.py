@@ -5,10 +5,12 @@ from typing import Iterator, Literal
 import psycopg2
 from flask import session
 from psycopg2.extensions import connection as psycopg2connection
+from sqlalchemy.exc import SQLAlchemyError
 from supabase import Client, create_client
 
 from config import LOCAL_DB_CONFIG, USE_LOCAL_DB
 from auth.supabase_auth import SUPABASE_KEY, SUPABASE_URL
+from db.engine import LOCAL, get_engine
 from utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -42,17 +44,17 @@ def get_db_runtime() -> DbRuntime:
 @contextmanager
 def local_db_connection() -> Iterator[psycopg2connection]:
     """
-    Establishes a local PostgreSQL database connection using the
-    Psycopg2Connection object.
+    Checks out a local PostgreSQL connection from the pooled `LOCAL` engine.
+    The caller commits; uncommitted work is rolled back when the connection
+    returns to the pool on exit.
     """
-    conn: psycopg2connection | None = None
+    conn = None
 
     try:
-        conn = psycopg2.connect(**LOCAL_DB_CONFIG)
-        conn.autocommit = False
-        yield conn
+        conn = get_engine(LOCAL).raw_connection()
+        yield conn.driver_connection
 
-    except psycopg2.Error as e:
+    except (psycopg2.Error, SQLAlchemyError) as e:
         logger.exception("Could not connect to PostgreSQL database.")
         raise RuntimeError(f"Could not connect to PostgreSQL database") from e
 
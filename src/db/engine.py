@@ -0,0 +1,169 @@
+"""
+Per-process registry of pooled SQLAlchemy engines.
+
+Engines are created lazily, once per process and database:
+
+* `DEFAULT` reads and writes through `DB_URL` (local PostgreSQL or the
+  Supabase Postgres endpoint);
+* `LOCAL` connects with `LOCAL_DB_CONFIG`, used by the inserts in local mode.
+
+Every engine uses a bounded queue pool (`DB_POOL_SIZE` + `DB_MAX_OVERFLOW`)
+with pre-ping, recycles connections after `DB_POOL_RECYCLE` seconds and sets a
+server-side `statement_timeout` of `DB_STATEMENT_TIMEOUT_MS` (0 disables it,
+e.g. behind a transaction-mode pgbouncer). Pools are discarded in forked
+children (gunicorn `preload_app`, Celery prefork), so connections are never
+shared between processes. Checkout times and pool saturation are exported by
+`pool_stats()` and the `/metrics/db` route.
+"""
+import os
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT = "default"
+LOCAL = "local"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10)) # seconds a checkout waits for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800)) # seconds
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+class PoolStats:
+    """
+    Checkout counters of one engine; kept apart from the pool since the pool is
+    replaced after a fork.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, wait: float, checked_out: int) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+def _metered_pool_class(stats: PoolStats) -> type[QueuePool]:
+    # `recreate()` (used by `dispose()`) instantiates `self.__class__`, so the counters survive it
+    class MeteredQueuePool(QueuePool):
+        def connect(self):
+            start = time.perf_counter()
+
+            try:
+                connection = super().connect()
+            except PoolTimeoutError:
+                stats.record_timeout()
+                raise
+
+            stats.record_checkout(time.perf_counter() - start, self.checkedout())
+            return connection
+
+    return MeteredQueuePool
+
+_engines: dict[str, Engine] = {}
+_stats: dict[str, PoolStats] = {}
+_lock = threading.Lock()
+
+def _connect_args() -> dict[str, Any]:
+    if DB_STATEMENT_TIMEOUT_MS <= 0:
+        return {}
+
+    return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+def _create_engine(name: str) -> Engine:
+    connect_args = _connect_args()
+
+    if name == DEFAULT:
+        url = os.getenv("DB_URL")
+        if not url:
+            raise ValueError("DB_URL environment variable is not set.")
+    elif name == LOCAL:
+        from config import LOCAL_DB_CONFIG
+
+        # psycopg2 receives the keyword arguments of `LOCAL_DB_CONFIG` as they are
+        url = "postgresql+psycopg2://"
+        connect_args = {**LOCAL_DB_CONFIG, **connect_args}
+    else:
+        raise ValueError(f"Unknown database engine: {name}")
+
+    _stats[name] = PoolStats()
+
+    return create_engine(
+        url,
+        poolclass=_metered_pool_class(_stats[name]),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+
+def get_engine(name: str = DEFAULT) -> Engine:
+    """
+    This function returns the pooled engine `name` of this process, creating
+    it on first use.
+    """
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+
+    with _lock:
+        if name not in _engines:
+            _engines[name] = _create_engine(name)
+            logger.info("Created %s database engine (pool %d + %d overflow).", name, DB_POOL_SIZE, DB_MAX_OVERFLOW)
+
+        return _engines[name]
+
+def _reset_after_fork() -> None:
+    # Connections inherited from the parent belong to it; drop them without closing
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """
+    This function returns, per engine of this process, the pool usage
+    (connections checked out, overflow in use, saturation against the pool
+    limit) and checkout counters. Checkout time covers waiting for a free
+    connection as well as connecting and the pre-ping.
+    """
+    stats = {}
+    for name, engine in list(_engines.items()):
+        pool, counters = engine.pool, _stats[name]
+        limit = pool.size() + DB_MAX_OVERFLOW
+
+        stats[name] = {
+            "pool_size": pool.size(),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "saturation": round(pool.checkedout() / limit, 3) if limit else 0.0,
+            "peak_checked_out": counters.peak_checked_out,
+            "checkouts": counters.checkouts,
+            "timeouts": counters.timeouts,
+            "mean_checkout_seconds": round(counters.wait_seconds / counters.checkouts, 4) if counters.checkouts else 0.0,
+            "max_checkout_seconds": round(counters.max_wait_seconds, 4),
+        }
+
+    return stats
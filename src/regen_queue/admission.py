@@ -0,0 +1,189 @@
+"""
+Admission control and fair scheduling of VI submissions.
+
+Before a submission is enqueued:
+
+* each client (user id, or address for anonymous users) may have at most
+  `VI_MAX_JOBS_PER_USER` unfinished VI jobs, tracked in the sorted set
+  `admission:active:{client}` (pruned lazily as jobs finish or time out);
+* submissions larger than `MAX_POLYGONS` go to the bulk queue, so uploads never
+  sit in front of interactive requests;
+* the task priority reflects the client's outstanding work divided by its
+  weight (authenticated users weigh more), so light users are served before a
+  user with a large backlog. This is a weighted fair queueing approximation on
+  top of the broker's priority levels;
+* the queue backlog is converted into an estimated wait, and submissions are
+  refused with "server busy" once it exceeds `VI_MAX_WAIT_MINUTES`.
+
+Satellite image renders (filmstrips) are rate limited per client instead: at
+most `RENDER_MAX_PER_MINUTE` requests per weight unit in a one-minute window,
+counted in `admission:renders:{client}`.
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import redis
+from kombu.exceptions import ChannelError
+
+from services.earth_engine_timeseries import MAX_POLYGONS
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+from .celery_app import BULK_QUEUE, INTERACTIVE_QUEUE, PRIORITY_LEVELS, celery_app
+from .jobs import TERMINAL_STATUSES, get_job_status
+
+logger = get_logger(__name__)
+
+VI_MAX_JOBS_PER_USER = int(os.getenv("VI_MAX_JOBS_PER_USER", 2))
+VI_MAX_WAIT_MINUTES = float(os.getenv("VI_MAX_WAIT_MINUTES", 10))
+VI_SECONDS_PER_POLYGON = float(os.getenv("VI_SECONDS_PER_POLYGON", 15))
+VI_WORKER_SLOTS = int(os.getenv("VI_WORKER_SLOTS", 8)) # tasks the fleet runs concurrently
+ADMISSION_TTL = 3600 # seconds after which an unfinished job no longer counts against its client
+PRIORITY_STEP_POLYGONS = 10 # outstanding polygons per weight unit that lower the priority by one level
+USER_WEIGHTS = {"authenticated": 2, "anonymous": 1}
+RENDER_MAX_PER_MINUTE = int(os.getenv("RENDER_MAX_PER_MINUTE", 6))
+RENDER_WINDOW_SECONDS = 60
+
+class AdmissionRejected(Exception):
+    """Raised when a submission is not admitted; the message is shown to the user."""
+
+@dataclass(frozen=True)
+class Admission:
+    queue: str
+    priority: int # 0 is served first
+    estimated_wait_minutes: int
+
+def client_weight(user_id: Optional[str]) -> int:
+    return USER_WEIGHTS["authenticated" if user_id else "anonymous"]
+
+def queue_depth(queue: str) -> int:
+    """
+    This function returns the number of messages waiting in a broker queue
+    (over all priority levels).
+    """
+    with celery_app.connection_for_read() as connection:
+        try:
+            return connection.default_channel.queue_declare(queue=queue, passive=True).message_count
+        except ChannelError:
+            # The Redis transport drops empty queues
+            return 0
+
+def estimated_wait_minutes(queue: str) -> int:
+    # Waiting tasks of the VI graph carry about one polygon each on average
+    backlog_seconds = queue_depth(queue) * VI_SECONDS_PER_POLYGON / max(VI_WORKER_SLOTS, 1)
+
+    return math.ceil(backlog_seconds / 60)
+
+def _active_key(client: str) -> str:
+    return f"admission:active:{client}"
+
+def _cost_key(client: str) -> str:
+    return f"admission:cost:{client}"
+
+def _outstanding(client: str) -> tuple[int, int]:
+    # (unfinished jobs, their polygons) of a client, dropping finished and expired jobs
+    redis_client = get_redis()
+    active_key, cost_key = _active_key(client), _cost_key(client)
+
+    redis_client.zremrangebyscore(active_key, "-inf", time.time())
+    job_ids = redis_client.zrange(active_key, 0, -1)
+
+    finished = []
+    for job_id in job_ids:
+        status = get_job_status(job_id)
+        if status is not None and status["status"] in TERMINAL_STATUSES:
+            finished.append(job_id)
+
+    if finished:
+        redis_client.zrem(active_key, *finished)
+        redis_client.hdel(cost_key, *finished)
+
+    active = [job_id for job_id in job_ids if job_id not in finished]
+    costs = redis_client.hmget(cost_key, active) if active else []
+
+    return len(active), sum(int(cost or 0) for cost in costs)
+
+def fair_priority(outstanding_polygons: int, polygons: int, weight: int) -> int:
+    """
+    This function maps a client's outstanding work, including the new
+    submission, to a broker priority: 0 for light clients, up to
+    `PRIORITY_LEVELS - 1` for clients with a large backlog.
+    """
+    level = (outstanding_polygons + polygons) // (weight * PRIORITY_STEP_POLYGONS)
+
+    return min(PRIORITY_LEVELS - 1, level)
+
+def admit_vi_job(client: str, job_id: str, polygons: int, weight: int = 1) -> Admission:
+    """
+    This function admits a VI job or raises `AdmissionRejected`. An admitted
+    job counts against the client until it finishes.
+
+    Args: (i) client - user id, or a stand-in for anonymous users
+          (ii) job_id - id of the job to admit
+          (iii) polygons - number of polygons in the submission
+          (iv) weight - fair-share weight of the client
+
+    Returns: the queue and priority to enqueue with, and the estimated wait
+    """
+    queue = INTERACTIVE_QUEUE if polygons <= MAX_POLYGONS else BULK_QUEUE
+
+    try:
+        active_jobs, outstanding_polygons = _outstanding(client)
+        wait = estimated_wait_minutes(queue)
+    except (redis.RedisError, OSError) as e:
+        # Admission is protective; an unavailable broker surfaces when enqueuing
+        logger.warning("Admission control unavailable, admitting job %s: %s", job_id, e)
+        return Admission(queue, 0, 0)
+
+    if active_jobs >= VI_MAX_JOBS_PER_USER:
+        raise AdmissionRejected(
+            f"You already have {active_jobs} requests in progress. Please wait for one to finish."
+        )
+    if wait > VI_MAX_WAIT_MINUTES:
+        raise AdmissionRejected(f"Server busy, estimated wait {wait} min. Please try again later.")
+
+    redis_client = get_redis()
+    pipe = redis_client.pipeline()
+    pipe.zadd(_active_key(client), {job_id: time.time() + ADMISSION_TTL})
+    pipe.hset(_cost_key(client), job_id, polygons)
+    pipe.expire(_active_key(client), ADMISSION_TTL)
+    pipe.expire(_cost_key(client), ADMISSION_TTL)
+    pipe.zcard(_active_key(client))
+    admitted = pipe.execute()[-1]
+
+    # Concurrent submissions of one client may all pass the check; any admission over the cap backs out
+    if admitted > VI_MAX_JOBS_PER_USER:
+        release_vi_job(client, job_id)
+        raise AdmissionRejected("You already have requests in progress. Please wait for one to finish.")
+
+    return Admission(queue, fair_priority(outstanding_polygons, polygons, weight), wait)
+
+def release_vi_job(client: str, job_id: str) -> None:
+    # Frees an admission whose job could not be enqueued
+    redis_client = get_redis()
+    redis_client.zrem(_active_key(client), job_id)
+    redis_client.hdel(_cost_key(client), job_id)
+
+def admit_render(client: str, weight: int = 1) -> None:
+    """
+    This function admits a satellite image render request of a client or
+    raises `AdmissionRejected` once the client exceeds its rate limit.
+
+    Args: (i) client - user id, or a stand-in for anonymous users
+          (ii) weight - fair-share weight of the client
+    """
+    key = f"admission:renders:{client}"
+
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(key, 0, ex=RENDER_WINDOW_SECONDS, nx=True)
+        pipe.incr(key)
+        requests = pipe.execute()[-1]
+    except (redis.RedisError, OSError) as e:
+        logger.warning("Render rate limit unavailable, admitting %s: %s", client, e)
+        return
+
+    if requests > RENDER_MAX_PER_MINUTE * weight:
+        raise AdmissionRejected("Too many image requests. Please wait a minute and try again.")
@@ -0,0 +1,46 @@
+"""
+Fleet-wide view of the circuit breakers of `utils.resilience`.
+
+Breakers live in each process. Every state change is written to the Redis hash
+`breakers` under `{endpoint}@{host}:{pid}`, so the `/status/breakers` route can
+show which processes currently consider an upstream unavailable. Entries of
+processes that stopped reporting expire with the hash after `BREAKER_STATE_TTL`
+seconds without any change.
+"""
+import json
+import os
+import socket
+from typing import Any
+
+import redis
+
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+from utils.resilience import add_state_listener
+
+logger = get_logger(__name__)
+
+BREAKERS_KEY = "breakers"
+BREAKER_STATE_TTL = 24 * 3600 # seconds
+
+def _field(name: str) -> str:
+    return f"{name}@{socket.gethostname()}:{os.getpid()}"
+
+def publish_breaker_state(snapshot: dict[str, Any]) -> None:
+    # State listener; never raises, an unavailable Redis only loses the fleet view
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(BREAKERS_KEY, _field(snapshot["name"]), json.dumps(snapshot))
+        pipe.expire(BREAKERS_KEY, BREAKER_STATE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to publish circuit breaker state: %s", e)
+
+def get_fleet_breaker_states() -> dict[str, dict[str, Any]]:
+    """
+    This function returns the last published state of every breaker in the
+    fleet, keyed by `{endpoint}@{host}:{pid}`.
+    """
+    return {field: json.loads(value) for field, value in get_redis().hgetall(BREAKERS_KEY).items()}
+
+add_state_listener(publish_breaker_state)
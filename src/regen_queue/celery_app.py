@@ -1,10 +1,49 @@
 import os 
 
 from celery import Celery
+from celery.schedules import crontab
 from dotenv import load_dotenv
+from kombu import Queue
+
+from .serialization import SERIALIZER, message_compression
 
 load_dotenv()
 
+"""
+Dashboard requests go to the `interactive` queue and backfills/maintenance to
+`bulk`. Run dedicated interactive workers (`-Q interactive`) next to the bulk
+fleet (`-Q bulk,interactive`) so interactive tasks never wait behind a backfill.
+
+Tasks mostly wait on Earth Engine and iSDA, so besides the default prefork pool
+an I/O-optimized pool is supported: `CELERY_POOL=threads`, or gevent with
+`CELERY_POOL=gevent` *and* `-P gevent` on the command line (the monkey patching
+must happen before imports). These pools run many tasks per process and
+prefetch one task per slot, so long Earth Engine calls do not hold back
+reserved tasks. `CELERY_CONCURRENCY` and `CELERY_PREFETCH_MULTIPLIER` override
+the defaults below.
+"""
+INTERACTIVE_QUEUE = "interactive"
+BULK_QUEUE = "bulk"
+PRIORITY_LEVELS = 10 # broker priorities 0 (served first) to 9, see regen_queue.admission
+WORKER_POOL = os.getenv("CELERY_POOL", "prefork")
+POOL_DEFAULTS = { # pool -> (concurrency, prefetch multiplier); None uses the CPU count
+    "prefork": (None, 4),
+    "threads": (32, 1),
+    "gevent": (64, 1),
+}
+FARM_REFRESH_HOUR = int(os.getenv("FARM_REFRESH_HOUR", 23)) # UTC; 02:00 in East Africa
+
+def _worker_settings() -> dict:
+    concurrency, prefetch_multiplier = POOL_DEFAULTS.get(WORKER_POOL, POOL_DEFAULTS["prefork"])
+
+    return {
+        "worker_pool": WORKER_POOL,
+        "worker_concurrency": int(os.getenv("CELERY_CONCURRENCY", 0)) or concurrency,
+        "worker_prefetch_multiplier": int(os.getenv("CELERY_PREFETCH_MULTIPLIER", prefetch_multiplier)),
+        # Child processes authenticate Earth Engine on start (see regen_queue.worker)
+        "worker_proc_alive_timeout": 60,
+    }
+
 def make_celery() -> Celery:
     broker_url = os.getenv("CELERY_BROKER_URL")
     backend_url = os.getenv("CELERY_RESULT_BACKEND")
@@ -13,17 +52,44 @@ def make_celery() -> Celery:
         "regen_queue",
         broker=broker_url,
         backend=backend_url,
-        include=["regen_queue.tasks"], 
+        include=["regen_queue.tasks", "regen_queue.worker"],
     )
 
     # Configuration settings
     app.conf.update(
-        task_serializer="json",
-        result_serializer="json",
-        accept_content=["json"],
+        task_serializer=SERIALIZER,
+        result_serializer=SERIALIZER,
+        # JSON is still accepted so messages queued before a deploy are consumed
+        accept_content=[SERIALIZER, "json"],
+        result_accept_content=[SERIALIZER, "json"],
+        task_compression=message_compression(),
+        result_compression=message_compression(),
         timezone="UTC",
         enable_utc=True,
         task_track_started=True,
+        task_queues=(Queue(INTERACTIVE_QUEUE), Queue(BULK_QUEUE)),
+        task_default_queue=INTERACTIVE_QUEUE,
+        broker_transport_options={
+            "priority_steps": list(range(PRIORITY_LEVELS)),
+            "queue_order_strategy": "priority",
+        },
+        task_routes={
+            "task.cleanup_results": {"queue": BULK_QUEUE},
+            "task.schedule_farm_refresh": {"queue": BULK_QUEUE},
+            "task.refresh_farm_batch": {"queue": BULK_QUEUE},
+            "task.rebuild_choropleth_artifacts": {"queue": BULK_QUEUE},
+        },
+        **_worker_settings(),
+        beat_schedule={
+            "cleanup-results": {
+                "task": "task.cleanup_results",
+                "schedule": crontab(minute=0),
+            },
+            "refresh-farms": {
+                "task": "task.schedule_farm_refresh",
+                "schedule": crontab(minute=0, hour=FARM_REFRESH_HOUR),
+            },
+        },
     )
 
     return app
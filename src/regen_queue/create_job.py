@@ -4,6 +4,7 @@ from typing import Any, Optional
 from uuid import uuid4
 
 from auth.supabase_service import get_service_supabase_client
+from .jobs import QUEUED, mirror_job
 
 def _get_utc_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -12,18 +13,24 @@ def _get_utc_iso() -> str:
 class JobCreationResult:
     job_id: str
 
-def create_job(kind: str, payload: dict[str, Any], user_id: Optional[str]=None) -> JobCreationResult:
+def create_job(
+        kind: str,
+        payload: dict[str, Any],
+        user_id: Optional[str]=None,
+        job_id: Optional[str]=None
+) -> JobCreationResult:
     """ 
-    This function creates a 'job' row in the jobs DB.
+    This function creates a 'job' row in the jobs DB and its Redis mirror. A
+    `job_id` can be reserved by the caller before the row exists.
     """
-    job_id = str(uuid4())
+    job_id = job_id or str(uuid4())
     created_at = _get_utc_iso()
 
     row = {
         "job_id": job_id,
         "user_id": user_id,
         "kind": kind,
-        "status": "queued",
+        "status": QUEUED,
         "payload": payload,      
         "created_at": created_at,
         "progress": 0,
@@ -40,4 +47,6 @@ def create_job(kind: str, payload: dict[str, Any], user_id: Optional[str]=None)
         err = getattr(response, "error", None)
         raise RuntimeError(f"Failed to create job: {err or 'Unknown error'}")
     
+    mirror_job(job_id, {key: value for key, value in row.items() if key != "payload"})
+
     return JobCreationResult(job_id=job_id)
\ No newline at end of file
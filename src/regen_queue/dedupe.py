@@ -0,0 +1,179 @@
+"""
+Idempotent submission of VI/soil requests.
+
+A submission is fingerprinted by the canonical geometries of its polygons and
+the date range of the time series. While a job with the same fingerprint is in
+flight, or finished within `DEDUPE_TTL` seconds, its tasks are reused instead
+of enqueuing new Earth Engine work. Failed jobs are never reused.
+
+Hit and miss counts are kept in the Redis hash `dedupe:stats` and exposed by
+the `/metrics/dedupe` route. Only submissions that enqueue new work go through
+admission control (`regen_queue.admission`); reusing a job costs nothing.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+from uuid import uuid4
+
+from services.earth_engine_timeseries import default_date_range
+from utils.geometry import canonical_wkts
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+from .admission import Admission, admit_vi_job, client_weight, release_vi_job
+from .create_job import create_job
+from .jobs import FAILED, get_job_status
+from .tasks import fetch_soil_data, submit_vi_timeseries
+
+logger = get_logger(__name__)
+
+DEDUPE_TTL = int(os.getenv("VI_DEDUPE_TTL_SECONDS", 3600))
+DEDUPE_STATS_KEY = "dedupe:stats"
+
+@dataclass(frozen=True)
+class VISubmission:
+    task_id: str
+    soil_task_id: str
+    job_id: str
+    soil_job_id: str
+    reused: bool = False
+    estimated_wait: int = 0 # minutes, as estimated by admission control
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "soil_task_id": self.soil_task_id,
+            "job_id": self.job_id,
+            "soil_job_id": self.soil_job_id,
+            "reused": self.reused,
+            "estimated_wait": self.estimated_wait
+        }
+
+def request_fingerprint(wkts: list[str], start_date: str, end_date: str) -> Optional[str]:
+    """
+    This function returns the fingerprint of a submission, or None when it
+    contains the same polygon more than once and cannot be deduplicated safely.
+    """
+    geometries = canonical_wkts(wkts)
+    if len(set(geometries)) != len(geometries):
+        return None
+
+    payload = json.dumps(
+        {"geometries": sorted(geometries), "start_date": start_date, "end_date": end_date},
+        sort_keys=True
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _reusable(submission: VISubmission) -> bool:
+    # A submission is reused unless its VI job failed. A missing job is still being
+    # created by the claiming request, which releases the claim if that fails.
+    status = get_job_status(submission.job_id)
+
+    return status is None or status["status"] != FAILED
+
+def _record(outcome: str) -> None:
+    get_redis().hincrby(DEDUPE_STATS_KEY, outcome, 1)
+
+def get_dedupe_stats() -> dict[str, int]:
+    """
+    This function returns the dedupe hit and miss counts since the counters
+    were last reset.
+    """
+    stats = {key: int(value) for key, value in get_redis().hgetall(DEDUPE_STATS_KEY).items()}
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+
+    return {"hits": hits, "misses": misses, "skipped": stats.get("skipped", 0), "requests": hits + misses}
+
+def _enqueue(
+        roi_records: list[dict],
+        payload: dict[str, Any],
+        user_id: Optional[str],
+        client: str,
+        submission: VISubmission
+) -> Admission:
+    # Raises AdmissionRejected before any job is created
+    admission = admit_vi_job(client, submission.job_id, len(roi_records), client_weight(user_id))
+
+    try:
+        create_job("vi_timeseries", payload, user_id=user_id, job_id=submission.job_id)
+        create_job("soil_data", payload, user_id=user_id, job_id=submission.soil_job_id)
+
+        submit_vi_timeseries(
+            roi_records,
+            job_id=submission.job_id,
+            queue=admission.queue,
+            task_id=submission.task_id,
+            priority=admission.priority
+        )
+        fetch_soil_data.apply_async(
+            args=[roi_records],
+            kwargs={"job_id": submission.soil_job_id},
+            task_id=submission.soil_task_id,
+            queue=admission.queue,
+            priority=admission.priority
+        )
+    except Exception:
+        release_vi_job(client, submission.job_id)
+        raise
+
+    return admission
+
+def submit_vi_request(
+        roi_records: list[dict],
+        user_id: Optional[str] = None,
+        client: Optional[str] = None
+) -> VISubmission:
+    """
+    This function enqueues the time-series and soil tasks for a set of polygons,
+    reusing an identical in-flight or recently finished submission if any.
+
+    Args: (i) roi_records - polygons to process, with `uuid` and `geometry`
+          (ii) user_id - id of the submitting user
+          (iii) client - admission key of anonymous users (e.g. their address)
+
+    Returns: the task and job ids to follow; `reused` is set on a dedupe hit.
+    Raises `AdmissionRejected` when new work is not admitted.
+    """
+    client = user_id or client or "anonymous"
+    payload = {"uuids": [str(record["uuid"]) for record in roi_records]}
+    submission = VISubmission(
+        task_id=str(uuid4()),
+        soil_task_id=str(uuid4()),
+        job_id=str(uuid4()),
+        soil_job_id=str(uuid4())
+    )
+
+    fingerprint = request_fingerprint([record["geometry"] for record in roi_records], *default_date_range())
+    if fingerprint is None:
+        admission = _enqueue(roi_records, payload, user_id, client, submission)
+        _record("skipped")
+        return replace(submission, estimated_wait=admission.estimated_wait_minutes)
+
+    redis_client = get_redis()
+    redis_key = f"dedupe:{fingerprint}"
+
+    while True:
+        # Claim the fingerprint before creating jobs so concurrent submissions cannot both enqueue
+        if redis_client.set(redis_key, json.dumps(submission.as_dict()), nx=True, ex=DEDUPE_TTL):
+            try:
+                admission = _enqueue(roi_records, payload, user_id, client, submission)
+            except Exception:
+                redis_client.delete(redis_key)
+                raise
+
+            _record("misses")
+            return replace(submission, estimated_wait=admission.estimated_wait_minutes)
+
+        existing = redis_client.get(redis_key)
+        if existing is None:
+            continue
+
+        existing_submission = VISubmission(**{**json.loads(existing), "reused": True})
+        if _reusable(existing_submission):
+            logger.info("Reusing VI job %s for an identical request.", existing_submission.job_id)
+            _record("hits")
+            return existing_submission
+
+        redis_client.delete(redis_key)
@@ -0,0 +1,244 @@
+"""
+Job lifecycle tracking for Celery tasks.
+
+Every job has a row in the `jobs` table (the audit trail) and a Redis hash
+`job:{job_id}` mirroring its status and progress. Workers update both; the
+dashboards read the mirror and only fall back to the table, an indexed
+primary-key lookup, when the mirror is missing.
+
+Every mirror update is also published on the Redis channel
+`job-events:{job_id}`, which the `/events/jobs` route streams to browsers.
+
+Tasks opt in by accepting a `job_id` keyword argument. The Celery signal
+handlers below then record `started_at`, `finished_at`, the final status and
+any error, while tasks report progress with `update_job_progress`. Stages of a
+task graph that do not finish the job accept `parent_job_id` instead: they mark
+the job as started but leave completion to the final stage.
+
+Progress bookkeeping shared by the stages lives in Redis rather than in the
+worker processes: the chunks already counted (`job:{job_id}:chunks`), the
+items done (`job-items:{job_id}`) and the progress last written to the table
+(`job-persisted:{job_id}`).
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import redis
+from celery.signals import task_postrun, task_prerun
+
+from auth.supabase_service import get_service_supabase_client
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+JOB_MIRROR_TTL = 24 * 3600 # seconds
+PROGRESS_PERSIST_STEP = 10 # minimum progress change (%) written to the jobs table
+JOB_STATUS_COLUMNS = "job_id, kind, status, progress, result_ref, error, created_at, started_at, finished_at"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = {SUCCEEDED, FAILED}
+
+# Returns 1 when the progress has advanced a step past the value last written to the table, recording it
+PERSIST_PROGRESS_SCRIPT = """
+local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) - last >= tonumber(ARGV[2]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Adds the items of a chunk to the job once; returns the items done, or -1 if the chunk was already counted
+ADD_CHUNK_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return -1
+end
+local done = redis.call('INCRBY', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return done
+"""
+
+def _get_utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _mirror_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def _chunks_key(job_id: str) -> str:
+    return f"job:{job_id}:chunks"
+
+def _items_key(job_id: str) -> str:
+    return f"job-items:{job_id}"
+
+def _persisted_key(job_id: str) -> str:
+    return f"job-persisted:{job_id}"
+
+def job_channel(job_id: str) -> str:
+    # Redis pub/sub channel announcing changes to a job
+    return f"job-events:{job_id}"
+
+def mirror_job(job_id: str, fields: dict[str, Any]) -> None:
+    """
+    This function writes job fields to the Redis mirror and notifies
+    subscribers. Mirror failures are logged and ignored since the jobs table
+    remains the source of truth.
+    """
+    mapping = {key: "" if value is None else str(value) for key, value in fields.items()}
+
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(_mirror_key(job_id), mapping=mapping)
+        pipe.expire(_mirror_key(job_id), JOB_MIRROR_TTL)
+        pipe.publish(job_channel(job_id), json.dumps(mapping))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to mirror job %s: %s", job_id, e)
+
+def update_job(job_id: str, persist: bool = True, **fields: Any) -> None:
+    """
+    This function updates a job in the Redis mirror and, if `persist`, in the
+    jobs table.
+    """
+    mirror_job(job_id, fields)
+
+    if not persist:
+        return
+
+    try:
+        get_service_supabase_client().table("jobs").update(fields).eq("job_id", job_id).execute()
+    except Exception as e:
+        logger.warning("Failed to update job %s: %s", job_id, e)
+
+def update_job_progress(job_id: Optional[str], progress: int) -> None:
+    """
+    This function records the progress (0-100) of a running job. Every change
+    goes to the mirror; the table is only written in steps of
+    `PROGRESS_PERSIST_STEP` to keep the audit trail cheap. The last written
+    value is kept in Redis, so the steps hold across the workers running the
+    stages of a job.
+    """
+    if not job_id:
+        return
+
+    try:
+        persist = bool(get_redis().register_script(PERSIST_PROGRESS_SCRIPT)(
+            keys=[_persisted_key(job_id)],
+            args=[progress, PROGRESS_PERSIST_STEP, JOB_MIRROR_TTL]
+        ))
+    except redis.RedisError as e:
+        # The table is the source of truth; without Redis every update goes there
+        logger.warning("Failed to read the persisted progress of job %s: %s", job_id, e)
+        persist = True
+
+    update_job(job_id, persist=persist, progress=progress)
+
+def mark_job_started(job_id: str) -> None:
+    """
+    This function marks a job as running. Only the first call per job records
+    `started_at`, so every stage of a task graph can call it.
+    """
+    try:
+        first = get_redis().set(f"job-started:{job_id}", 1, nx=True, ex=JOB_MIRROR_TTL)
+    except redis.RedisError:
+        first = True
+
+    if first:
+        update_job(job_id, status=RUNNING, started_at=_get_utc_iso())
+
+def mark_job_finished(job_id: str, error: Optional[str] = None) -> None:
+    """
+    This function records the final status of a job.
+    """
+    try:
+        get_redis().delete(_persisted_key(job_id))
+    except redis.RedisError as e:
+        logger.warning("Failed to clear the progress of job %s: %s", job_id, e)
+
+    if error is None:
+        update_job(job_id, status=SUCCEEDED, progress=100, finished_at=_get_utc_iso())
+    else:
+        update_job(job_id, status=FAILED, error=error, finished_at=_get_utc_iso())
+
+def add_job_items_done(job_id: Optional[str], chunk: int, items: int, total: int) -> None:
+    """
+    This function adds to the count of processed items of a job whose work is
+    split across tasks, and updates its progress accordingly. Each chunk is
+    counted once, whichever worker reports it and however often it is
+    delivered.
+
+    Args: (i) job_id - id of the job, or None for untracked work
+          (ii) chunk - index of the chunk within the job
+          (iii) items - items processed by the chunk
+          (iv) total - items of the whole job
+    """
+    if not job_id:
+        return
+
+    done = get_redis().register_script(ADD_CHUNK_SCRIPT)(
+        keys=[_chunks_key(job_id), _items_key(job_id)],
+        args=[chunk, items, JOB_MIRROR_TTL]
+    )
+    if done < 0:
+        logger.info("Chunk %d of job %s was already counted.", chunk, job_id)
+        return
+
+    update_job_progress(job_id, min(int(100 * done / total), 99))
+
+def _row_to_status(row: dict[str, Any]) -> dict[str, Any]:
+    # Normalizes a mirror hash or table row into a job status dictionary
+    status = {key: (value if value != "" else None) for key, value in row.items()}
+    status["progress"] = int(status.get("progress") or 0)
+
+    return status
+
+def get_job_status(job_id: str) -> Optional[dict[str, Any]]:
+    """
+    This function returns the status of a job from the Redis mirror, falling
+    back to the jobs table (and repopulating the mirror) on a miss.
+
+    Args: (i) job_id - id returned by `create_job`
+
+    Returns: the job status fields, or None if the job does not exist
+    """
+    try:
+        mirrored = get_redis().hgetall(_mirror_key(job_id))
+        if mirrored:
+            return _row_to_status(mirrored)
+    except redis.RedisError as e:
+        logger.warning("Job mirror unavailable for %s: %s", job_id, e)
+
+    response = (
+        get_service_supabase_client()
+        .table("jobs")
+        .select(JOB_STATUS_COLUMNS)
+        .eq("job_id", job_id)
+        .limit(1)
+        .execute()
+    )
+    if not response.data:
+        return None
+
+    row = response.data[0]
+    mirror_job(job_id, row)
+
+    return _row_to_status(row)
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, args=None, kwargs=None, **_) -> None:
+    job_id = (kwargs or {}).get("job_id") or (kwargs or {}).get("parent_job_id")
+    if job_id:
+        mark_job_started(job_id)
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, args=None, kwargs=None, retval=None, state=None, **_) -> None:
+    job_id = (kwargs or {}).get("job_id")
+    if not job_id or state == "RETRY":
+        return
+
+    mark_job_finished(job_id, error=None if state == "SUCCESS" else str(retval))
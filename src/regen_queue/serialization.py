@@ -0,0 +1,90 @@
+"""
+Binary serialization of Celery task messages and results.
+
+`msgpack-ext` is msgpack with extension types for the values our tasks pass
+around: datetimes and dates (including pandas timestamps) and NumPy arrays,
+which travel as raw buffers instead of per-element lists. NumPy scalars are
+sent as their Python equivalents. Messages are further compressed by kombu
+with `CELERY_COMPRESSION` (zstd by default; lz4 or gzip also work, "none"
+disables it).
+"""
+import os
+from datetime import date, datetime
+from typing import Any, Optional
+
+import msgpack
+import numpy as np
+import pandas as pd
+from kombu import compression
+from kombu.serialization import register
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SERIALIZER = "msgpack-ext"
+CONTENT_TYPE = "application/x-msgpack-ext"
+DEFAULT_COMPRESSION = "zstd"
+
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_NDARRAY = 3
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime): # includes pd.Timestamp and pd.NaT
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return obj.tolist()
+        header = msgpack.packb([obj.dtype.str, list(obj.shape)])
+        return msgpack.ExtType(EXT_NDARRAY, header + np.ascontiguousarray(obj).tobytes())
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f"Cannot serialize object of type {type(obj).__name__}")
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == EXT_DATETIME:
+        return pd.Timestamp(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == EXT_NDARRAY:
+        unpacker = msgpack.Unpacker()
+        unpacker.feed(data)
+        dtype, shape = next(unpacker)
+        offset = unpacker.tell()
+        return np.frombuffer(data, dtype=np.dtype(dtype), offset=offset).reshape(shape).copy()
+
+    return msgpack.ExtType(code, data)
+
+def dumps(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+def loads(data: bytes | str) -> Any:
+    if isinstance(data, str):
+        data = data.encode("latin-1")
+
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+def message_compression() -> Optional[str]:
+    """
+    This function returns the compression configured with `CELERY_COMPRESSION`,
+    or None if it is disabled or its library is not installed.
+    """
+    method = os.getenv("CELERY_COMPRESSION", DEFAULT_COMPRESSION).lower()
+    if method in ("", "none"):
+        return None
+
+    try:
+        compression.get_encoder(method)
+    except KeyError:
+        logger.warning("Compression %r is not available; sending uncompressed messages.", method)
+        return None
+
+    return method
+
+register(SERIALIZER, dumps, loads, content_type=CONTENT_TYPE, content_encoding="binary")
@@ -1,14 +1,418 @@
+import json
+import os
+import random
+from typing import Any, Iterable, Optional
+from uuid import uuid4
+
 import pandas as pd
+from celery import chain, chord, group
+from celery.result import AsyncResult
+
+from .celery_app import BULK_QUEUE, INTERACTIVE_QUEUE, celery_app
+from .jobs import add_job_items_done, mark_job_finished, update_job, update_job_progress
+from analytics.farm_stats import FarmDataProcessor, FarmStatsCalculator
+from services.choropleth import choropleth_indicators, farm_regions, warm_choropleth_artifacts
+from services.earth_engine_timeseries import (
+    MAX_POLYGONS,
+    NoObservationsError,
+    build_acquisition_index,
+    clean_vi_timeseries,
+    default_date_range,
+    get_raw_vi_timeseries,
+    initialize_ee,
+    label_timeseries,
+    validate_roi_dataframe
+)
+from services.earth_engine_images import available_acquisitions
+from services.farm_refresh import (
+    STATS_TABLES,
+    load_farms,
+    load_observations,
+    mark_refreshed,
+    next_start_date,
+    replace_farm_stats,
+    select_refresh_batches,
+    store_observations
+)
+from services.isda_soil_data import fetch_soil_records
+from services.region_cache import region_cache_context
+from services.result_store import cleanup_results, delete_result, read_result, write_result
+from services.thumbnail_cache import (
+    filmstrip_key,
+    get_or_render_filmstrip,
+    get_or_render_thumbnail,
+    get_thumbnail_cache,
+    thumbnail_key
+)
+from utils.ee_budget import EEBudgetExhausted
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+
+logger = get_logger(__name__)
 
-from .celery_app import celery_app
-from services.earth_engine_timeseries import combined_timeseries, initialize_ee
+THUMBNAIL_TASK_TTL = 300 # seconds a pending thumbnail task is shared between requests
+FILMSTRIP_ALIAS_TTL = 7 * 86400 # seconds a requested filmstrip key points at the rendered one
+THUMBNAIL_PREFETCH_LIMIT = int(os.getenv("THUMBNAIL_PREFETCH_LIMIT", 20)) # thumbnails enqueued per result
+CHUNK_SIZES = {INTERACTIVE_QUEUE: 1, BULK_QUEUE: 10} # polygons per fetch task
+LABEL_COLUMNS = ["uuid", "region", "area (acres)"]
+SERIES_COLUMNS = ["date", "geometry", "ndvi", "ndmi"]
+FARM_REFRESH_BATCH_SIZE = int(os.getenv("FARM_REFRESH_BATCH_SIZE", 25))
+EE_RETRY_COUNTDOWN = (30, 120) # seconds, jittered wait for a free Earth Engine slot
+FARM_REFRESH_MAX_RETRIES = int(os.getenv("FARM_REFRESH_MAX_RETRIES", 12))
 
-@celery_app.task(bind=True, name="task.fetch_timeseries")
-def fetch_timeseries(self, df_roi_records: list[dict]) -> list[dict]:
-    """Fetch VI data for given ROI."""
+@celery_app.task(
+    name="task.fetch_vi_chunk",
+    autoretry_for=(EEBudgetExhausted,),
+    max_retries=3,
+    retry_backoff=5,
+    retry_jitter=True
+)
+def fetch_vi_chunk(df_roi_records: list[dict], total: int, chunk: int, parent_job_id: Optional[str] = None) -> str:
+    """
+    Fetch the raw VI series of a chunk of polygons into the result store. The
+    chunk counts towards the job progress once it is stored, and only once
+    even if it is retried or redelivered to another worker.
+    """
     initialize_ee()
 
+    frames = [label_timeseries(get_raw_vi_timeseries(record["geometry"]), record) for record in df_roi_records]
+    raw_ref = write_result(pd.concat(frames, ignore_index=True), "raw-chunk")
+    add_job_items_done(parent_job_id, chunk, len(df_roi_records), total)
+
+    return raw_ref
+
+@celery_app.task(name="task.clean_vi_chunk")
+def clean_vi_chunk(raw_ref: str, parent_job_id: Optional[str] = None) -> str:
+    """Clean the VI series of each polygon in a fetched chunk."""
+    df = read_result(raw_ref, cached=False)
+
+    frames = []
+    for _, group_df in df.groupby("uuid", sort=False):
+        series = clean_vi_timeseries(group_df[SERIES_COLUMNS].reset_index(drop=True))
+        frames.append(label_timeseries(series, group_df[LABEL_COLUMNS].iloc[0]))
+
+    clean_ref = write_result(pd.concat(frames, ignore_index=True), "clean-chunk")
+    delete_result(raw_ref)
+
+    return clean_ref
+
+@celery_app.task(name="task.merge_vi_chunks")
+def merge_vi_chunks(chunk_refs: list[str], job_id: Optional[str] = None) -> dict:
+    """
+    Merge cleaned chunks into one time series and compute the farm statistics.
+    The series is written to the result store and only its `result_ref` is
+    returned, along with the acquisition-date index and the statistics.
+    """
+    df = pd.concat([read_result(ref, cached=False) for ref in chunk_refs], ignore_index=True)
+
+    result_ref = write_result(df, "timeseries")
+    if job_id:
+        update_job(job_id, result_ref=result_ref)
+
+    stats = FarmStatsCalculator(FarmDataProcessor()).calculate_stats(df)
+
+    for ref in chunk_refs:
+        delete_result(ref)
+
+    return {
+        "result_ref": result_ref,
+        "acquisition_dates": build_acquisition_index(df),
+        "stats": stats,
+    }
+
+@celery_app.task(name="task.fail_job")
+def fail_job(request, exc, traceback, failed_job_id: str) -> None:
+    """Errback marking a job failed when any stage of its task graph fails."""
+    mark_job_finished(failed_job_id, error=str(exc))
+
+def _json_records(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Timestamps and numpy scalars become plain values the database driver accepts
+    return json.loads(pd.DataFrame(records).to_json(orient="records", date_format="iso"))
+
+def submit_vi_timeseries(
+        df_roi_records: list[dict],
+        job_id: Optional[str] = None,
+        queue: str = INTERACTIVE_QUEUE,
+        task_id: Optional[str] = None,
+        priority: int = 0
+) -> AsyncResult:
+    """
+    Enqueue the VI time-series graph for a set of polygons: per-chunk fetch and
+    clean stages fanned out across the workers, joined by a chord that merges
+    the chunks and computes statistics. The returned result (whose id is
+    `task_id` if given) is that of the merge task.
+
+    Interactive dashboard requests run on the `interactive` queue one polygon
+    per task; bulk work uses the `bulk` queue with larger chunks, so it never
+    delays interactive requests on workers that serve both queues. Every task of
+    the graph carries the broker `priority` chosen by admission control.
+
+    Raises ValueError, before anything is enqueued, if the polygons fail
+    `validate_roi_dataframe`; only the interactive queue caps their number.
+    """
+    max_polygons = MAX_POLYGONS if queue == INTERACTIVE_QUEUE else None
+    validate_roi_dataframe(pd.DataFrame(df_roi_records), max_polygons=max_polygons)
+
+    chunk_size = CHUNK_SIZES[queue]
+    chunks = [df_roi_records[i:i + chunk_size] for i in range(0, len(df_roi_records), chunk_size)]
+
+    header = group(
+        chain(
+            fetch_vi_chunk.s(chunk, len(df_roi_records), index, parent_job_id=job_id).set(queue=queue, priority=priority),
+            clean_vi_chunk.s(parent_job_id=job_id).set(queue=queue, priority=priority)
+        )
+        for index, chunk in enumerate(chunks)
+    )
+    body = merge_vi_chunks.s(job_id=job_id).set(queue=queue, priority=priority)
+    if job_id:
+        body = body.on_error(fail_job.s(failed_job_id=job_id).set(queue=queue))
+
+    return chord(header, body).apply_async(task_id=task_id or str(uuid4()))
+
+@celery_app.task(name="task.fetch_soil_data")
+def fetch_soil_data(df_roi_records: list[dict], job_id: Optional[str] = None) -> list[dict]:
+    """Fetch iSDA soil data for given ROI, reporting request progress."""
+    last_percent = -1
+
+    def report_progress(completed: int, total: int) -> None:
+        nonlocal last_percent
+        percent = int(100 * completed / total)
+
+        # Only update the job when the percentage changes
+        if percent != last_percent:
+            last_percent = percent
+            update_job_progress(job_id, percent)
+
     df_roi = pd.DataFrame(df_roi_records)
-    df = combined_timeseries(df_roi)
 
-    return df.to_dict("records")
+    return fetch_soil_records(df_roi, progress_callback=report_progress)
+
+@celery_app.task(name="task.cleanup_results")
+def cleanup_expired_results() -> int:
+    """Delete stored task results older than RESULT_TTL_HOURS."""
+    return cleanup_results()
+
+@celery_app.task(name="task.schedule_farm_refresh")
+def schedule_farm_refresh(limit: Optional[int] = None) -> int:
+    """
+    Enqueue the refresh of all stored farm polygons (or the `limit` least
+    recently refreshed) in batches on the bulk queue. Scheduled off-peak by
+    beat; returns the number of batches.
+    """
+    batches = select_refresh_batches(FARM_REFRESH_BATCH_SIZE, limit)
+
+    for uuids in batches:
+        refresh_farm_batch.apply_async(args=[uuids], queue=BULK_QUEUE)
+
+    logger.info("Scheduled %d farm refresh batches.", len(batches))
+
+    return len(batches)
+
+def _recompute_farm_stats(df_farms: pd.DataFrame) -> None:
+    # Statistics are computed over each farm's full stored history, as for a new submission
+    df_obs = load_observations(df_farms["uuid"].tolist(), default_date_range()[0])
+
+    frames = []
+    for farm in df_farms.to_dict("records"):
+        series = df_obs[df_obs["uuid"] == farm["uuid"]].drop(columns="uuid").reset_index(drop=True)
+        series.insert(1, "geometry", farm["geometry"])
+
+        try:
+            frames.append(label_timeseries(clean_vi_timeseries(series[SERIES_COLUMNS]), farm))
+        except ValueError as e:
+            logger.warning("Skipping statistics of farm %s: %s", farm["uuid"], e)
+
+    if not frames:
+        return
+
+    df = pd.concat(frames, ignore_index=True)
+    stats = FarmStatsCalculator(FarmDataProcessor()).calculate_stats(df)
+
+    replace_farm_stats(
+        {name: _json_records(records) for name, records in stats.items()},
+        df["uuid"].unique().tolist()
+    )
+
+@celery_app.task(bind=True, name="task.refresh_farm_batch", max_retries=FARM_REFRESH_MAX_RETRIES)
+def refresh_farm_batch(self, uuids: list[str]) -> dict:
+    """
+    Refresh a batch of stored farms: fetch only the Sentinel-2 observations
+    newer than each farm's watermark, store them, and recompute the statistics
+    of farms that gained observations.
+
+    Earth Engine calls go through the global rate-limit coordinator. When it
+    grants no lease in time the farms processed so far are committed and the
+    remainder is retried later, up to `FARM_REFRESH_MAX_RETRIES` times; farms
+    still pending after that are left to the next scheduled refresh, which
+    picks the least recently refreshed farms first.
+    """
+    initialize_ee()
+    df_farms = load_farms(uuids)
+
+    watermarks = {}
+    pending = []
+    for i, farm in enumerate(df_farms.to_dict("records")):
+        try:
+            series = get_raw_vi_timeseries(farm["geometry"], start_date=next_start_date(farm["last_observation_date"]))
+        except EEBudgetExhausted:
+            pending = df_farms["uuid"].iloc[i:].tolist()
+            break
+        except NoObservationsError:
+            watermarks[farm["uuid"]] = None
+            continue
+        except Exception as e:
+            logger.warning("Failed to refresh farm %s: %s", farm["uuid"], e)
+            continue
+
+        series.insert(0, "uuid", farm["uuid"])
+        store_observations(series)
+        watermarks[farm["uuid"]] = series["date"].max().date()
+
+    updated = [uuid for uuid, watermark in watermarks.items() if watermark is not None]
+    if updated:
+        _recompute_farm_stats(df_farms[df_farms["uuid"].isin(updated)])
+        enqueue_choropleth_rebuild(updated, STATS_TABLES)
+
+    mark_refreshed(watermarks)
+
+    if pending and self.request.retries < self.max_retries:
+        raise self.retry(args=[pending], countdown=random.uniform(*EE_RETRY_COUNTDOWN))
+    if pending:
+        logger.warning("Deferring %d farms to the next refresh after %d retries.", len(pending), self.request.retries)
+
+    return {"refreshed": len(watermarks), "updated": len(updated), "deferred": len(pending)}
+
+@celery_app.task(name="task.rebuild_choropleth_artifacts")
+def rebuild_choropleth_artifacts(uuids: list[str], tables: list[str]) -> int:
+    """
+    Rebuild the choropleth artifacts read from `tables` in the regions of the
+    farms `uuids`, after those farms were inserted or refreshed.
+    """
+    indicators = choropleth_indicators(tables)
+    regions = farm_regions(uuids)
+    if not indicators or not regions:
+        return 0
+
+    with region_cache_context():
+        return warm_choropleth_artifacts(regions, indicators)
+
+def enqueue_choropleth_rebuild(uuids: list[str], tables: list[str]) -> None:
+    """
+    Enqueue `rebuild_choropleth_artifacts` when any of `tables` feeds the map.
+    Failures are logged rather than raised so that an insert never fails
+    because of it; the artifacts are then rebuilt on the next lookup.
+    """
+    if not uuids or not choropleth_indicators(tables):
+        return
+
+    try:
+        rebuild_choropleth_artifacts.delay(list(uuids), list(tables))
+    except Exception as e:
+        logger.warning("Failed to enqueue the choropleth rebuild for %s: %s", tables, e)
+
+@celery_app.task(name="task.render_rgb_thumbnail")
+def render_rgb_thumbnail(wkt: str, date: str) -> dict:
+    """Render the RGB thumbnail of a polygon into the shared thumbnail cache."""
+    try:
+        return {"key": get_or_render_thumbnail(wkt, date)}
+    finally:
+        # Later requests either hit the cache or start a fresh render
+        get_redis().delete(f"thumbnail-task:{thumbnail_key(wkt, date)}")
+
+@celery_app.task(name="task.render_rgb_filmstrip")
+def render_rgb_filmstrip(wkt: str, dates: list[str]) -> dict:
+    """
+    Render an RGB filmstrip of a polygon over several dates into the thumbnail
+    cache. Dates without an acquisition are dropped rather than failing the
+    strip; the returned dates are those of the rendered frames.
+    """
+    requested_key = filmstrip_key(wkt, dates)
+
+    try:
+        available = available_acquisitions(wkt, dates)
+        if len(available) < len(dates):
+            logger.info("Dropped %d filmstrip dates without an acquisition.", len(dates) - len(available))
+
+        key = get_or_render_filmstrip(wkt, available) if available else None
+        if key is not None and key != requested_key:
+            # The strip is cached under its rendered dates; repeated requests find it through the alias
+            get_redis().set(
+                f"filmstrip-alias:{requested_key}",
+                json.dumps({"key": key, "dates": available}),
+                ex=FILMSTRIP_ALIAS_TTL
+            )
+
+        return {"key": key, "dates": available}
+    finally:
+        get_redis().delete(f"thumbnail-task:{requested_key}")
+
+def _enqueue_coalesced(key: str, task, args: list) -> tuple[Optional[str], Optional[str]]:
+    # Returns (key, None) on a cache hit, otherwise (None, id of the task rendering the key)
+    if get_thumbnail_cache().contains(key):
+        return key, None
+
+    redis_client = get_redis()
+    redis_key = f"thumbnail-task:{key}"
+    task_id = str(uuid4())
+
+    while True:
+        if redis_client.set(redis_key, task_id, nx=True, ex=THUMBNAIL_TASK_TTL):
+            task.apply_async(args=args, task_id=task_id)
+            return None, task_id
+
+        # Another request owns the render; the key may expire between the two calls
+        existing_task_id = redis_client.get(redis_key)
+        if existing_task_id:
+            return None, existing_task_id
+
+def enqueue_rgb_thumbnail(wkt: str, date: str) -> tuple[Optional[str], Optional[str]]:
+    """
+    Returns (cache key, None) when the thumbnail is already cached, otherwise
+    (None, task id) of the task rendering it. Requests for the same thumbnail
+    share one pending task, so concurrent users are coalesced onto a single
+    Earth Engine render.
+    """
+    return _enqueue_coalesced(thumbnail_key(wkt, date), render_rgb_thumbnail, [wkt, date])
+
+def enqueue_rgb_filmstrip(wkt: str, dates: list[str]) -> tuple[Optional[str], list[str], Optional[str]]:
+    """
+    Filmstrip counterpart of `enqueue_rgb_thumbnail`: all dates are rendered by
+    one task and one Earth Engine computation. Returns (cache key, dates of the
+    frames, None) on a cache hit, otherwise (None, dates, task id). A strip
+    whose render dropped dates without an acquisition is cached under the
+    rendered dates, so it is found through the alias left by the task.
+    """
+    requested_key = filmstrip_key(wkt, dates)
+
+    alias = get_redis().get(f"filmstrip-alias:{requested_key}")
+    if alias:
+        filmstrip = json.loads(alias)
+        if get_thumbnail_cache().contains(filmstrip["key"]):
+            return filmstrip["key"], filmstrip["dates"], None
+
+    key, task_id = _enqueue_coalesced(requested_key, render_rgb_filmstrip, [wkt, dates])
+
+    return key, dates, task_id
+
+def prefetch_thumbnails(requests: Iterable[tuple[str, str]]) -> int:
+    """
+    Enqueue the render of thumbnails for (wkt, date) pairs, at most
+    `THUMBNAIL_PREFETCH_LIMIT` of them, so the corresponding clicks are served
+    from the cache. Renders run on the workers and are coalesced with the
+    click-triggered ones; the web process only enqueues. They land in the
+    shared thumbnail store (`THUMBNAIL_STORE_URI`), which any web process can
+    serve and whose size budget bounds them, rather than on the rendering
+    worker's disk. Returns the number of renders enqueued or already pending.
+    """
+    enqueued = 0
+    for wkt, date in list(dict.fromkeys(requests))[:THUMBNAIL_PREFETCH_LIMIT]:
+        try:
+            _, task_id = enqueue_rgb_thumbnail(wkt, date)
+        except Exception as e:
+            # Prefetching is best effort; the click enqueues the render again
+            logger.warning("Thumbnail prefetch failed for %s: %s", date, e)
+            continue
+
+        enqueued += task_id is not None
+
+    return enqueued
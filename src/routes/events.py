@@ -0,0 +1,85 @@
+# Server-Sent Events streaming job status changes to the dashboards
+import json
+import re
+import time
+from typing import Any, Iterator
+
+import redis
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+from regen_queue.jobs import TERMINAL_STATUSES, get_job_status, job_channel
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f-]{36}$")
+MAX_JOBS_PER_STREAM = 10
+HEARTBEAT_INTERVAL = 15 # seconds; keeps proxies from closing idle streams
+MAX_STREAM_SECONDS = 600 # EventSource reconnects transparently after this
+
+events_bp = Blueprint("events", __name__, url_prefix="/events")
+
+def _format_event(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _stream_jobs(job_ids: list[str]) -> Iterator[str]:
+    """
+    This function yields the current status of each job, then a new status
+    event whenever a job changes, until every job has finished.
+    """
+    # Subscribe before the initial read so no change between the two is missed
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*[job_channel(job_id) for job_id in job_ids])
+
+    try:
+        finished = set()
+        for job_id in job_ids:
+            status = get_job_status(job_id)
+            if status is None or status["status"] in TERMINAL_STATUSES:
+                finished.add(job_id)
+            yield _format_event("job", {"job_id": job_id, **(status or {"status": "missing"})})
+
+        deadline = time.monotonic() + MAX_STREAM_SECONDS
+        while len(finished) < len(job_ids) and time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=HEARTBEAT_INTERVAL)
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+
+            job_id = message["channel"].removeprefix("job-events:")
+            status = get_job_status(job_id)
+            if status is None:
+                continue
+
+            if status["status"] in TERMINAL_STATUSES:
+                finished.add(job_id)
+            yield _format_event("job", {"job_id": job_id, **status})
+
+        if len(finished) == len(job_ids):
+            yield _format_event("done", {"job_ids": job_ids})
+
+    except redis.RedisError as e:
+        logger.warning("Job event stream interrupted: %s", e)
+
+    finally:
+        pubsub.close()
+
+@events_bp.route("/jobs", methods=["GET"])
+def job_events() -> Response:
+    """
+    This function streams status changes of the jobs given as a comma-separated
+    `ids` query parameter, e.g. `/events/jobs?ids=<job_id>,<job_id>`.
+    """
+    job_ids = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+
+    if not job_ids or len(job_ids) > MAX_JOBS_PER_STREAM:
+        abort(400)
+    if not all(JOB_ID_PATTERN.match(job_id) for job_id in job_ids):
+        abort(400)
+
+    return Response(
+        stream_with_context(_stream_jobs(job_ids)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,33 @@
+# Flask routes exposing operational counters as JSON
+from flask import Blueprint, jsonify
+from werkzeug.wrappers import Response
+
+from db.engine import pool_stats
+from regen_queue.dedupe import get_dedupe_stats
+from utils.ee_budget import get_ee_budget_stats
+
+metrics_bp = Blueprint("metrics", __name__, url_prefix="/metrics")
+
+@metrics_bp.route("/dedupe", methods=["GET"])
+def dedupe_metrics() -> Response:
+    """
+    This function reports how many VI submissions reused an identical
+    in-flight or recent job (hits) versus enqueued new work (misses).
+    """
+    return jsonify(get_dedupe_stats())
+
+@metrics_bp.route("/ee", methods=["GET"])
+def ee_metrics() -> Response:
+    """
+    This function reports the limits, current usage and counters of the
+    Earth Engine rate-limit coordinator shared by all workers.
+    """
+    return jsonify(get_ee_budget_stats())
+
+@metrics_bp.route("/db", methods=["GET"])
+def db_metrics() -> Response:
+    """
+    This function reports the connection pool usage and checkout times of
+    the database engines of this web process.
+    """
+    return jsonify(pool_stats())
@@ -0,0 +1,23 @@
+# Flask routes reporting the health of external dependencies
+import redis
+from flask import Blueprint, jsonify
+from werkzeug.wrappers import Response
+
+from regen_queue.breakers import get_fleet_breaker_states
+from utils.resilience import breaker_states
+
+status_bp = Blueprint("status", __name__, url_prefix="/status")
+
+@status_bp.route("/breakers", methods=["GET"])
+def breakers_status() -> Response:
+    """
+    This function reports the circuit breakers of the external endpoints
+    (Earth Engine, iSDA): the live state in this web process, and the last
+    state change published by every process of the fleet.
+    """
+    try:
+        fleet = get_fleet_breaker_states()
+    except redis.RedisError as e:
+        fleet = {"error": str(e)}
+
+    return jsonify({"local": breaker_states(), "fleet": fleet})
@@ -0,0 +1,100 @@
+# Flask routes serving cached Sentinel-2 thumbnails
+import re
+
+import shapely
+from celery.result import AsyncResult
+from flask import Blueprint, abort, jsonify, request, session
+from werkzeug.wrappers import Response
+
+from regen_queue.admission import AdmissionRejected, admit_render, client_weight
+from regen_queue.celery_app import celery_app
+from regen_queue.tasks import enqueue_rgb_filmstrip
+from services.earth_engine_images import filmstrip_dates
+from services.thumbnail_cache import THUMBNAIL_ROUTE, filmstrip_metadata, get_thumbnail_cache
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+thumbnails_bp = Blueprint("thumbnails", __name__, url_prefix=THUMBNAIL_ROUTE)
+
+@thumbnails_bp.route("/<key>.png", methods=["GET"])
+def get_thumbnail(key: str) -> Response:
+    """
+    This function serves a cached thumbnail from the shared thumbnail store.
+    Keys are content hashes, so the key doubles as the ETag and the response
+    can be cached by the browser.
+    """
+    if not KEY_PATTERN.match(key):
+        abort(404)
+
+    data = get_thumbnail_cache().get(key)
+    if data is None:
+        abort(404)
+
+    response = Response(data, mimetype="image/png")
+    response.set_etag(key)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+
+    return response.make_conditional(request)
+
+@thumbnails_bp.route("/filmstrip", methods=["POST"])
+def create_filmstrip() -> tuple[Response, int]:
+    """
+    This function requests the RGB filmstrip of one polygon over a list of
+    dates, e.g. `{"wkt": "POLYGON(...)", "dates": ["2024-03-01", ...]}`.
+    With the polygon's acquisition index (`"acquisition_dates"`, as returned
+    with its VI time series) the dates are snapped to real acquisitions, as in
+    the dashboard; otherwise dates without an acquisition are dropped when the
+    strip is rendered.
+
+    Returns 200 with the filmstrip URL if it is cached, otherwise 202 with the
+    id of the render task to poll at `/thumbnails/filmstrip/<task_id>`. The
+    polled result lists the dates of the rendered frames. Requests are rate
+    limited per client (429).
+    """
+    payload = request.get_json(silent=True) or {}
+    wkt = payload.get("wkt")
+    dates = payload.get("dates")
+    acquisition_dates = payload.get("acquisition_dates")
+
+    if not isinstance(wkt, str) or not isinstance(dates, list) or not dates:
+        return jsonify({"error": "Expected a polygon 'wkt' and a non-empty list of 'dates'."}), 400
+    if acquisition_dates is not None and not isinstance(acquisition_dates, list):
+        return jsonify({"error": "'acquisition_dates' must be a list of dates."}), 400
+
+    try:
+        if not isinstance(shapely.from_wkt(wkt), shapely.Polygon):
+            return jsonify({"error": "'wkt' must be a single POLYGON."}), 400
+        dates = filmstrip_dates(dates, acquisition_dates)
+    except (shapely.errors.GEOSException, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    user_id = session.get("user_id")
+    client = user_id or request.remote_addr or "anonymous" # address resolved by ProxyFix from the trusted proxy hops
+    try:
+        admit_render(client, client_weight(user_id))
+    except AdmissionRejected as e:
+        return jsonify({"error": str(e)}), 429
+
+    key, dates, task_id = enqueue_rgb_filmstrip(wkt, dates)
+
+    if key is not None:
+        return jsonify(filmstrip_metadata(key, dates)), 200
+
+    return jsonify({"task_id": task_id, "dates": dates}), 202
+
+@thumbnails_bp.route("/filmstrip/<task_id>", methods=["GET"])
+def get_filmstrip_status(task_id: str) -> tuple[Response, int]:
+    """
+    This function reports the state of a filmstrip render task, and the
+    filmstrip URL once it has been rendered.
+    """
+    result = AsyncResult(task_id, app=celery_app)
+
+    if not result.ready():
+        return jsonify({"state": result.state}), 202
+
+    if result.failed() or result.result.get("key") is None:
+        return jsonify({"state": "FAILURE", "error": "No satellite images available for these dates."}), 200
+
+    return jsonify({"state": result.state, **filmstrip_metadata(result.result["key"], result.result["dates"])}), 200
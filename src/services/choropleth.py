@@ -0,0 +1,205 @@
+"""
+Precomputed choropleth artifacts of the Farmland Statistics map.
+
+An artifact holds everything the map of one (region, indicator) needs: the
+farm polygons simplified to `CHOROPLETH_TOLERANCE` degrees and rounded to
+`CHOROPLETH_PRECISION`, their indicator values, and the map centre and bounds.
+Polygons forming a valid coverage are simplified together so that shared
+edges stay shared; otherwise each polygon is simplified on its own with its
+topology preserved.
+
+Artifacts are stored in the region cache keyed on the tables they are built
+from, so an insert into those tables makes the next lookup rebuild them. The
+inserts and the farm refresh also enqueue `task.rebuild_choropleth_artifacts`,
+which rebuilds the affected artifacts on a worker right away, so the first
+visitor after an insert does not pay for it. `warm_choropleth_artifacts`
+(also `python -m services.choropleth`) prebuilds them, e.g. after bulk loads.
+"""
+import os
+from typing import Any, Iterable, Optional
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from sqlalchemy import text
+
+from db.engine import get_engine
+from services.region_cache import cached_region_result, region_cache_context
+from utils.geometry import centroids_lat_lon
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CHOROPLETH_TOLERANCE = float(os.getenv("CHOROPLETH_TOLERANCE", 5e-5)) # degrees, about 5 m
+CHOROPLETH_PRECISION = 1e-6 # degrees, about 0.1 m
+
+VI_INDICATORS = ["ndmi_max"]
+SOIL_INDICATORS = [
+    "bulk_density",
+    "calcium_extractable",
+    "carbon_organic",
+    "carbon_total",
+    "clay_content",
+    "iron_extractable",
+    "magnesium_extractable",
+    "nitrogen_total",
+    "ph",
+    "phosphorous_extractable",
+    "potassium_extractable",
+    "sand_content",
+    "silt_content",
+    "stone_content",
+    "sulphur_extractable",
+    "texture_class",
+    "zinc_extractable"
+]
+
+def choropleth_tables(indicator: str) -> tuple[str, ...]:
+    # Tables an indicator is read from
+    return ("peakvidistribution", "farmpolygons") if indicator in VI_INDICATORS else ("soildata",)
+
+def choropleth_indicators(tables: Iterable[str]) -> list[str]:
+    """
+    This function returns the indicators whose artifacts are built from any
+    of `tables`.
+    """
+    tables = set(tables)
+
+    return [
+        indicator
+        for indicator in VI_INDICATORS + SOIL_INDICATORS
+        if tables.intersection(choropleth_tables(indicator))
+    ]
+
+def farm_regions(uuids: list[str]) -> list[str]:
+    """
+    This function returns the regions of the stored farms `uuids`.
+    """
+    query = text("SELECT DISTINCT region FROM farmpolygons WHERE uuid = ANY(:uuids) AND region IS NOT NULL")
+
+    with get_engine().connect() as conn:
+        return [row.region for row in conn.execute(query, {"uuids": list(uuids)})]
+
+def choropleth_query(indicator: str) -> str:
+    """
+    This function returns the query selecting the polygons of a region and
+    their indicator values.
+    """
+    if indicator in VI_INDICATORS:
+        return f"""
+            SELECT
+                p.uuid,
+                f.geometry,
+                AVG(p.{indicator}) AS {indicator}
+            FROM peakvidistribution p
+            INNER JOIN farmpolygons f ON p.uuid = f.uuid
+            WHERE f.region = %(region)s
+            GROUP BY p.uuid, f.geometry;
+        """
+
+    if indicator not in SOIL_INDICATORS:
+        logger.error(f"Invalid map indicator: {indicator}")
+        raise ValueError(f"Invalid map indicator: {indicator}")
+
+    return f"""
+        SELECT
+            uuid,
+            geometry,
+            {indicator}
+        FROM soildata
+        WHERE region = %(region)s;
+    """
+
+def simplify_polygons(geometries: np.ndarray, tolerance: float = CHOROPLETH_TOLERANCE) -> np.ndarray:
+    """
+    This function simplifies polygons without breaking their topology: as a
+    coverage when they form one (no overlaps), otherwise one by one.
+    """
+    if len(geometries) == 0:
+        return geometries
+
+    if shapely.coverage_is_valid(geometries):
+        simplified = shapely.coverage_simplify(geometries, tolerance)
+    else:
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+    return shapely.set_precision(simplified, CHOROPLETH_PRECISION)
+
+def build_choropleth_artifact(region: str, indicator: str) -> dict[str, Any]:
+    """
+    This function builds the choropleth artifact of a region and indicator.
+
+    Args: (i) region - region name
+          (ii) indicator - map indicator (VI or soil property)
+
+    Returns: dict with the GeoJSON FeatureCollection keyed by uuid, the
+             locations and values to plot, and the map centre and bounds
+             (both None when the region has no data)
+    """
+    gdf = gpd.read_postgis(choropleth_query(indicator), get_engine(), geom_col="geometry", params={"region": region})
+
+    geometries = gdf.geometry.to_numpy()
+    simplified = simplify_polygons(geometries)
+    values = [None if value is None or np.isnan(value) else float(value) for value in gdf[indicator].astype(float)]
+
+    features = [
+        {"type": "Feature", "id": uuid, "properties": {}, "geometry": geometry.__geo_interface__}
+        for uuid, geometry in zip(gdf["uuid"], simplified)
+    ]
+
+    center, bounds = None, None
+    if len(gdf):
+        # Centre the map on the mean of the (equal-area) polygon centroids
+        lat, lon = centroids_lat_lon(geometries)
+        center = {"lat": float(np.nanmean(lat)), "lon": float(np.nanmean(lon))}
+        bounds = [float(b) for b in shapely.total_bounds(geometries)]
+
+    return {
+        "geojson": {"type": "FeatureCollection", "features": features},
+        "locations": list(gdf["uuid"]),
+        "values": values,
+        "center": center,
+        "bounds": bounds,
+    }
+
+def get_choropleth_artifact(region: str, indicator: str) -> dict[str, Any]:
+    """
+    This function returns the cached choropleth artifact of a region and
+    indicator, building it if it is missing or stale.
+    """
+    return cached_region_result(
+        "choropleth_artifact",
+        choropleth_tables(indicator),
+        region,
+        lambda: build_choropleth_artifact(region, indicator),
+        indicator=indicator
+    )
+
+def warm_choropleth_artifacts(regions: list[str], indicators: Optional[list[str]] = None) -> int:
+    """
+    This function prebuilds the choropleth artifacts of the given regions for
+    every indicator (or the given ones). Must run with the region cache
+    attached to a Flask app (see `region_cache_context`).
+
+    Returns: number of artifacts looked up (built when missing or stale)
+    """
+    indicators = indicators or VI_INDICATORS + SOIL_INDICATORS
+
+    for region in regions:
+        for indicator in indicators:
+            get_choropleth_artifact(region, indicator)
+
+    logger.info("Warmed %d choropleth artifacts for %s.", len(regions) * len(indicators), ", ".join(regions))
+
+    return len(regions) * len(indicators)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prebuild the choropleth artifacts of the Farmland Statistics map.")
+    parser.add_argument("regions", nargs="+", help="region names")
+    parser.add_argument("--indicator", action="append", dest="indicators", help="indicator to build (default: all)")
+    args = parser.parse_args()
+
+    with region_cache_context():
+        warm_choropleth_artifacts(args.regions, args.indicators)
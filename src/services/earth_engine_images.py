@@ -1,7 +1,40 @@
 # Scripts for generating GEE thumbnails of Sentinel-2 rasters
+from bisect import bisect_left
+from datetime import datetime
+import os
+from typing import Any, Callable, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
 import ee
 from shapely import from_wkt
 
+from services.earth_engine_timeseries import initialize_ee, is_transient_ee_error
+from utils.ee_budget import ee_slot
+from utils.logging_config import get_logger
+from utils.resilience import EndpointPolicy, call_external, register_endpoint
+
+logger = get_logger(__name__)
+
+RGB_WINDOW_DAYS = 1
+RGB_VIS_PARAMS = {
+    "scale": 10,
+    "bands": ["B4", "B3", "B2"],
+    "min": 0.0,
+    "max": 0.4,
+    "gamma": 1.3
+}
+THUMBNAIL_DOWNLOAD_TIMEOUT = 60 # seconds
+FILMSTRIP_MAX_FRAMES = 24
+
+# Calls hold an Earth Engine lease (taken outside the attempt timeout), so none of them is hedged
+EE_DATES_ENDPOINT = "earth_engine.image_dates"
+EE_THUMBNAIL_ENDPOINT = "earth_engine.thumbnail"
+EE_FILMSTRIP_ENDPOINT = "earth_engine.filmstrip"
+register_endpoint(EE_DATES_ENDPOINT, EndpointPolicy(timeout=60.0))
+register_endpoint(EE_THUMBNAIL_ENDPOINT, EndpointPolicy(timeout=float(os.getenv("EE_THUMBNAIL_TIMEOUT", 90)), retries=1))
+register_endpoint(EE_FILMSTRIP_ENDPOINT, EndpointPolicy(timeout=float(os.getenv("EE_FILMSTRIP_TIMEOUT", 120)), retries=1))
+
 def convert_wkt_to_ee_geometry(wkt: str) -> ee.Geometry:
     """
     This function converts WKT string representation of geometries
@@ -45,27 +78,27 @@ def get_image_dates(image_collection: ee.ImageCollection):
                         .map(lambda time: ee.Date(time).format("YYYY-MM-dd"))
     )
 
-    return dates.getInfo()
+    return call_external(EE_DATES_ENDPOINT, dates.getInfo, is_failure=is_transient_ee_error, lease=ee_slot)
 
-def get_rgb_image(geometry: ee.Geometry, start_date: str) -> ee.Image:
+def get_rgb_image(geometry: ee.Geometry, date: str) -> ee.Image:
     """
-    This function retrieves the least cloudy image of the given polygon
-    at a specified 10-day window.
+    This function retrieves the Sentinel-2 acquisition of the given polygon on a
+    specific date. Dates are expected to come from the polygon's acquisition
+    index (see `snap_to_acquisition`), so the one-day window always contains an
+    image; scenes from adjacent tiles on the same day are mosaicked.
     """
-    start_date = ee.Date(start_date)
-    next_date = start_date.advance(30, "day")
+    start_date = ee.Date(date)
+    next_date = start_date.advance(RGB_WINDOW_DAYS, "day")
 
-    # Get Sentinel-2 image collection, filter and sort by cloud cover
+    # Get Sentinel-2 image collection for the acquisition day
     s2 = (
         ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
         .filterBounds(geometry)
         .filterDate(start_date, next_date)
         .map(mask_s2_clouds)
-        .sort("CLOUD_COVER")
     )
 
-    # Take the first (least cloudy) image
-    image = ee.Image(s2.first())
+    image = s2.mosaic()
 
     # Select RGB bands
     rgb = image.select(["B4", "B3", "B2"]).clip(geometry)
@@ -77,3 +110,126 @@ def get_rgb_image(geometry: ee.Geometry, start_date: str) -> ee.Image:
     rgb_scaled = rgb.divide(10000)
 
     return rgb_scaled
+
+def _download_thumbnail(endpoint: str, thumbnail_url: Callable[[], str]) -> bytes:
+    # The image is computed while the URL is fetched, so the lease covers both calls
+    def fetch() -> bytes:
+        image_url = thumbnail_url()
+
+        with urlopen(image_url, timeout=THUMBNAIL_DOWNLOAD_TIMEOUT) as response:
+            return response.read()
+
+    return call_external(endpoint, fetch, is_failure=is_transient_ee_error, lease=ee_slot)
+
+def rgb_thumbnail_params(wkt: str) -> dict[str, Any]:
+    """
+    This function returns the thumbnail parameters for a polygon. The region is
+    the bounding box computed locally from the WKT, which saves the
+    `bounds().getInfo()` round trip to Earth Engine.
+    """
+    minx, miny, maxx, maxy = from_wkt(wkt).bounds
+    region = [[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]
+
+    return {"region": region, **RGB_VIS_PARAMS}
+
+def render_rgb_thumbnail(wkt: str, date: str) -> Optional[bytes]:
+    """
+    This function renders the RGB thumbnail of a polygon at a given date and
+    returns the PNG bytes, or None if no image is available.
+
+    Args: (i) wkt - polygon geometry in WKT
+          (ii) date - acquisition date (YYYY-MM-DD)
+
+    Returns: PNG image bytes or None
+    """
+    initialize_ee()
+
+    try:
+        rgb_image = get_rgb_image(convert_wkt_to_ee_geometry(wkt), date)
+
+        return _download_thumbnail(EE_THUMBNAIL_ENDPOINT, lambda: rgb_image.getThumbURL(rgb_thumbnail_params(wkt)))
+
+    except (ee.EEException, HTTPError, URLError) as e:
+        # Raised when the filtered collection is empty or the download fails, among other errors
+        logger.warning("No RGB image for %s: %s", date, e)
+        return None
+
+def filmstrip_dates(dates: list[str], acquisition_dates: Optional[list[str]] = None) -> list[str]:
+    """
+    This function normalizes the dates of a filmstrip: validated, snapped to
+    the polygon's acquisition index when one is given, de-duplicated, in
+    chronological order and capped at `FILMSTRIP_MAX_FRAMES` frames.
+    """
+    for date in dates:
+        datetime.strptime(date, "%Y-%m-%d")
+
+    if acquisition_dates:
+        acquisition_dates = sorted(acquisition_dates)
+        dates = [snap_to_acquisition(acquisition_dates, date) for date in dates]
+
+    return sorted(set(dates))[:FILMSTRIP_MAX_FRAMES]
+
+def available_acquisitions(wkt: str, dates: list[str]) -> list[str]:
+    """
+    This function returns the dates, in their order, on which Sentinel-2 has an
+    acquisition of the polygon; a filmstrip with a date without one cannot be
+    rendered. One Earth Engine call covers the span of the dates.
+    """
+    if not dates:
+        return []
+
+    initialize_ee()
+
+    collection = (
+        ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+        .filterBounds(convert_wkt_to_ee_geometry(wkt))
+        .filterDate(ee.Date(min(dates)), ee.Date(max(dates)).advance(RGB_WINDOW_DAYS, "day"))
+    )
+    available = set(get_image_dates(collection))
+
+    return [date for date in dates if date in available]
+
+def render_rgb_filmstrip(wkt: str, dates: list[str]) -> Optional[bytes]:
+    """
+    This function renders the RGB composites of a polygon for several dates in a
+    single Earth Engine computation. The frames are stacked vertically in the
+    order of `dates`, all with the same size, so a client can page through them
+    by offsetting into the strip.
+
+    Args: (i) wkt - polygon geometry in WKT
+          (ii) dates - acquisition dates (YYYY-MM-DD)
+
+    Returns: PNG filmstrip bytes or None
+    """
+    initialize_ee()
+
+    try:
+        geometry = convert_wkt_to_ee_geometry(wkt)
+        collection = ee.ImageCollection([get_rgb_image(geometry, date) for date in dates])
+
+        return _download_thumbnail(
+            EE_FILMSTRIP_ENDPOINT,
+            lambda: collection.getFilmstripThumbURL(rgb_thumbnail_params(wkt))
+        )
+
+    except (ee.EEException, HTTPError, URLError) as e:
+        logger.warning("No RGB filmstrip for %s: %s", dates, e)
+        return None
+
+def snap_to_acquisition(acquisition_dates: list[str], date: str) -> Optional[str]:
+    """
+    This function snaps a date to the nearest acquisition date of a polygon.
+
+    Args: (i) acquisition_dates - sorted acquisition dates (YYYY-MM-DD)
+          (ii) date - requested date (YYYY-MM-DD)
+
+    Returns: the nearest acquisition date, or None if the index is empty
+    """
+    if not acquisition_dates:
+        return None
+
+    i = bisect_left(acquisition_dates, date)
+    candidates = acquisition_dates[max(i - 1, 0):i + 1]
+    target = datetime.strptime(date, "%Y-%m-%d")
+
+    return min(candidates, key=lambda d: abs(datetime.strptime(d, "%Y-%m-%d") - target))
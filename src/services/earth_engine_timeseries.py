@@ -4,8 +4,11 @@ Core module for Earth Engine time-series task
 from __future__ import annotations
 
 import os
+import threading
 from datetime import date
 from pathlib import Path
+from typing import Optional
+from urllib.error import HTTPError
 from uuid import uuid4
 
 import ee
@@ -15,39 +18,74 @@ from dateutil.relativedelta import relativedelta
 from shapely import wkt
 
 from analytics.vi_preprocessing import clean_vi_series
+from utils.ee_budget import ee_slot
 from utils.logging_config import get_logger
+from utils.resilience import EndpointPolicy, call_external, register_endpoint
 
 logger = get_logger(__name__)
 
 _EE_INITIALIZED = False
+_EE_INIT_LOCK = threading.Lock()
 S2_COLLECTION = "COPERNICUS/S2_SR_HARMONIZED"
 MAX_POLYGONS = 5
 DEFAULT_LOOKBACK_YEARS = 5
 
+EE_TIMESERIES_ENDPOINT = "earth_engine.timeseries"
+TRANSIENT_EE_ERROR_MARKERS = (
+    "429", "500", "502", "503", "504", "Too Many Requests", "Deadline",
+    "timed out", "temporarily unavailable", "Internal error"
+)
+register_endpoint(
+    EE_TIMESERIES_ENDPOINT,
+    EndpointPolicy(timeout=float(os.getenv("EE_TIMESERIES_TIMEOUT", 180)), retries=2, backoff_base=2.0, backoff_max=30.0)
+)
+
 
 def initialize_ee() -> None:
-    """Initialize Earth Engine once per worker process."""
+    """Initialize Earth Engine once per worker process (thread-safe for thread pools)."""
     global _EE_INITIALIZED
 
     if _EE_INITIALIZED:
         return
 
-    service_account = os.getenv("EE_SERVICE_ACC_EMAIL") or os.getenv("EE_SERVICE_ACCOUNT")
-    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    with _EE_INIT_LOCK:
+        if _EE_INITIALIZED:
+            return
 
-    if not service_account:
-        raise RuntimeError("Missing EE_SERVICE_ACC_EMAIL environment variable.")
-    if not credentials_path:
-        raise RuntimeError("Missing GOOGLE_APPLICATION_CREDENTIALS environment variable.")
-    if not Path(credentials_path).exists():
-        raise RuntimeError(f"Google credentials file not found: {credentials_path}")
+        service_account = os.getenv("EE_SERVICE_ACC_EMAIL") or os.getenv("EE_SERVICE_ACCOUNT")
+        credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+
+        if not service_account:
+            raise RuntimeError("Missing EE_SERVICE_ACC_EMAIL environment variable.")
+        if not credentials_path:
+            raise RuntimeError("Missing GOOGLE_APPLICATION_CREDENTIALS environment variable.")
+        if not Path(credentials_path).exists():
+            raise RuntimeError(f"Google credentials file not found: {credentials_path}")
+
+        credentials = ee.ServiceAccountCredentials(
+            service_account,
+            key_file=credentials_path,
+        )
+        ee.Initialize(credentials)
+        _EE_INITIALIZED = True
+
+def is_transient_ee_error(e: BaseException) -> bool:
+    """
+    Whether an Earth Engine error signals an unavailable or overloaded service
+    (retried and counted by the circuit breaker) rather than a bad request or
+    an empty result. HTTP errors are OSErrors too, but only server errors and
+    rate limiting (429) are transient; other 4xx responses are not retried.
+    """
+    if isinstance(e, HTTPError):
+        return e.code >= 500 or e.code == 429
+    if isinstance(e, (OSError, TimeoutError)):
+        return True
+    if isinstance(e, ee.EEException):
+        message = str(e).lower()
+        return any(marker.lower() in message for marker in TRANSIENT_EE_ERROR_MARKERS)
+
+    return False
 
-    credentials = ee.ServiceAccountCredentials(
-        service_account,
-        key_file=credentials_path,
-    )
-    ee.Initialize(credentials)
-    _EE_INITIALIZED = True
 
 def add_vi_indices(img: ee.Image) -> ee.Image:
     """Add NDVI and NDMI bands to a Sentinel-2 image."""
@@ -90,13 +128,17 @@ def mask_cloud_and_shadow(img: ee.Image) -> ee.Image:
     return img.updateMask(mask)
 
 
-def _default_date_range() -> tuple[str, str]:
+def default_date_range() -> tuple[str, str]:
     today = date.today()
     start = today - relativedelta(years=DEFAULT_LOOKBACK_YEARS)
 
     return start.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
 
 
+class NoObservationsError(ValueError):
+    """Raised when no usable Sentinel-2 observation exists in the date range."""
+
+
 def _build_roi(geometry_wkt: str) -> tuple[ee.Geometry, str]:
     if not isinstance(geometry_wkt, str):
         geometry_wkt = str(geometry_wkt)
@@ -113,7 +155,7 @@ def _build_roi(geometry_wkt: str) -> tuple[ee.Geometry, str]:
 
 def _features_to_dataframe(features: list[dict], geometry_wkt: str) -> pd.DataFrame:
     if not features:
-        raise ValueError("No Sentinel-2 observations found for this polygon/date range.")
+        raise NoObservationsError("No Sentinel-2 observations found for this polygon/date range.")
 
     df = pd.DataFrame([feature.get("properties", {}) for feature in features])
     required_columns = {"date", "ndvi", "ndmi"}
@@ -132,29 +174,46 @@ def _features_to_dataframe(features: list[dict], geometry_wkt: str) -> pd.DataFr
     )
 
     if df.empty:
-        raise ValueError("No usable NDVI/NDMI observations remained after cloud masking.")
+        raise NoObservationsError("No usable NDVI/NDMI observations remained after cloud masking.")
 
     for vi in ("ndvi", "ndmi"):
         if df[vi].notna().sum() == 0:
-            raise ValueError(f"No usable {vi.upper()} observations remained after cloud masking.")
+            raise NoObservationsError(f"No usable {vi.upper()} observations remained after cloud masking.")
 
-    df = clean_vi_series(df, "ndvi")
-    df = clean_vi_series(df, "ndmi")
     df.insert(1, "geometry", geometry_wkt)
 
     return df[["date", "geometry", "ndvi", "ndmi"]]
 
 
-def get_vi_timeseries(geometry_wkt: str) -> pd.DataFrame:
+def clean_vi_timeseries(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean the NDVI and NDMI series of one polygon (gap filling, outlier removal
+    and smoothing).
+    """
+    df = clean_vi_series(df, "ndvi")
+
+    return clean_vi_series(df, "ndmi")
+
+
+def get_raw_vi_timeseries(
+    geometry_wkt: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> pd.DataFrame:
     """
-    Generate NDVI and NDMI time-series data for one WKT geometry.
+    Fetch the uncleaned NDVI and NDMI time series of one WKT geometry from
+    Earth Engine. The cleaning stage is kept separate so it can run as its own
+    task, off the Earth Engine-bound workers.
 
-    Returns a dataframe with date, geometry, ndvi, and ndmi columns.
+    The date range defaults to `default_date_range()`; incremental refreshes
+    pass a later `start_date` to fetch only new observations.
     """
     initialize_ee()
 
     ee_roi, normalized_wkt = _build_roi(geometry_wkt)
-    start_date, end_date = _default_date_range()
+    default_start, default_end = default_date_range()
+    start_date = start_date or default_start
+    end_date = end_date or default_end
 
     logger.info("Fetching Sentinel-2 VI data from %s to %s.", start_date, end_date)
 
@@ -183,40 +242,54 @@ def get_vi_timeseries(geometry_wkt: str) -> pd.DataFrame:
         return ee.Feature(None, {"date": date, "ndvi": ndvi_data, "ndmi": ndmi_data})
 
     vi_timeseries = ee.FeatureCollection(img_collection.map(map_vi))
-    features = vi_timeseries.getInfo().get("features", [])
+
+    info = call_external(EE_TIMESERIES_ENDPOINT, vi_timeseries.getInfo, is_failure=is_transient_ee_error, lease=ee_slot)
+    features = info.get("features", [])
 
     return _features_to_dataframe(features, normalized_wkt)
 
 
-def _validate_roi_dataframe(roi: pd.DataFrame) -> None:
+def build_acquisition_index(df: pd.DataFrame) -> dict[str, list[str]]:
+    """
+    Build a per-polygon index of acquisition dates from a combined time series.
+
+    Every row of the series is a Sentinel-2 acquisition that survived cloud
+    filtering and masking, so the index is taken from the series itself and
+    needs no extra Earth Engine call.
+    """
+    dates = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+
+    return {
+        uuid: sorted(set(group))
+        for uuid, group in dates.groupby(df["uuid"])
+    }
+
+
+def validate_roi_dataframe(roi: pd.DataFrame, max_polygons: Optional[int] = MAX_POLYGONS) -> None:
+    """
+    Validate an ROI dataframe before its time series are enqueued. Interactive
+    requests are capped at `MAX_POLYGONS`; bulk work passes `max_polygons=None`.
+    """
     if roi.empty:
         raise ValueError("No polygons provided.")
-    if len(roi) > MAX_POLYGONS:
-        logger.error(f"Data contains more than {MAX_POLYGONS} polygons.")
-        raise ValueError(f"Too many polygons provided (limit: {MAX_POLYGONS}).")
+    if max_polygons is not None and len(roi) > max_polygons:
+        logger.error(f"Data contains more than {max_polygons} polygons.")
+        raise ValueError(f"Too many polygons provided (limit: {max_polygons}).")
     if "geometry" not in roi.columns:
         raise ValueError("ROI dataframe must include a 'geometry' column.")
 
 
-def combined_timeseries(roi: pd.DataFrame) -> pd.DataFrame:
+def label_timeseries(df: pd.DataFrame, roi_row: dict | pd.Series) -> pd.DataFrame:
     """
-    Generate combined NDVI and NDMI time-series data for each ROI row.
+    Prefix a polygon's time series with its uuid, region and area. A uuid is
+    assigned if the ROI row has none.
     """
-    initialize_ee()
-    _validate_roi_dataframe(roi)
-
-    df_list = []
-    for _, row in roi.iterrows():
-        df = get_vi_timeseries(row["geometry"])
-
-        # If `uuid` exists in the uploaded file, no need to assign new ones
-        uuid = row.get("uuid") if "uuid" in roi.columns else None
-        if pd.isna(uuid):
-            uuid = str(uuid4())
+    uuid = roi_row.get("uuid")
+    if pd.isna(uuid):
+        uuid = str(uuid4())
 
-        df.insert(0, "uuid", uuid)
-        df.insert(1, "region", row.get("region"))
-        df.insert(2, "area (acres)", row.get("area (acres)", np.nan))
-        df_list.append(df)
+    df.insert(0, "uuid", uuid)
+    df.insert(1, "region", roi_row.get("region"))
+    df.insert(2, "area (acres)", roi_row.get("area (acres)", np.nan))
 
-    return pd.concat(df_list, ignore_index=True)
+    return df
@@ -0,0 +1,159 @@
+"""
+Database side of the scheduled refresh of stored farm polygons.
+
+Raw Sentinel-2 observations are kept per farm in `vitimeseries`, and
+`farmrefreshstate` records the latest observation date (the watermark) and
+when each farm was last refreshed. A refresh fetches only observations after
+the watermark, recomputes statistics over the stored history and replaces them
+into the summary tables read by the dashboards.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from db.engine import get_engine
+from services.region_cache import bump_table_versions
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+STATS_TABLES = ["highndmidays", "peakvidistribution", "ndvipeaksperfarm"]
+
+def select_refresh_batches(batch_size: int, limit: Optional[int] = None) -> list[list[str]]:
+    """
+    This function returns the uuids of stored farms in batches, least recently
+    refreshed (or never refreshed) first.
+
+    Args: (i) batch_size - farms per batch
+          (ii) limit - maximum number of farms to schedule
+
+    Returns: list of uuid batches
+    """
+    query = text(
+        """
+        SELECT f.uuid
+        FROM farmpolygons f
+        LEFT JOIN farmrefreshstate s ON s.uuid = f.uuid
+        ORDER BY s.refreshed_at NULLS FIRST, f.uuid
+        LIMIT :limit
+        """
+    )
+    with get_engine().connect() as conn:
+        uuids = [row.uuid for row in conn.execute(query, {"limit": limit})]
+
+    return [uuids[i:i + batch_size] for i in range(0, len(uuids), batch_size)]
+
+def load_farms(uuids: list[str]) -> pd.DataFrame:
+    """
+    This function loads the farms to refresh with their metadata and watermark
+    (`last_observation_date`, None if never refreshed).
+    """
+    query = text(
+        """
+        SELECT f.uuid, f.region, f.area AS "area (acres)", ST_AsText(f.geometry) AS geometry,
+               s.last_observation_date
+        FROM farmpolygons f
+        LEFT JOIN farmrefreshstate s ON s.uuid = f.uuid
+        WHERE f.uuid = ANY(:uuids)
+        """
+    )
+
+    return pd.read_sql(query, get_engine(), params={"uuids": list(uuids)})
+
+def next_start_date(last_observation_date: Optional[date]) -> Optional[str]:
+    # First day after the watermark, or None to fetch the default full range
+    if last_observation_date is None or pd.isna(last_observation_date):
+        return None
+
+    return (pd.Timestamp(last_observation_date) + timedelta(days=1)).strftime("%Y-%m-%d")
+
+def store_observations(df: pd.DataFrame) -> None:
+    """
+    This function upserts raw observations (uuid, date, ndvi, ndmi).
+    """
+    if df.empty:
+        return
+
+    rows = [
+        {"uuid": row.uuid, "date": row.date.date(), "ndvi": row.ndvi, "ndmi": row.ndmi}
+        for row in df[["uuid", "date", "ndvi", "ndmi"]].itertuples(index=False)
+    ]
+    query = text(
+        """
+        INSERT INTO vitimeseries (uuid, date, ndvi, ndmi)
+        VALUES (:uuid, :date, :ndvi, :ndmi)
+        ON CONFLICT (uuid, date) DO UPDATE
+        SET ndvi = EXCLUDED.ndvi, ndmi = EXCLUDED.ndmi
+        """
+    )
+    with get_engine().begin() as conn:
+        conn.execute(query, rows)
+
+def load_observations(uuids: list[str], start_date: str) -> pd.DataFrame:
+    """
+    This function loads the stored raw observations of farms from `start_date`.
+    """
+    query = text(
+        """
+        SELECT uuid, date, ndvi, ndmi
+        FROM vitimeseries
+        WHERE uuid = ANY(:uuids) AND date >= :start_date
+        ORDER BY uuid, date
+        """
+    )
+    df = pd.read_sql(query, get_engine(), params={"uuids": list(uuids), "start_date": start_date})
+    df["date"] = pd.to_datetime(df["date"])
+
+    return df
+
+def replace_farm_stats(stats: dict[str, list[dict[str, Any]]], uuids: list[str]) -> None:
+    """
+    This function replaces the statistics of the refreshed farms in the summary
+    tables in one transaction. Rows are deleted and re-inserted rather than
+    updated in place so that the INSERT triggers maintaining the aggregate
+    tables fire, and so that NDVI peaks moved by the new observations do not
+    linger.
+    """
+    created_at = pd.Timestamp.now().to_pydatetime()
+
+    with get_engine().begin() as conn:
+        for table in STATS_TABLES:
+            conn.execute(text(f"DELETE FROM {table} WHERE uuid = ANY(:uuids)"), {"uuids": list(uuids)})
+
+            rows = [{**row, "created_at": created_at} for row in stats[f"df_{table}"]]
+            if not rows:
+                continue
+
+            columns = list(rows[0].keys())
+            conn.execute(
+                text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"),
+                rows
+            )
+
+    bump_table_versions(*STATS_TABLES)
+
+def mark_refreshed(watermarks: dict[str, Optional[date]]) -> None:
+    """
+    This function records the watermark and refresh time of each farm.
+    """
+    if not watermarks:
+        return
+
+    query = text(
+        """
+        INSERT INTO farmrefreshstate (uuid, last_observation_date, refreshed_at)
+        VALUES (:uuid, :last_observation_date, now())
+        ON CONFLICT (uuid) DO UPDATE
+        SET last_observation_date = COALESCE(EXCLUDED.last_observation_date, farmrefreshstate.last_observation_date),
+            refreshed_at = EXCLUDED.refreshed_at
+        """
+    )
+    with get_engine().begin() as conn:
+        conn.execute(
+            query,
+            [{"uuid": uuid, "last_observation_date": watermark} for uuid, watermark in watermarks.items()]
+        )
@@ -0,0 +1,183 @@
+"""
+Persistent grid-cell cache for iSDA soil property lookups
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_PATH = ROOT_DIR / "cache" / "isda_soil.sqlite3"
+
+# iSDAsoil layers are published as a 30 m raster in Web Mercator (EPSG:3857).
+# Any two coordinates that fall in the same raster cell return identical values,
+# so lookups are keyed by the snapped cell rather than the raw coordinates.
+CELL_SIZE = 30.0 # metres
+EARTH_RADIUS = 6378137.0 # WGS84 semi-major axis used by EPSG:3857
+
+Cell = tuple[int, int] # (column, row) index in the EPSG:3857 grid
+
+def snap_to_cell(lat: float, lon: float) -> Cell:
+    """
+    This function snaps WGS84 coordinates to the index of the iSDA raster
+    cell containing them.
+    """
+    x = EARTH_RADIUS * math.radians(lon)
+    y = EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+    return math.floor(x / CELL_SIZE), math.floor(y / CELL_SIZE)
+
+def snap_to_cells(lats: ArrayLike, lons: ArrayLike) -> list[Cell]:
+    """
+    Vectorized version of `snap_to_cell` for arrays of coordinates.
+    """
+    x = EARTH_RADIUS * np.radians(np.asarray(lons, dtype=float))
+    y = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(np.asarray(lats, dtype=float)) / 2))
+    cols = np.floor(x / CELL_SIZE).astype(np.int64)
+    rows = np.floor(y / CELL_SIZE).astype(np.int64)
+
+    return list(zip(cols.tolist(), rows.tolist()))
+
+def cell_centre(cell: Cell) -> tuple[float, float]:
+    """
+    This function returns the (lat, lon) of the centre of a raster cell. Requests
+    are always made at the cell centre so that every point in a cell maps to the
+    same query.
+    """
+    col, row = cell
+    x = (col + 0.5) * CELL_SIZE
+    y = (row + 0.5) * CELL_SIZE
+
+    lon = math.degrees(x / EARTH_RADIUS)
+    lat = math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS)) - math.pi / 2)
+
+    return round(lat, 7), round(lon, 7)
+
+class SoilCellCache:
+    """
+    SQLite-backed cache of soil property values keyed by (property, depth, cell).
+
+    The soil raster is static, so entries never expire. A missing value returned
+    by the API (e.g. over water) is cached as well, while failed requests are not.
+    SQLite runs in WAL mode so gunicorn and Celery processes on the same host can
+    share one cache file.
+
+    Attributes:
+        path (Path): location of the SQLite database
+    """
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path or os.getenv("ISDA_CACHE_PATH", DEFAULT_CACHE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS soil_cells (
+                    property TEXT NOT NULL,
+                    depth TEXT NOT NULL,
+                    col INTEGER NOT NULL,
+                    row INTEGER NOT NULL,
+                    value TEXT,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (property, depth, col, row)
+                )
+                """
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+
+        return conn
+
+    def get_many(
+            self,
+            cells: Iterable[Cell],
+            properties: Iterable[str],
+            depth: str
+    ) -> dict[tuple[str, Cell], Any]:
+        """
+        This method looks up cached values.
+
+        Args:
+            cells (Iterable[Cell]): raster cells to look up
+            properties (Iterable[str]): soil properties to look up
+            depth (str): soil depth, e.g. '0-20'
+
+        Returns:
+            (dict[tuple[str, Cell], Any]): cached values keyed by (property, cell); keys
+            absent from the dictionary are cache misses
+        """
+        cells = list(set(cells))
+        properties = list(properties)
+        if not cells or not properties:
+            return {}
+
+        conn = self._connection()
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_cells (col INTEGER, row INTEGER)")
+        conn.execute("DELETE FROM lookup_cells")
+        conn.executemany("INSERT INTO lookup_cells VALUES (?, ?)", cells)
+
+        placeholders = ", ".join("?" * len(properties))
+        rows = conn.execute(
+            f"""
+            SELECT s.property, s.col, s.row, s.value
+            FROM soil_cells s
+            INNER JOIN lookup_cells l ON s.col = l.col AND s.row = l.row
+            WHERE s.depth = ? AND s.property IN ({placeholders})
+            """,
+            [depth, *properties]
+        ).fetchall()
+        conn.commit()
+
+        return {(prop, (col, row)): json.loads(value) for prop, col, row, value in rows}
+
+    def put_many(self, values: dict[tuple[str, Cell], Any], depth: str) -> None:
+        """
+        This method stores fetched values keyed by (property, cell).
+        """
+        if not values:
+            return
+
+        fetched_at = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO soil_cells VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (prop, depth, col, row, json.dumps(value), fetched_at)
+                    for (prop, (col, row)), value in values.items()
+                ]
+            )
+
+_cache: Optional[SoilCellCache] = None
+_cache_lock = threading.Lock()
+
+def get_soil_cache() -> SoilCellCache:
+    # Returns the process-wide soil cell cache
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SoilCellCache()
+
+        return _cache
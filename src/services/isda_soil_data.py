@@ -2,17 +2,37 @@
 Module for fetching soil properties from ISDA API
 """
 import asyncio
+import base64
+import json
 import os
-from typing import Any
+import threading
+import time
+from typing import Any, Callable, Coroutine, Iterable, Literal, Optional
+from urllib.parse import urlsplit
 
 import aiohttp
-import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
 from aiohttp import ClientSession
-from aiohttp.client_exceptions import ClientResponseError
-from shapely.wkt import loads
 
+from services.isda_soil_cache import (
+    Cell,
+    SoilCellCache,
+    cell_centre,
+    get_soil_cache,
+    snap_to_cells
+)
+from utils.geometry import (
+    EQUAL_AREA_CRS,
+    SQ_METERS_TO_ACRES,
+    WGS84,
+    centroids_lat_lon,
+    reproject,
+    wkt_to_geometries
+)
 from utils.logging_config import get_logger
+from utils.resilience import EndpointPolicy, backoff_delay, get_breaker, hedge_async, register_endpoint
 
 logger = get_logger(__name__)
 
@@ -20,7 +40,34 @@ logger = get_logger(__name__)
 USERNAME = os.getenv("isda_username")
 PASSWORD = os.getenv("isda_password")
 
-BASE_URL = "https://api.isda-africa.com"
+BASE_URL = os.getenv("ISDA_BASE_URL", "https://api.isda-africa.com")
+MAX_CONCURRENCY = int(os.getenv("ISDA_MAX_CONCURRENCY", "8")) # in-flight requests per host
+MAX_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+TOKEN_TTL = 3600 # seconds; used when the token does not carry an `exp` claim
+TOKEN_REFRESH_MARGIN = 60 # refresh the token this many seconds before it expires
+SOIL_DEPTH = "0-20"
+SAMPLING_MODE = os.getenv("ISDA_SAMPLING_MODE", "centroid")
+ACRES_PER_SAMPLE = 25.0 # one sample point per this many acres in `area` sampling
+MAX_SAMPLES_PER_POLYGON = 25
+CATEGORICAL_PROPERTIES = {"texture_class"}
+
+# Per-endpoint timeouts and circuit breakers; soil reads are idempotent and hedged
+ISDA_LOGIN_ENDPOINT = "isda.login"
+ISDA_SOIL_ENDPOINT = "isda.soilproperty"
+LOGIN_POLICY = EndpointPolicy(timeout=15.0, retries=0, failure_threshold=3, reset_timeout=60.0)
+register_endpoint(ISDA_LOGIN_ENDPOINT, LOGIN_POLICY)
+SOIL_POLICY = EndpointPolicy(
+    timeout=float(os.getenv("ISDA_REQUEST_TIMEOUT", 20)),
+    retries=MAX_RETRIES,
+    hedge_after=float(os.getenv("ISDA_HEDGE_AFTER", 2.0)) or None,
+    failure_threshold=10,
+    reset_timeout=30.0
+)
+register_endpoint(ISDA_SOIL_ENDPOINT, SOIL_POLICY)
+
+ProgressCallback = Callable[[int, int], None]
+SamplingMode = Literal["centroid", "area"]
 SOIL_PROPERTIES = [
     "bulk_density",
     "calcium_extractable",
@@ -41,112 +88,507 @@ SOIL_PROPERTIES = [
     "zinc_extractable"
 ] # List of soil properties to be requested from API
 
+def _token_lifetime(token: str, expires_in: Any = None) -> float:
+    """
+    Returns the number of seconds the access token stays valid. The `exp` claim
+    of the JWT is used when present, then `expires_in` from the login response
+    and finally `TOKEN_TTL`.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload))["exp"]
+
+        return max(float(exp) - time.time(), 0.0)
+    except (IndexError, KeyError, TypeError, ValueError):
+        pass
+
+    try:
+        return float(expires_in)
+    except (TypeError, ValueError):
+        return float(TOKEN_TTL)
+
+class IsdaClient:
+    """
+    Long-lived client for the iSDA soil API.
+
+    A single instance keeps a pooled aiohttp session, caches the access token
+    until shortly before it expires, bounds in-flight requests with a semaphore
+    per host and retries 429/5xx responses with jittered exponential backoff.
+    Requests go through the `isda.*` circuit breakers of `utils.resilience`, so
+    an iSDA outage fails fast instead of exhausting the retries of every call,
+    and slow reads are hedged after `hedge_after` seconds.
+
+    Attributes:
+        base_url (str): iSDA API root
+        max_concurrency (int): maximum number of in-flight requests per host
+        max_retries (int): retries for throttled, failed or dropped requests
+        backoff_base (float): base delay (seconds) of the exponential backoff
+        backoff_max (float): upper bound (seconds) of a single backoff delay
+        timeout (float): total timeout (seconds) of a single request
+        hedge_after (float, optional): delay (seconds) before a slow read is duplicated
+    """
+    def __init__(
+            self,
+            username: Optional[str] = USERNAME,
+            password: Optional[str] = PASSWORD,
+            *,
+            base_url: str = BASE_URL,
+            max_concurrency: int = MAX_CONCURRENCY,
+            max_retries: int = MAX_RETRIES,
+            backoff_base: float = 0.5,
+            backoff_max: float = 8.0,
+            timeout: float = SOIL_POLICY.timeout,
+            hedge_after: Optional[float] = SOIL_POLICY.hedge_after,
+            trace_configs: Optional[list[aiohttp.TraceConfig]] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+        self._username = username
+        self._password = password
+        self._trace_configs = trace_configs
+
+        self._session: Optional[ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._token: Optional[str] = None
+        self._token_expiry = 0.0
+
+    async def _ensure_session(self) -> ClientSession:
+        """
+        Returns the pooled session, creating it on first use. Sessions, semaphores
+        and locks are bound to the event loop that created them, so they are rebuilt
+        if the client is used from a different loop. The cached token is kept.
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.max_concurrency,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=self._trace_configs
+            )
+            self._loop = loop
+            self._semaphores = {}
+            self._token_lock = asyncio.Lock()
+
+        return self._session
+
+    def _token_is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._token_expiry - TOKEN_REFRESH_MARGIN
+
+    async def get_access_token(self) -> str:
+        """
+        Returns the cached access token, logging in again only when it is
+        missing or about to expire. Concurrent callers share a single login.
+        """
+        if self._token_is_valid():
+            return self._token
+
+        session = await self._ensure_session()
+
+        async with self._token_lock:
+            if self._token_is_valid():
+                return self._token
+
+            url = f"{self.base_url}/login"
+            payload = {
+                "username": self._username,
+                "password": self._password
+            }
+
+            breaker = get_breaker(ISDA_LOGIN_ENDPOINT)
+            breaker.before_call()
+            try:
+                async with session.post(url, data=payload, timeout=aiohttp.ClientTimeout(total=LOGIN_POLICY.timeout)) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+
+            token = data.get("access_token")
+            if not token:
+                raise RuntimeError("iSDA login response did not include an access token.")
+
+            self._token = token
+            self._token_expiry = time.monotonic() + _token_lifetime(token, data.get("expires_in"))
+            logger.info("Obtained new iSDA access token.")
+
+            return token
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # Full-jitter exponential backoff; `Retry-After` (seconds) is honoured as a floor
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+
+        try:
+            return max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            return delay
+
+    async def _get_once(
+            self,
+            session: ClientSession,
+            url: str,
+            params: dict[str, Any],
+            semaphore: asyncio.Semaphore,
+            final: bool
+    ) -> tuple[int, Any, Optional[str]]:
+        # One GET: (status, decoded body on success, Retry-After); raises on errors that are not retried
+        token = await self.get_access_token()
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async with semaphore:
+            async with session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                retryable = response.status == 401 or response.status in RETRY_STATUSES
+
+                if response.status >= 400 and (final or not retryable):
+                    response.raise_for_status() # Obtain status of HTTP request
+                if response.status >= 400:
+                    return response.status, None, response.headers.get("Retry-After")
+
+                return response.status, await response.json(), None
+
+    async def get_json(self, path: str, params: dict[str, Any]) -> Any:
+        """
+        Performs an authenticated GET request and returns the decoded JSON body.
+
+        Args:
+            path (str): endpoint path relative to `base_url`
+            params (dict[str, Any]): query parameters
+
+        Returns:
+            (Any): decoded JSON response
+        """
+        session = await self._ensure_session()
+        url = f"{self.base_url}{path}"
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.max_concurrency))
+        breaker = get_breaker(ISDA_SOIL_ENDPOINT)
+
+        for attempt in range(self.max_retries + 1):
+            final = attempt >= self.max_retries
+            breaker.before_call()
+
+            try:
+                status, body, retry_after = await hedge_async(
+                    lambda: self._get_once(session, url, params, semaphore, final),
+                    self.hedge_after
+                )
+            except aiohttp.ClientResponseError as e:
+                # Client errors mean iSDA is up; only throttling and server errors count against it
+                if e.status in RETRY_STATUSES:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                if final:
+                    raise
+                delay = self._backoff(attempt)
+                reason = type(e).__name__
+            else:
+                if status < 400:
+                    breaker.record_success()
+                    return body
+
+                if status == 401:
+                    # Token was revoked or expired early; log in again
+                    self._token = None
+                    continue
+
+                breaker.record_failure()
+                delay = self._backoff(attempt, retry_after)
+                reason = f"HTTP {status}"
+
+            # Back off outside the semaphore so waiting requests can proceed
+            logger.debug("iSDA request to %s failed (%s); retrying in %.2fs.", path, reason, delay)
+            await asyncio.sleep(delay)
+
+    async def get_soil_property(self, lat: float, lon: float, prop: str, depth: str = SOIL_DEPTH) -> Any:
+        # Raw iSDA response for one soil property at given coordinates
+        params = {"lat": lat, "lon": lon, "property": prop, "depth": depth}
+
+        return await self.get_json("/isdasoil/v2/soilproperty", params)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+_client: Optional[IsdaClient] = None
+_client_pid: Optional[int] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_lock = threading.Lock()
+
+def get_isda_client() -> IsdaClient:
+    """
+    Returns the process-wide iSDA client. A new client is created after a fork
+    since pooled connections cannot be shared between processes.
+    """
+    global _client, _client_pid
+
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = IsdaClient()
+            _client_pid = os.getpid()
+
+        return _client
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # Persistent event loop (one per process) on which the shared client runs
+    global _loop, _loop_pid
+
+    with _lock:
+        if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="isda-client-loop", daemon=True).start()
+
+        return _loop
+
+def run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Runs a coroutine on the persistent iSDA event loop and waits for its result.
+    Unlike `asyncio.run`, the loop (and therefore the client's connection pool)
+    survives between calls.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
 def get_lat_lon(df: pd.DataFrame) -> pd.DataFrame:
     """
-    This function extracts latitude and longitude by computing the 
-    centroid of queried polygons.
+    This function extracts latitude and longitude by computing the
+    centroid of queried polygons (in an equal-area projection).
+    """
+    lat, lon = centroids_lat_lon(wkt_to_geometries(df["geometry"]))
+
+    return df.drop(columns="geometry").assign(lat=lat, lon=lon)
+
+def get_sample_points(
+        df: pd.DataFrame,
+        acres_per_sample: float = ACRES_PER_SAMPLE,
+        max_samples: int = MAX_SAMPLES_PER_POLYGON
+) -> pd.DataFrame:
+    """
+    This function places soil sample points inside each polygon, with the number
+    of points growing with the polygon area. Points are the centres of a regular
+    grid laid over the polygon in an equal-area projection; polygons that need a
+    single sample (or whose grid misses the polygon entirely) fall back to the
+    centroid.
+
+    Args:
+        df (pd.DataFrame): polygons with `uuid` and WKT `geometry` columns
+        acres_per_sample (float): target area covered by one sample point
+        max_samples (int): upper bound on the sample points per polygon
+
+    Returns:
+        (pd.DataFrame): one row per sample point with `uuid`, `lat` and `lon`
     """
-    gdf = gpd.GeoDataFrame(df, geometry=df["geometry"].apply(loads))
-    gdf.crs = "EPSG:4326"
+    polygons = reproject(wkt_to_geometries(df["geometry"]), WGS84, EQUAL_AREA_CRS)
+    areas = shapely.area(polygons)
+    n_samples = np.clip(np.ceil(areas * SQ_METERS_TO_ACRES / acres_per_sample), 1, max_samples).astype(int)
+    centroids = shapely.centroid(polygons)
+
+    uuids, points = [], []
+    for uuid, polygon, area, n, centroid in zip(df["uuid"], polygons, areas, n_samples, centroids):
+        polygon_points = np.empty(0, dtype=object)
+
+        if n > 1:
+            spacing = np.sqrt(area / n)
+            minx, miny, maxx, maxy = polygon.bounds
+            grid_x, grid_y = np.meshgrid(
+                np.arange(minx + spacing / 2, maxx, spacing),
+                np.arange(miny + spacing / 2, maxy, spacing)
+            )
+            inside = shapely.contains_xy(polygon, grid_x, grid_y)
+            polygon_points = shapely.points(grid_x[inside], grid_y[inside])
+
+        if polygon_points.size == 0:
+            polygon_points = np.array([centroid], dtype=object)
 
-    gdf["centroid"] = gdf["geometry"].centroid
-    gdf["lat"] = gdf["centroid"].apply(lambda x: x.y)
-    gdf["lon"] = gdf["centroid"].apply(lambda x: x.x)
+        uuids.extend([uuid] * polygon_points.size)
+        points.append(polygon_points)
 
-    df_w_lat_lon = pd.DataFrame(gdf.drop(columns=["geometry", "centroid"]))
+    points = reproject(np.concatenate(points), EQUAL_AREA_CRS, WGS84)
 
-    return df_w_lat_lon
+    return pd.DataFrame({"uuid": uuids, "lat": shapely.get_y(points), "lon": shapely.get_x(points)})
+
+def sample_points(df: pd.DataFrame, sampling: SamplingMode) -> pd.DataFrame:
+    """
+    This function returns the sample points (`uuid`, `lat`, `lon`) of polygons
+    in the given sampling mode: several per polygon in `area` mode, otherwise
+    the centroid.
+    """
+    return get_sample_points(df) if sampling == "area" else get_lat_lon(df)
 
-async def get_access_token(session: ClientSession) -> str:
-    # Obtain ISDA access token
-    url = f"{BASE_URL}/login"
-    payload = {
-        "username": USERNAME,
-        "password": PASSWORD
+def aggregate_soil_samples(df_samples: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function aggregates per-point soil values into one row per uuid:
+    numeric properties are averaged and categorical ones take the most frequent
+    value. The order of first appearance of each uuid is preserved.
+    """
+    def most_frequent(s: pd.Series) -> Any:
+        mode = s.dropna().mode()
+        return mode.iat[0] if not mode.empty else None
+
+    numeric_properties = [prop for prop in SOIL_PROPERTIES if prop not in CATEGORICAL_PROPERTIES]
+    df_samples[numeric_properties] = df_samples[numeric_properties].apply(pd.to_numeric, errors="coerce")
+
+    aggregations = {
+        prop: most_frequent if prop in CATEGORICAL_PROPERTIES else "mean"
+        for prop in SOIL_PROPERTIES
     }
+    df_agg = df_samples.groupby("uuid", sort=False).agg(aggregations).reset_index()
 
-    async with session.post(url, data=payload) as response:
-        data = await response.json()
-        return data.get("access_token")
+    # Missing values become None rather than NaN so the records stay JSON-serializable
+    return df_agg.astype(object).where(df_agg.notna(), None)
 
 async def fetch_soil_property_data(
-        session: ClientSession, 
-        access_token: str, 
-        lat: float, 
+        client: IsdaClient,
+        lat: float,
         lon: float,
         prop: str
     ) -> Any:
     """
     This function returns result for a particular soil property given coordinates.
 
-    Args: session (ClientSession): AIOHTTP ClientSession
-          access_token (str): ISDA access token
+    Args: client (IsdaClient): shared iSDA client
           lat (float): latitude coordinate
           lon (float): longitude coordinate
           prop (float): soil property to query
-    
+
     Returns:
         (Any): soil property value
     """
-    url = f"{BASE_URL}/isdasoil/v2/soilproperty?lat={lat}&lon={lon}&property={prop}&depth=0-20"
-    headers = {"Authorization": f"Bearer {access_token}"}
+    data = await client.get_soil_property(lat, lon, prop)
 
-    async with session.get(url, headers=headers) as response:
-        response.raise_for_status() # Obtain status of HTTP request
-        data = await response.json()
+    try:
+        value = data["property"][prop][0]["value"]["value"]
+    except (KeyError, IndexError, TypeError):
+        value = None
 
-        try:
-            value = data["property"][prop][0]["value"]["value"]
-        except ClientResponseError:
-            value = None
-        
-        return value
-    
-async def fetch_soil_data(
-        session: ClientSession, 
-        access_token: str, 
-        uuid: str,
-        lat: float, 
-        lon: float
- ) -> dict[str, Any]:
-    """
-    This function fetches all the required soil properties.
-
-    Args: session (ClientSession): AIOHTTP ClientSession
-          access_token (str) - ISDA access token
-          uuid (str): polygon uuid
-          lat (float): latitude coordinate
-          lon (float): longitude coordinate
+    return value
+
+async def fetch_cell_properties(
+        client: IsdaClient,
+        cells: Iterable[Cell],
+        cache: Optional[SoilCellCache] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        partial: bool = False
+ ) -> dict[Cell, dict[str, Any]]:
+    """
+    This function fetches all the required soil properties for a set of raster cells.
+    Cached values are served locally; only missing (property, cell) pairs are
+    requested from the API, at the cell centre, and written back to the cache.
+    Failed requests are logged and never cached; the values fetched alongside
+    them are cached either way.
+
+    Args: client (IsdaClient): shared iSDA client
+          cells (Iterable[Cell]): raster cells to fetch
+          cache (SoilCellCache, optional): grid-cell cache; disabled when None
+          progress_callback (ProgressCallback, optional): called with (completed, total)
+              requests as they finish
+          partial (bool): return None for failed requests instead of raising
+              the first failure
 
     Returns:
-        (dict[str, Any]): dictionary of all soil properties and values
+        (dict[Cell, dict[str, Any]]): soil properties and values per cell
     """
-    result = {"uuid": uuid}
+    cells = set(cells)
+    values = cache.get_many(cells, SOIL_PROPERTIES, SOIL_DEPTH) if cache else {}
 
-    tasks =[
-        fetch_soil_property_data(session, access_token, lat, lon, prop)
+    missing = [
+        (prop, cell)
+        for cell in cells
         for prop in SOIL_PROPERTIES
+        if (prop, cell) not in values
     ]
+    logger.info(
+        "iSDA lookup: %d cells, %d cached values, %d requests.",
+        len(cells), len(values), len(missing)
+    )
 
-    values = await asyncio.gather(*tasks)
-    result.update(dict(zip(SOIL_PROPERTIES, values)))
+    completed = 0
 
-    return result
+    async def fetch_one(prop: str, cell: Cell) -> Any:
+        nonlocal completed
+        value = await fetch_soil_property_data(client, *cell_centre(cell), prop)
 
-async def main(df: pd.DataFrame) -> pd.DataFrame:
-    # Main function
-    df_w_lat_lon = get_lat_lon(df)
+        completed += 1
+        if progress_callback:
+            progress_callback(completed, len(missing))
 
-    async with aiohttp.ClientSession() as session:
-        access_token = await get_access_token(session)
+        return value
+
+    tasks = [fetch_one(prop, cell) for prop, cell in missing]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    fetched = {key: value for key, value in zip(missing, results) if not isinstance(value, BaseException)}
+    errors = [value for value in results if isinstance(value, BaseException)]
+
+    if cache:
+        cache.put_many(fetched, SOIL_DEPTH)
+    values.update(fetched)
+
+    if errors:
+        logger.warning("iSDA lookup: %d of %d requests failed (first: %r).", len(errors), len(missing), errors[0])
+        if not partial:
+            raise errors[0]
+
+    return {
+        cell: {prop: values.get((prop, cell)) for prop in SOIL_PROPERTIES}
+        for cell in cells
+    }
 
-        tasks = [
-            fetch_soil_data(session, access_token, row["uuid"], row["lat"], row["lon"])
-            for _, row in df_w_lat_lon.iterrows()
-        ]
-        results = await asyncio.gather(*tasks)
+async def main(
+        df: pd.DataFrame,
+        client: Optional[IsdaClient] = None,
+        use_cache: bool = True,
+        progress_callback: Optional[ProgressCallback] = None,
+        sampling: SamplingMode = SAMPLING_MODE
+) -> pd.DataFrame:
+    """
+    Main function. Polygons are reduced to sample points (the centroid, or several
+    points per polygon in `area` sampling), the points are snapped to iSDA raster
+    cells, the cells are deduplicated across the whole batch and fetched
+    concurrently, and the values are aggregated back per uuid. Requests are
+    bounded by the client's concurrency limiter.
+    """
+    client = client or get_isda_client()
+    cache = get_soil_cache() if use_cache else None
+    df_points = sample_points(df, sampling)
 
-    df_results = pd.DataFrame(results)
+    uuid_cells = list(zip(df_points["uuid"], snap_to_cells(df_points["lat"], df_points["lon"])))
+    cell_values = await fetch_cell_properties(
+        client,
+        (cell for _, cell in uuid_cells),
+        cache,
+        progress_callback
+    )
+    df_samples = pd.DataFrame([{"uuid": uuid, **cell_values[cell]} for uuid, cell in uuid_cells])
+
+    df_results = aggregate_soil_samples(df_samples)
 
     # Rename columns with appropriate units
     cols_to_rename = {
@@ -171,3 +613,58 @@ async def main(df: pd.DataFrame) -> pd.DataFrame:
     df_results.rename(columns=cols_to_rename, inplace=True)
 
     return df_results.to_dict("records")
+
+def fetch_soil_records(
+        df: pd.DataFrame,
+        progress_callback: Optional[ProgressCallback] = None,
+        sampling: SamplingMode = SAMPLING_MODE
+) -> list[dict[str, Any]]:
+    """
+    Synchronous entry point for callbacks and tasks. Runs `main` with the shared
+    client on the persistent event loop so connections and the access token are
+    reused across calls. The sampling mode defaults to `ISDA_SAMPLING_MODE`.
+    """
+    return run_sync(main(df, progress_callback=progress_callback, sampling=sampling))
+
+def warm_soil_cache(regions: list[str], sampling: SamplingMode = SAMPLING_MODE) -> int:
+    """
+    This function pre-fetches soil properties for all stored `farmpolygons` in
+    the given regions so later analyses are served from the cache. Polygons
+    are sampled exactly as at lookup time, so the warmed cells are the ones
+    later requests hit. Failed requests are logged and left uncached.
+
+    Args: regions (list[str]): region names as stored in `farmpolygons`
+          sampling (SamplingMode): sampling mode, `ISDA_SAMPLING_MODE` by default
+
+    Returns:
+        (int): number of raster cells warmed
+    """
+    from sqlalchemy import text
+
+    from db.engine import get_engine
+
+    query = text(
+        "SELECT uuid, ST_AsText(geometry) AS geometry "
+        "FROM farmpolygons WHERE region = ANY(:regions)"
+    )
+    df = pd.read_sql(query, get_engine(), params={"regions": list(regions)})
+    if df.empty:
+        logger.info("No stored polygons in %s; nothing to warm.", ", ".join(regions))
+        return 0
+
+    df_points = sample_points(df, sampling)
+
+    cells = set(snap_to_cells(df_points["lat"], df_points["lon"]))
+    run_sync(fetch_cell_properties(get_isda_client(), cells, get_soil_cache(), partial=True))
+    logger.info("Warmed iSDA soil cache for %d cells in %s.", len(cells), ", ".join(regions))
+
+    return len(cells)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Warm the iSDA soil cache for stored farm polygons.")
+    parser.add_argument("regions", nargs="+", help="region names in `farmpolygons`")
+    args = parser.parse_args()
+
+    warm_soil_cache(args.regions)
@@ -0,0 +1,146 @@
+"""
+Shared cache of region-level query results and figures of the dashboards.
+
+Entries are keyed by (query, region, indicator) plus the version of every table
+the query reads. Writers call `bump_table_versions` after inserting, which
+moves the readers of those tables to new keys; the stale entries simply expire.
+Version counters live in Redis (`region-cache:version:{table}`) so inserts made
+by any web process or worker invalidate the cache of the whole fleet.
+
+Values are stored with flask-caching: Redis (`CACHE_REDIS_URL`, falling back to
+`REDIS_URL`) in production and an in-process cache when no Redis is configured.
+"""
+import os
+from contextlib import AbstractContextManager, nullcontext
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+import redis
+from flask import Flask, has_app_context
+from flask_caching import Cache
+
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+REGION_CACHE_TIMEOUT = int(os.getenv("REGION_CACHE_TIMEOUT", 24 * 3600)) # seconds
+VERSION_KEY_PREFIX = "region-cache:version:"
+
+cache = Cache()
+_local_versions: dict[str, int] = {} # used when no Redis is configured (development)
+_standalone_app: Optional[Flask] = None
+
+def init_region_cache(server: Flask) -> None:
+    """
+    This function attaches the region cache to the Flask server.
+    """
+    url = os.getenv("CACHE_REDIS_URL") or os.getenv("REDIS_URL")
+    config = {
+        "CACHE_DEFAULT_TIMEOUT": REGION_CACHE_TIMEOUT,
+        "CACHE_KEY_PREFIX": "region-cache:",
+    }
+
+    if url:
+        config.update({"CACHE_TYPE": "RedisCache", "CACHE_REDIS_URL": url})
+    else:
+        logger.info("No Redis configured; region cache is in-process.")
+        config["CACHE_TYPE"] = "SimpleCache"
+
+    cache.init_app(server, config=config)
+
+def region_cache_context() -> AbstractContextManager:
+    """
+    This function returns the context in which the region cache can be used
+    outside the web app (Celery workers, scripts): the app context of a
+    minimal Flask app with the cache attached, created once per process.
+    Inside a request or app context it is a no-op.
+    """
+    global _standalone_app
+
+    if has_app_context():
+        return nullcontext()
+
+    if _standalone_app is None:
+        _standalone_app = Flask(__name__)
+        init_region_cache(_standalone_app)
+
+    return _standalone_app.app_context()
+
+def _redis() -> Optional[redis.Redis]:
+    try:
+        return get_redis()
+    except RuntimeError:
+        return None
+
+def table_versions(tables: Iterable[str]) -> str:
+    # Current versions of `tables`, joined into a key fragment
+    tables = list(tables)
+    client = _redis()
+
+    if client is None:
+        versions = [_local_versions.get(table, 0) for table in tables]
+    else:
+        versions = client.mget([f"{VERSION_KEY_PREFIX}{table}" for table in tables])
+
+    return ".".join(str(version or 0) for version in versions)
+
+def bump_table_versions(*tables: str) -> None:
+    """
+    This function invalidates the cached results reading any of `tables`.
+    Failures are logged rather than raised so that an insert never fails
+    because of the cache; entries then expire after `REGION_CACHE_TIMEOUT`.
+    """
+    client = _redis()
+
+    if client is None:
+        for table in tables:
+            _local_versions[table] = _local_versions.get(table, 0) + 1
+        return
+
+    try:
+        pipe = client.pipeline()
+        for table in tables:
+            pipe.incr(f"{VERSION_KEY_PREFIX}{table}")
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to invalidate region cache for %s: %s", tables, e)
+
+def cached_region_result(
+        query: str,
+        tables: Iterable[str],
+        region: str,
+        compute: Callable[[], T],
+        indicator: Optional[str] = None
+) -> T:
+    """
+    This function returns the cached result of a region-level query or
+    figure, computing and storing it on a miss.
+
+    Args: (i) query - name of the query or figure
+          (ii) tables - tables the result is computed from
+          (iii) region - selected region
+          (iv) compute - zero-argument callable producing the result
+          (v) indicator - selected indicator, if the result depends on one
+
+    Returns: the cached or freshly computed result
+    """
+    try:
+        key = f"{query}:{region}:{indicator or ''}:{table_versions(tables)}"
+        value = cache.get(key)
+    except redis.RedisError as e:
+        logger.warning("Region cache unavailable: %s", e)
+        return compute()
+
+    if value is not None:
+        return value
+
+    value = compute()
+
+    try:
+        cache.set(key, value)
+    except redis.RedisError as e:
+        logger.warning("Failed to cache %s for %s: %s", query, region, e)
+
+    return value
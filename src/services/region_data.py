@@ -0,0 +1,75 @@
+"""
+Single-round-trip loader of region-level summary tables for the dashboards.
+
+Each requested table is aggregated server-side into a JSON array of its
+selected columns, and the per-table subqueries are combined with UNION ALL, so
+all tables of a region arrive in one statement over one connection checkout.
+"""
+import re
+from typing import Any, Mapping, Sequence
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+IDENTIFIER = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# Columns of the Farmland Statistics summary tables read by the figures
+REGION_SUMMARY_TABLES = {
+    "highndmidays": ["year", "high_ndmi_days"],
+    "ndvipeaksmonthly": ["ndvi_peak_year", "ndvi_peak_month", "ndvi_peaks_per_month"],
+    "ndvipeaksannual": ["ndvi_peak_year", "number_of_peaks_per_farm", "uuid_count"],
+    "moisturecontent": ["moisture_content", "counts"],
+}
+
+def _identifier(name: str) -> str:
+    # Table and column names are interpolated into SQL, so only plain identifiers are accepted
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+
+    return name
+
+def region_tables_query(tables: Mapping[str, Sequence[str]]) -> str:
+    """
+    This function builds the UNION ALL statement returning one row per table:
+    its name and the JSON array of its rows in the region `:region`.
+    """
+    subqueries = []
+    for table, columns in tables.items():
+        selected = ", ".join(_identifier(column) for column in columns)
+        subqueries.append(
+            f"SELECT '{_identifier(table)}' AS source, "
+            f"(SELECT COALESCE(json_agg(t), '[]'::json) FROM (SELECT {selected} FROM {table} WHERE region = :region) t) AS data"
+        )
+
+    return "\nUNION ALL\n".join(subqueries)
+
+def load_region_tables(
+        bind: Engine | Connection,
+        region: str,
+        tables: Mapping[str, Sequence[str]] = REGION_SUMMARY_TABLES
+) -> dict[str, pd.DataFrame]:
+    """
+    This function loads the selected columns of several tables for one region
+    in a single round trip.
+
+    Args: (i) bind - SQLAlchemy engine or connection
+          (ii) region - region to filter on
+          (iii) tables - table names mapped to the columns to select
+
+    Returns: a dataframe per table, with the requested columns even when empty
+    """
+    query = text(region_tables_query(tables))
+
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            result = conn.execute(query, {"region": region}).all()
+    else:
+        result = bind.execute(query, {"region": region}).all()
+
+    rows: dict[str, list[dict[str, Any]]] = {source: data for source, data in result}
+
+    return {
+        table: pd.DataFrame(rows.get(table) or [], columns=list(columns))
+        for table, columns in tables.items()
+    }
@@ -0,0 +1,109 @@
+"""
+Out-of-band storage of task results as zstd-compressed Parquet files.
+
+Tasks write their DataFrames here and return only a `result_ref` (the URI of
+the file) through the Celery result backend. The store is a local directory
+or an object store prefix, selected with `RESULT_STORE_URI`, e.g.
+
+    RESULT_STORE_URI=file:///var/lib/regen/results
+    RESULT_STORE_URI=s3://regen-results/vi
+
+Both are accessed through `pyarrow.fs`, so the same code serves either.
+"""
+from __future__ import annotations
+
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_STORE_URI = (ROOT_DIR / "cache" / "results").as_uri()
+DEFAULT_TTL_HOURS = 24
+PARQUET_COMPRESSION = "zstd"
+READ_CACHE_SIZE = 32 # results kept in memory per process
+
+def _store_uri() -> str:
+    return os.getenv("RESULT_STORE_URI", DEFAULT_STORE_URI).rstrip("/")
+
+def result_ttl_seconds() -> int:
+    return int(float(os.getenv("RESULT_TTL_HOURS", DEFAULT_TTL_HOURS)) * 3600)
+
+def write_result(df: pd.DataFrame, kind: str) -> str:
+    """
+    This function writes a task result to the result store.
+
+    Args: (i) df - result to store
+          (ii) kind - result type, used as the file name prefix
+
+    Returns: the `result_ref` URI of the stored file
+    """
+    filesystem, root = fs.FileSystem.from_uri(_store_uri())
+    filesystem.create_dir(root, recursive=True)
+
+    name = f"{kind}-{uuid4()}.parquet"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, f"{root}/{name}", filesystem=filesystem, compression=PARQUET_COMPRESSION)
+
+    return f"{_store_uri()}/{name}"
+
+def _read_table(result_ref: str) -> pa.Table:
+    filesystem, path = fs.FileSystem.from_uri(result_ref)
+
+    return pq.read_table(path, filesystem=filesystem)
+
+_read_table_cached = lru_cache(maxsize=READ_CACHE_SIZE)(_read_table)
+
+def read_result(result_ref: str, cached: bool = True) -> pd.DataFrame:
+    """
+    This function loads a task result from its `result_ref`. Results are
+    immutable, so recently read tables are kept in memory unless `cached` is
+    False (e.g. for intermediate results read once).
+    """
+    table = _read_table_cached(result_ref) if cached else _read_table(result_ref)
+
+    return table.to_pandas()
+
+def delete_result(result_ref: str) -> None:
+    """
+    This function deletes a stored result, e.g. an intermediate result that
+    has been merged.
+    """
+    filesystem, path = fs.FileSystem.from_uri(result_ref)
+
+    try:
+        filesystem.delete_file(path)
+    except FileNotFoundError:
+        pass
+
+def cleanup_results(ttl_seconds: int | None = None) -> int:
+    """
+    This function deletes stored results older than the TTL.
+
+    Returns: the number of deleted files
+    """
+    ttl_seconds = result_ttl_seconds() if ttl_seconds is None else ttl_seconds
+    filesystem, root = fs.FileSystem.from_uri(_store_uri())
+    cutoff = time.time() - ttl_seconds
+
+    deleted = 0
+    for info in filesystem.get_file_info(fs.FileSelector(root, allow_not_found=True)):
+        if info.type != fs.FileType.File or not info.path.endswith(".parquet"):
+            continue
+        if info.mtime is not None and info.mtime.timestamp() < cutoff:
+            filesystem.delete_file(info.path)
+            deleted += 1
+
+    logger.info("Deleted %d expired results from %s", deleted, _store_uri())
+
+    return deleted
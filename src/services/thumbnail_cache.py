@@ -0,0 +1,251 @@
+"""
+LRU cache of Sentinel-2 RGB thumbnails, shared by the web process and the
+Celery workers.
+
+Workers render thumbnails and the web process serves them, so both must see
+the same store. It is a local directory or an object store prefix, selected
+with `THUMBNAIL_STORE_URI`, e.g.
+
+    THUMBNAIL_STORE_URI=file:///mnt/shared/thumbnails
+    THUMBNAIL_STORE_URI=s3://regen-cache/thumbnails
+
+and accessed through `pyarrow.fs`, as the result store. The default local
+directory only works when the web process and the workers run on one host.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from pyarrow import fs
+
+from services.earth_engine_images import (
+    RGB_VIS_PARAMS,
+    RGB_WINDOW_DAYS,
+    render_rgb_filmstrip,
+    render_rgb_thumbnail
+)
+from utils.geometry import canonical_wkt
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_STORE_URI = (ROOT_DIR / "cache" / "thumbnails").as_uri()
+DEFAULT_MAX_MB = 256
+THUMBNAIL_ROUTE = "/thumbnails"
+
+def thumbnail_key(wkt: str, date: str, window_days: int = RGB_WINDOW_DAYS, vis_params: Optional[dict[str, Any]] = None) -> str:
+    """
+    This function returns the cache key for a thumbnail, derived from the
+    canonical geometry, the date window and the visualization parameters.
+    """
+    payload = json.dumps(
+        {
+            "geometry": canonical_wkt(wkt),
+            "date": date,
+            "window_days": window_days,
+            "vis_params": vis_params or RGB_VIS_PARAMS,
+        },
+        sort_keys=True
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def filmstrip_key(wkt: str, dates: list[str], window_days: int = RGB_WINDOW_DAYS) -> str:
+    """
+    This function returns the cache key for a filmstrip of several dates. The
+    order of the dates is part of the key since it fixes the order of the frames.
+    """
+    payload = json.dumps(
+        {
+            "geometry": canonical_wkt(wkt),
+            "dates": list(dates),
+            "window_days": window_days,
+            "vis_params": RGB_VIS_PARAMS,
+        },
+        sort_keys=True
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def thumbnail_url(key: str) -> str:
+    # URL of the Flask route serving a cached thumbnail
+    return f"{THUMBNAIL_ROUTE}/{key}.png"
+
+class ThumbnailCache:
+    """
+    Stores thumbnail PNGs in a `pyarrow.fs` filesystem, evicting the oldest
+    files once the total size exceeds `max_bytes`. The file modification time
+    orders the eviction, so the cache survives restarts and is shared by every
+    process pointing at the same URI. On a local filesystem reads refresh the
+    modification time, making the eviction least-recently-used; object stores
+    do not allow that, so there the oldest renders are evicted first.
+
+    Attributes:
+        uri (str): URI of the store
+        max_bytes (int): size budget of the cache
+    """
+    def __init__(self, uri: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.uri = (uri or os.getenv("THUMBNAIL_STORE_URI", DEFAULT_STORE_URI)).rstrip("/")
+        self.max_bytes = max_bytes or int(os.getenv("THUMBNAIL_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+        self.filesystem, self.root = fs.FileSystem.from_uri(self.uri)
+        self.filesystem.create_dir(self.root, recursive=True)
+
+    def path(self, key: str) -> str:
+        return f"{self.root}/{key}.png"
+
+    def _touch(self, key: str) -> None:
+        # Marks a file as recently used where the filesystem allows it
+        if isinstance(self.filesystem, fs.LocalFileSystem):
+            os.utime(self.path(key))
+
+    def contains(self, key: str) -> bool:
+        try:
+            self._touch(key)
+        except FileNotFoundError:
+            return False
+
+        return self.filesystem.get_file_info(self.path(key)).type == fs.FileType.File
+
+    def get(self, key: str) -> Optional[bytes]:
+        # Returns the cached PNG and marks it as recently used
+        try:
+            with self.filesystem.open_input_stream(self.path(key)) as f:
+                data = f.read()
+            self._touch(key)
+        except FileNotFoundError:
+            return None
+
+        return data
+
+    def image_size(self, key: str) -> Optional[tuple[int, int]]:
+        # (width, height) of a cached PNG, read from its IHDR header
+        try:
+            with self.filesystem.open_input_stream(self.path(key)) as f:
+                header = f.read(24)
+        except FileNotFoundError:
+            return None
+
+        return struct.unpack(">II", header[16:24])
+
+    def put(self, key: str, data: bytes) -> None:
+        # Written under a temporary name and moved, so readers never see a partial file
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with self.filesystem.open_output_stream(tmp_path) as f:
+            f.write(data)
+        self.filesystem.move(tmp_path, path)
+
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = [
+            info for info in self.filesystem.get_file_info(fs.FileSelector(self.root, allow_not_found=True))
+            if info.type == fs.FileType.File and info.path.endswith(".png")
+        ]
+
+        total = sum(info.size for info in entries)
+        for info in sorted(entries, key=lambda info: info.mtime_ns or 0):
+            if total <= self.max_bytes:
+                break
+            try:
+                self.filesystem.delete_file(info.path)
+            except FileNotFoundError:
+                continue
+            total -= info.size
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+_inflight: dict[str, threading.Lock] = {}
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    # Returns the process-wide thumbnail cache
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache()
+
+        return _cache
+
+def _get_or_render(key: str, render: Callable[[], Optional[bytes]]) -> Optional[str]:
+    # Renders on a cache miss; concurrent requests for a key within a process share one render
+    cache = get_thumbnail_cache()
+
+    if cache.contains(key):
+        return key
+
+    with _cache_lock:
+        lock = _inflight.setdefault(key, threading.Lock())
+
+    with lock:
+        try:
+            if cache.contains(key):
+                return key
+
+            data = render()
+            if data is None:
+                return None
+
+            cache.put(key, data)
+            return key
+        finally:
+            with _cache_lock:
+                _inflight.pop(key, None)
+
+def get_or_render_thumbnail(wkt: str, date: str) -> Optional[str]:
+    """
+    This function returns the cache key of the RGB thumbnail of a polygon at a
+    given date, rendering it with Earth Engine only on a cache miss. Concurrent
+    requests for the same thumbnail within a process share one render.
+
+    Args: (i) wkt - polygon geometry in WKT
+          (ii) date - acquisition date (YYYY-MM-DD)
+
+    Returns: the thumbnail cache key, or None if no image is available
+    """
+    return _get_or_render(thumbnail_key(wkt, date), lambda: render_rgb_thumbnail(wkt, date))
+
+def filmstrip_frame_size(key: str, frames: int) -> Optional[tuple[int, int]]:
+    """
+    This function returns the (width, height) of a single frame of a cached
+    filmstrip; frames are stacked vertically with equal heights.
+    """
+    size = get_thumbnail_cache().image_size(key)
+    if size is None:
+        return None
+
+    width, height = size
+
+    return width, height // max(frames, 1)
+
+def filmstrip_metadata(key: str, dates: list[str]) -> dict[str, Any]:
+    # Everything a client needs to page through the frames of a cached filmstrip
+    frame_width, frame_height = filmstrip_frame_size(key, len(dates)) or (None, None)
+
+    return {
+        "url": thumbnail_url(key),
+        "dates": dates,
+        "frames": len(dates),
+        "frame_width": frame_width,
+        "frame_height": frame_height
+    }
+
+def get_or_render_filmstrip(wkt: str, dates: list[str]) -> Optional[str]:
+    """
+    This function returns the cache key of the RGB filmstrip of a polygon over
+    several dates, rendered with a single Earth Engine call on a cache miss.
+
+    Args: (i) wkt - polygon geometry in WKT
+          (ii) dates - acquisition dates (YYYY-MM-DD), one frame each
+
+    Returns: the filmstrip cache key, or None if no image is available
+    """
+    return _get_or_render(filmstrip_key(wkt, dates), lambda: render_rgb_filmstrip(wkt, dates))
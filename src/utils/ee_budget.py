@@ -0,0 +1,208 @@
+"""
+Earth Engine rate-limit coordinator shared by all workers and web processes.
+
+Every Earth Engine call site (time series, thumbnails, filmstrips) holds a
+lease while its request runs. A lease is granted atomically by a Lua script
+when both limits allow it:
+
+* a token bucket `ee:bucket` refilled at `EE_REQUESTS_PER_SECOND` up to
+  `EE_BURST` tokens, which caps the request rate of the whole fleet;
+* the sorted set `ee:slots` of running requests scored by lease expiry, which
+  caps them at `EE_MAX_CONCURRENCY`. Expired leases (from killed workers) are
+  dropped before counting, so a crash never leaks a slot for longer than
+  `EE_SLOT_LEASE` seconds.
+
+When refused, the script returns how long until the next token, so callers
+sleep exactly that long instead of backing off exponentially and the fleet
+stays at the quota ceiling. Counters are kept in the hash `ee:stats` and
+exposed by the `/metrics/ee` route. If Redis is unavailable the coordinator
+fails open: calls proceed unthrottled and a warning is logged.
+"""
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+from uuid import uuid4
+
+import redis
+
+from utils.logging_config import get_logger
+from utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+EE_MAX_CONCURRENCY = int(os.getenv("EE_MAX_CONCURRENCY", 10))
+EE_REQUESTS_PER_SECOND = float(os.getenv("EE_REQUESTS_PER_SECOND", 10))
+EE_BURST = float(os.getenv("EE_BURST", EE_MAX_CONCURRENCY))
+EE_ACQUIRE_TIMEOUT = float(os.getenv("EE_ACQUIRE_TIMEOUT", 60)) # seconds a call waits for a lease
+EE_SLOT_LEASE = 600 # seconds
+SATURATED_POLL = 0.1 # seconds between attempts while every slot is in use
+
+BUCKET_KEY = "ee:bucket"
+SLOTS_KEY = "ee:slots"
+STATS_KEY = "ee:stats"
+QUOTA_ERROR_MARKERS = ("429", "Too Many Requests", "Quota exceeded", "rate limit")
+
+# Returns {1, 0} when a lease is granted, otherwise {0, wait_ms, reason}
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_concurrency = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local granted = 0
+local wait_ms = 0
+local reason = ''
+if redis.call('ZCARD', KEYS[2]) >= max_concurrency then
+    reason = 'saturated'
+elseif tokens < 1 then
+    reason = 'throttled'
+    wait_ms = math.ceil((1 - tokens) / rate * 1000)
+else
+    tokens = tokens - 1
+    granted = 1
+    redis.call('ZADD', KEYS[2], now + lease, ARGV[5])
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+
+if granted == 1 then
+    return {1, 0}
+end
+return {0, wait_ms, reason}
+"""
+
+UNTHROTTLED = object() # lease placeholder when Redis is unavailable
+
+class EEBudgetExhausted(Exception):
+    """Raised when no Earth Engine lease could be obtained in time."""
+
+def _incr_stats(**counters: float) -> None:
+    try:
+        pipe = get_redis().pipeline()
+        for name, amount in counters.items():
+            pipe.hincrbyfloat(STATS_KEY, name, amount)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Failed to record Earth Engine stats: %s", e)
+
+def _try_acquire(token: str) -> tuple[bool, float, str]:
+    # One atomic attempt: (granted, seconds to wait, reason refused). The script runs by SHA after the first load
+    granted, wait_ms, *reason = get_redis().register_script(ACQUIRE_SCRIPT)(
+        keys=[BUCKET_KEY, SLOTS_KEY],
+        args=[EE_REQUESTS_PER_SECOND, EE_BURST, EE_MAX_CONCURRENCY, EE_SLOT_LEASE, token]
+    )
+
+    return bool(granted), wait_ms / 1000, reason[0] if reason else ""
+
+def acquire_ee_slot(timeout: float = EE_ACQUIRE_TIMEOUT) -> Optional[str]:
+    """
+    This function waits up to `timeout` seconds for an Earth Engine lease.
+
+    Returns: a lease token to release later, or None if none was granted in time
+    """
+    token = str(uuid4())
+    start = time.monotonic()
+    deadline = start + timeout
+
+    while True:
+        granted, wait, reason = _try_acquire(token)
+        if granted:
+            _incr_stats(acquired=1, wait_seconds=time.monotonic() - start)
+            return token
+
+        _incr_stats(**{reason: 1})
+        if reason == "saturated":
+            wait = SATURATED_POLL
+
+        # Jitter keeps waiting callers from retrying in lockstep
+        wait *= random.uniform(1.0, 1.2)
+        if time.monotonic() + wait > deadline:
+            _incr_stats(timeouts=1)
+            return None
+
+        time.sleep(wait)
+
+def release_ee_slot(token: str) -> None:
+    get_redis().zrem(SLOTS_KEY, token)
+
+def _is_quota_error(e: Exception) -> bool:
+    return any(marker.lower() in str(e).lower() for marker in QUOTA_ERROR_MARKERS)
+
+@contextmanager
+def ee_slot(timeout: float = EE_ACQUIRE_TIMEOUT) -> Iterator[None]:
+    """
+    Context manager holding an Earth Engine lease for its duration. Raises
+    `EEBudgetExhausted` if none is granted within `timeout` seconds (0 to
+    fail immediately, e.g. for bulk work that is retried later).
+    """
+    try:
+        token = acquire_ee_slot(timeout)
+    except redis.RedisError as e:
+        logger.warning("Earth Engine coordinator unavailable, proceeding unthrottled: %s", e)
+        token = UNTHROTTLED
+
+    if token is UNTHROTTLED:
+        yield
+        return
+    if token is None:
+        raise EEBudgetExhausted(f"No Earth Engine lease within {timeout:.0f}s ({EE_MAX_CONCURRENCY} slots, {EE_REQUESTS_PER_SECOND:g} req/s).")
+
+    try:
+        yield
+    except Exception as e:
+        if _is_quota_error(e):
+            _incr_stats(quota_errors=1)
+        raise
+    finally:
+        try:
+            release_ee_slot(token)
+        except redis.RedisError as e:
+            logger.warning("Failed to release Earth Engine lease (expires in %ds): %s", EE_SLOT_LEASE, e)
+
+def get_ee_budget_stats() -> dict[str, Any]:
+    """
+    This function returns the coordinator limits, its current state (running
+    requests and available tokens) and its counters: leases granted, attempts
+    refused because every slot was busy (`saturated`) or the rate was exceeded
+    (`throttled`), callers that gave up (`timeouts`), quota errors returned by
+    Earth Engine despite the limits, and the mean wait for a lease.
+    """
+    redis_client = get_redis()
+    seconds, microseconds = redis_client.time() # the script's clock, not this host's
+    now = seconds + microseconds / 1e6
+
+    pipe = redis_client.pipeline()
+    pipe.hgetall(STATS_KEY)
+    pipe.zcount(SLOTS_KEY, now, "+inf")
+    pipe.hmget(BUCKET_KEY, "tokens", "ts")
+    counters, in_flight, (tokens, ts) = pipe.execute()
+
+    stats = {name: float(counters.get(name, 0)) for name in ("acquired", "saturated", "throttled", "timeouts", "quota_errors")}
+    wait_seconds = float(counters.get("wait_seconds", 0))
+
+    if tokens is not None:
+        tokens = min(EE_BURST, float(tokens) + max(0.0, now - float(ts)) * EE_REQUESTS_PER_SECOND)
+
+    return {
+        "limits": {
+            "max_concurrency": EE_MAX_CONCURRENCY,
+            "requests_per_second": EE_REQUESTS_PER_SECOND,
+            "burst": EE_BURST,
+        },
+        "in_flight": in_flight,
+        "tokens_available": EE_BURST if tokens is None else round(tokens, 2),
+        **{name: int(value) for name, value in stats.items()},
+        "mean_wait_seconds": round(wait_seconds / stats["acquired"], 3) if stats["acquired"] else 0.0,
+    }
@@ -0,0 +1,99 @@
+"""
+Vectorized geometry helpers shared by the soil service, upload validation and
+map callbacks. All functions operate on whole arrays of geometries using the
+shapely 2 array API instead of per-row Python loops.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+import shapely
+from numpy.typing import NDArray
+from pyproj import Transformer
+
+WGS84 = "EPSG:4326"
+EQUAL_AREA_CRS = "EPSG:6933" # WGS 84 / NSIDC EASE-Grid 2.0 Global (equal-area)
+SQ_METERS_TO_ACRES = 0.000247105
+POLYGON_TYPE_ID = 3 # shapely.GeometryType.POLYGON
+
+@lru_cache(maxsize=None)
+def _transformer(src_crs: str, dst_crs: str) -> Transformer:
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+def wkt_to_geometries(wkts: Iterable[str], on_invalid: str = "raise") -> NDArray[np.object_]:
+    """
+    This function parses WKT strings into an array of shapely geometries.
+
+    Args:
+        wkts (Iterable[str]): geometries in WKT
+        on_invalid (str): 'raise', 'warn' or 'ignore'; invalid WKT becomes None
+            unless 'raise'
+
+    Returns:
+        (np.ndarray): array of shapely geometries
+    """
+    return shapely.from_wkt(np.asarray(list(wkts), dtype=object), on_invalid=on_invalid)
+
+def canonical_wkts(wkts: Iterable[str]) -> list[str]:
+    """
+    This function returns canonical WKTs so that the same polygon maps to the
+    same string regardless of vertex order, ring orientation or float noise.
+    Used to key caches and deduplicate requests.
+    """
+    geometries = shapely.normalize(shapely.set_precision(wkt_to_geometries(wkts), 1e-7))
+
+    return shapely.to_wkt(geometries, rounding_precision=7).tolist()
+
+def canonical_wkt(wkt: str) -> str:
+    """
+    Single-geometry version of `canonical_wkts`.
+    """
+    return canonical_wkts([wkt])[0]
+
+def reproject(geometries: NDArray[np.object_], src_crs: str, dst_crs: str) -> NDArray[np.object_]:
+    """
+    This function reprojects an array of geometries with a single vectorized
+    coordinate transformation.
+    """
+    transformer = _transformer(src_crs, dst_crs)
+
+    def transform_coords(coords: NDArray[np.float64]) -> NDArray[np.float64]:
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    return shapely.transform(geometries, transform_coords)
+
+def centroids_lat_lon(geometries: NDArray[np.object_]) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+    This function computes polygon centroids in an equal-area projection, where
+    they are area-weighted correctly, and returns them as WGS84 coordinates.
+
+    Args:
+        geometries (np.ndarray): WGS84 geometries
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): latitudes and longitudes of the centroids
+    """
+    centroids = shapely.centroid(reproject(geometries, WGS84, EQUAL_AREA_CRS))
+    centroids = reproject(centroids, EQUAL_AREA_CRS, WGS84)
+
+    return shapely.get_y(centroids), shapely.get_x(centroids)
+
+def areas_acres(geometries: NDArray[np.object_]) -> NDArray[np.float64]:
+    """
+    This function computes the physical area of WGS84 geometries in acres.
+    """
+    return shapely.area(reproject(geometries, WGS84, EQUAL_AREA_CRS)) * SQ_METERS_TO_ACRES
+
+def valid_polygon_mask(geometries: NDArray[np.object_]) -> NDArray[np.bool_]:
+    """
+    This function flags geometries that are valid, non-empty single POLYGONs.
+    Missing (unparseable) geometries are flagged as invalid.
+    """
+    return (
+        (shapely.get_type_id(geometries) == POLYGON_TYPE_ID)
+        & shapely.is_valid(geometries)
+        & ~shapely.is_empty(geometries)
+    )
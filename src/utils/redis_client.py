@@ -0,0 +1,28 @@
+import os
+import threading
+from typing import Optional
+
+import redis
+
+_client: Optional[redis.Redis] = None
+_client_pid: Optional[int] = None
+_lock = threading.Lock()
+
+def get_redis() -> redis.Redis:
+    """
+    Returns a process-wide Redis client for coordination state (coalescing keys,
+    job mirrors, counters). Uses `REDIS_URL`, falling back to the Celery broker.
+    A new client is created after a fork so connections are never shared.
+    """
+    global _client, _client_pid
+
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            url = os.getenv("REDIS_URL") or os.getenv("CELERY_BROKER_URL")
+            if not url:
+                raise RuntimeError("Missing REDIS_URL or CELERY_BROKER_URL environment variable.")
+
+            _client = redis.Redis.from_url(url, decode_responses=True)
+            _client_pid = os.getpid()
+
+        return _client
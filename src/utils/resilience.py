@@ -0,0 +1,376 @@
+"""
+Resilience primitives for calls to external services (Earth Engine, iSDA).
+
+Every upstream endpoint has an `EndpointPolicy` (registered with
+`register_endpoint`) and a `CircuitBreaker` of the same name:
+
+* each attempt is bounded by the policy timeout, so a hung upstream never ties
+  up a worker for longer than that;
+* transient failures are retried with full-jitter exponential backoff;
+* after `failure_threshold` consecutive failures the breaker opens and calls
+  fail fast with `CircuitOpenError` until `reset_timeout` has passed, when a
+  single trial call is let through (half-open);
+* idempotent reads may be hedged: if the first attempt has not answered after
+  `hedge_after` seconds a duplicate is sent and the first answer wins;
+* a rate-limit lease can be taken before each attempt; waiting for it is not
+  part of the attempt timeout, and such calls are never hedged.
+
+Threads cannot be interrupted, so a timed-out attempt keeps running (and holds
+its lease) until it ends. Such attempts are counted per endpoint, and once
+`max_abandoned` of them are hanging further attempts fail fast.
+
+Breakers are per process. State changes are passed to listeners registered
+with `add_state_listener` (outside the breaker lock), which the queue uses to
+publish fleet-wide state.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, ContextManager, Optional, TypeVar
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+CALL_THREADS = 32 # threads running bounded synchronous calls per process
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    timeout: float # seconds per attempt
+    retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge_after: Optional[float] = None # seconds; None disables hedging
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    max_abandoned: int = 4 # timed-out calls still running before attempts fail fast
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Attributes:
+        name (str): endpoint name
+        failure_threshold (int): consecutive failures that open the circuit
+        reset_timeout (float): seconds the circuit stays open before a trial call
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._abandoned = 0
+        self._counts = {"successes": 0, "failures": 0, "rejected": 0}
+        self._changes: list[dict[str, Any]] = [] # state changes not yet passed to the listeners
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            state = self._current_state()
+
+        self._publish()
+        return state
+
+    @property
+    def abandoned(self) -> int:
+        # Attempts that timed out but are still running in their thread
+        with self._lock:
+            return self._abandoned
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        # Called with the lock held; listeners are called by `_publish` once it is released
+        if state == self._state:
+            return
+
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        self._trial_in_flight = False
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+
+        self._changes.append({
+            "name": self.name,
+            "state": state,
+            "consecutive_failures": self._failures,
+            "changed_at": time.time(),
+        })
+
+    def _publish(self) -> None:
+        with self._lock:
+            changes, self._changes = self._changes, []
+
+        for change in changes:
+            _notify(change)
+
+    def before_call(self) -> None:
+        """Raises `CircuitOpenError` if the call must not go through."""
+        try:
+            with self._lock:
+                state = self._current_state()
+
+                if state == CLOSED:
+                    return
+                if state == HALF_OPEN and not self._trial_in_flight:
+                    self._trial_in_flight = True
+                    return
+
+                self._counts["rejected"] += 1
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        finally:
+            self._publish()
+
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open, retry in {retry_in:.0f}s).")
+
+    def release_trial(self) -> None:
+        """
+        Gives back a call admitted by `before_call` that never reached the
+        upstream (e.g. no rate-limit lease), leaving the state unchanged.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counts["successes"] += 1
+            self._failures = 0
+            self._set_state(CLOSED)
+
+        self._publish()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counts["failures"] += 1
+            self._failures += 1
+
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._set_state(OPEN)
+
+        self._publish()
+
+    def _abandon(self, future: Future) -> None:
+        with self._lock:
+            self._abandoned += 1
+
+        future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, _: Future) -> None:
+        with self._lock:
+            self._abandoned -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            snapshot = {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": round(max(retry_in, 0.0), 1),
+                "abandoned_calls": self._abandoned,
+                **self._counts,
+            }
+
+        self._publish()
+        return snapshot
+
+_policies: dict[str, EndpointPolicy] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_listeners: list[Callable[[dict[str, Any]], None]] = []
+_registry_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=CALL_THREADS, thread_name_prefix="external-call")
+
+def register_endpoint(name: str, policy: EndpointPolicy) -> CircuitBreaker:
+    """
+    This function registers the policy of an endpoint and returns its breaker.
+    Re-registering a name keeps the existing breaker.
+    """
+    with _registry_lock:
+        _policies[name] = policy
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, policy.failure_threshold, policy.reset_timeout)
+
+        return _breakers[name]
+
+def get_breaker(name: str) -> CircuitBreaker:
+    return _breakers[name]
+
+def breaker_states() -> list[dict[str, Any]]:
+    # Snapshots of every breaker of this process
+    return [breaker.snapshot() for breaker in list(_breakers.values())]
+
+def add_state_listener(listener: Callable[[dict[str, Any]], None]) -> None:
+    # `listener` receives the breaker name and new state on every state change
+    _listeners.append(listener)
+
+def _notify(change: dict[str, Any]) -> None:
+    # Called without any breaker lock held, so slow listeners never block calls
+    for listener in _listeners:
+        try:
+            listener(change)
+        except Exception as e:
+            logger.warning("Circuit breaker listener failed: %s", e)
+
+def _run_bounded(fn: Callable[[], T], policy: EndpointPolicy, breaker: CircuitBreaker, hedge: bool) -> T:
+    # One attempt, bounded by the policy timeout and optionally hedged
+    futures: list[Future] = [_executor.submit(fn)]
+    deadline = time.monotonic() + policy.timeout
+
+    if hedge and policy.hedge_after is not None and policy.hedge_after < policy.timeout:
+        done, _ = wait(futures, timeout=policy.hedge_after)
+        if not done:
+            logger.debug("Hedging slow call after %.1fs.", policy.hedge_after)
+            futures.append(_executor.submit(fn))
+
+    pending = set(futures)
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    breaker._abandon(other)
+                return future.result()
+            error = future.exception()
+
+    if error is not None and not pending:
+        raise error
+
+    # Threads cannot be interrupted: the abandoned calls keep running (and holding
+    # any lease) but no longer block the caller, and they are counted until they end
+    for future in pending:
+        breaker._abandon(future)
+
+    raise TimeoutError(f"Call did not complete within {policy.timeout:g}s.")
+
+def call_external(
+        name: str,
+        fn: Callable[[], T],
+        is_failure: Callable[[BaseException], bool] = lambda e: True,
+        lease: Optional[Callable[[], ContextManager[Any]]] = None
+) -> T:
+    """
+    This function calls a synchronous endpoint under its policy: breaker
+    check, bounded (and possibly hedged) attempts, and jittered retries.
+
+    Args: (i) name - registered endpoint name
+          (ii) fn - zero-argument callable performing the request; hedged
+               endpoints must only be given idempotent reads
+          (iii) is_failure - whether an exception raised by `fn` signals an
+                upstream failure (counted by the breaker and retried); other
+                exceptions, e.g. an empty result, mean the upstream answered
+                and propagate immediately
+          (iv) lease - context manager factory (e.g. a rate-limit slot)
+               entered before each attempt. Waiting for it does not count
+               toward the attempt timeout, and the lease is held by the
+               attempt's thread until the request really ends, even after a
+               timeout. Calls with a lease are never hedged.
+
+    Returns: the result of `fn`
+    """
+    policy = _policies[name]
+    breaker = _breakers[name]
+
+    for attempt in range(policy.retries + 1):
+        breaker.before_call()
+
+        if breaker.abandoned >= policy.max_abandoned:
+            # Earlier attempts are still hanging; starting more would only pile up threads and leases
+            failure: BaseException = TimeoutError(f"{breaker.abandoned} earlier calls to {name} are still running.")
+        else:
+            try:
+                attempt_fn = fn if lease is None else _leased(fn, lease)
+            except BaseException:
+                # Refused locally (e.g. rate-limit budget exhausted): the upstream was not contacted
+                breaker.release_trial()
+                raise
+
+            try:
+                result = _run_bounded(attempt_fn, policy, breaker, hedge=lease is None)
+            except (TimeoutError, ConnectionError) as e:
+                failure = e
+            except Exception as e:
+                if not is_failure(e):
+                    breaker.record_success() # the upstream answered
+                    raise
+                failure = e
+            else:
+                breaker.record_success()
+                return result
+
+        breaker.record_failure()
+        if attempt >= policy.retries:
+            raise failure
+
+        delay = backoff_delay(attempt, policy.backoff_base, policy.backoff_max)
+        logger.info("%s failed (%s); retrying in %.2fs.", name, failure, delay)
+        time.sleep(delay)
+
+def _leased(fn: Callable[[], T], lease: Callable[[], ContextManager[Any]]) -> Callable[[], T]:
+    # Enters the lease in the calling thread and hands it over to the thread running `fn`
+    with ExitStack() as stack:
+        stack.enter_context(lease())
+        held = stack.pop_all()
+
+    def run() -> T:
+        with held:
+            return fn()
+
+    return run
+
+async def hedge_async(request: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+    """
+    This function awaits `request()`, starting a duplicate if the first has not
+    finished after `hedge_after` seconds; the first successful answer wins and
+    the other is cancelled. Only for idempotent reads.
+    """
+    first = asyncio.ensure_future(request())
+    if hedge_after is None:
+        return await first
+
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+
+    tasks = {first, asyncio.ensure_future(request())}
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                if not tasks:
+                    raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,122 @@
+import fakeredis
+import pytest
+import redis
+from flask import Flask
+
+from regen_queue import admission
+from regen_queue.admission import AdmissionRejected, admit_render, admit_vi_job, fair_priority
+from regen_queue.celery_app import BULK_QUEUE, INTERACTIVE_QUEUE, PRIORITY_LEVELS
+from services.earth_engine_timeseries import MAX_POLYGONS
+
+class FakePipeline:
+    # Just enough of a Redis pipeline for `admit_vi_job`; every admission is the client's only one
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self) -> list[int]:
+        return [1]
+
+class FakeRedis:
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline()
+
+@pytest.fixture
+def queues(monkeypatch):
+    # Records the queue whose backlog is estimated, with an idle client and empty queues
+    estimated = []
+    monkeypatch.setattr(admission, "_outstanding", lambda client: (0, 0))
+    monkeypatch.setattr(admission, "estimated_wait_minutes", lambda queue: estimated.append(queue) or 0)
+    monkeypatch.setattr(admission, "get_redis", lambda: FakeRedis())
+
+    return estimated
+
+@pytest.mark.parametrize(
+    ("polygons", "queue"),
+    [(1, INTERACTIVE_QUEUE), (MAX_POLYGONS, INTERACTIVE_QUEUE), (MAX_POLYGONS + 1, BULK_QUEUE), (500, BULK_QUEUE)]
+)
+def test_queue_choice_by_size(queues, polygons, queue):
+    assert admit_vi_job("client", "job", polygons).queue == queue
+    assert queues == [queue]
+
+def test_queue_choice_without_redis(monkeypatch):
+    def unavailable(client):
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(admission, "_outstanding", unavailable)
+
+    assert admit_vi_job("client", "job", 1) == admission.Admission(INTERACTIVE_QUEUE, 0, 0)
+    assert admit_vi_job("client", "job", MAX_POLYGONS + 1) == admission.Admission(BULK_QUEUE, 0, 0)
+
+def test_rejects_clients_over_the_job_cap(queues, monkeypatch):
+    monkeypatch.setattr(admission, "_outstanding", lambda client: (admission.VI_MAX_JOBS_PER_USER, 2))
+
+    with pytest.raises(AdmissionRejected):
+        admit_vi_job("client", "job", 1)
+
+def test_rejects_when_the_wait_is_too_long(queues, monkeypatch):
+    monkeypatch.setattr(admission, "estimated_wait_minutes", lambda queue: admission.VI_MAX_WAIT_MINUTES + 1)
+
+    with pytest.raises(AdmissionRejected, match="Server busy"):
+        admit_vi_job("client", "job", 1)
+
+def test_fair_priority_grows_with_backlog_and_is_capped():
+    step = admission.PRIORITY_STEP_POLYGONS
+
+    assert fair_priority(0, 1, weight=1) == 0
+    assert fair_priority(step, 1, weight=1) == 1
+    assert fair_priority(step, 1, weight=2) == 0 # heavier clients tolerate a larger backlog
+    assert fair_priority(1000 * step, 1, weight=1) == PRIORITY_LEVELS - 1
+
+@pytest.fixture
+def render_redis(monkeypatch):
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(admission, "get_redis", lambda: redis_client)
+
+    return redis_client
+
+def test_render_rate_limit_per_client(render_redis):
+    for _ in range(admission.RENDER_MAX_PER_MINUTE):
+        admit_render("client")
+
+    with pytest.raises(AdmissionRejected, match="Too many image requests"):
+        admit_render("client")
+
+    # Other clients have their own budget, and heavier clients a larger one
+    admit_render("other")
+    for _ in range(admission.RENDER_MAX_PER_MINUTE + 1):
+        admit_render("user", weight=2)
+
+def test_render_rate_limit_window_expires(render_redis):
+    for _ in range(admission.RENDER_MAX_PER_MINUTE):
+        admit_render("client")
+
+    assert 0 < render_redis.ttl("admission:renders:client") <= admission.RENDER_WINDOW_SECONDS
+    render_redis.delete("admission:renders:client") # the window expired
+
+    admit_render("client")
+
+def test_render_rate_limit_fails_open(monkeypatch):
+    def unavailable():
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(admission, "get_redis", unavailable)
+
+    for _ in range(admission.RENDER_MAX_PER_MINUTE + 1):
+        admit_render("client")
+
+def test_filmstrip_route_rejects_clients_over_the_limit(render_redis, monkeypatch):
+    from routes import thumbnails
+
+    enqueued = []
+    monkeypatch.setattr(thumbnails, "enqueue_rgb_filmstrip", lambda wkt, dates: enqueued.append(dates) or (None, dates, "task"))
+
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.register_blueprint(thumbnails.thumbnails_bp)
+    client = app.test_client()
+    payload = {"wkt": "POLYGON((36 -1, 36.01 -1, 36.01 -0.99, 36 -0.99, 36 -1))", "dates": ["2024-03-01"]}
+
+    statuses = [client.post("/thumbnails/filmstrip", json=payload).status_code for _ in range(admission.RENDER_MAX_PER_MINUTE + 1)]
+
+    assert statuses == [202] * admission.RENDER_MAX_PER_MINUTE + [429]
+    assert len(enqueued) == admission.RENDER_MAX_PER_MINUTE
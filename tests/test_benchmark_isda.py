@@ -0,0 +1,35 @@
+import asyncio
+
+import shapely
+from aiohttp.test_utils import TestServer
+
+from benchmark_isda import KENYA_BOUNDS, random_polygons, run_batch
+from isda_stub_server import StubConfig, create_app
+from services.isda_soil_data import SOIL_PROPERTIES
+
+def test_random_polygons_are_reproducible_and_inside_kenya():
+    df = random_polygons(50, seed=3)
+
+    assert df.equals(random_polygons(50, seed=3))
+    assert df["uuid"].is_unique
+
+    polygons = shapely.from_wkt(df["geometry"])
+    assert shapely.is_valid(polygons).all()
+
+    lon_min, lat_min, lon_max, lat_max = KENYA_BOUNDS
+    bounds = shapely.bounds(polygons)
+    assert (bounds[:, 0] >= lon_min).all() and (bounds[:, 2] <= lon_max + 0.01).all()
+    assert (bounds[:, 1] >= lat_min).all() and (bounds[:, 3] <= lat_max + 0.01).all()
+
+def test_batch_metrics_count_requests_and_pooled_connections():
+    async def run():
+        async with TestServer(create_app(StubConfig(latency=0.01, jitter=0.0))) as server:
+            return await run_batch(random_polygons(5), str(server.make_url("")), max_concurrency=4, sampling="centroid")
+
+    metrics = asyncio.run(run())
+
+    # Random polygons across Kenya never share a raster cell
+    assert len(metrics.latencies) == 5 * len(SOIL_PROPERTIES)
+    assert all(latency >= 0.01 for latency in metrics.latencies)
+    assert 1 <= metrics.connections <= 4 + 1 # the concurrency limit, plus the login connection
+    assert metrics.elapsed > 0
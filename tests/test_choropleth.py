@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+import shapely
+
+from services.choropleth import (
+    CHOROPLETH_PRECISION,
+    SOIL_INDICATORS,
+    VI_INDICATORS,
+    choropleth_indicators,
+    choropleth_query,
+    simplify_polygons
+)
+
+TOLERANCE = 1e-4 # degrees
+
+def adjacent_farms() -> np.ndarray:
+    # Two farms sharing a densely sampled, slightly zigzagging boundary
+    edge = [(0.01 + 2e-6 * (-1) ** i, y) for i, y in enumerate(np.linspace(0, 0.01, 101))]
+    left = shapely.Polygon([(0, 0), *edge, (0, 0.01)])
+    right = shapely.Polygon([(0.02, 0), (0.02, 0.01), *edge[::-1]])
+
+    return np.array([left, right], dtype=object)
+
+def test_simplify_empty_input():
+    assert len(simplify_polygons(np.array([], dtype=object))) == 0
+
+def test_simplify_reduces_vertices():
+    simplified = simplify_polygons(adjacent_farms(), TOLERANCE)
+
+    assert shapely.get_num_coordinates(simplified).sum() < shapely.get_num_coordinates(adjacent_farms()).sum() / 10
+    assert shapely.is_valid(simplified).all()
+
+def test_simplify_keeps_shared_edges_shared():
+    farms = adjacent_farms()
+    assert shapely.coverage_is_valid(farms)
+
+    simplified = simplify_polygons(farms, TOLERANCE)
+
+    # No gap or overlap opens between the neighbours
+    assert shapely.coverage_is_valid(simplified)
+    assert shapely.union_all(simplified).area == pytest.approx(shapely.area(simplified).sum())
+    assert shapely.union_all(simplified).area == pytest.approx(shapely.union_all(farms).area, rel=1e-3)
+
+def test_simplify_overlapping_polygons_one_by_one():
+    overlapping = np.array([shapely.box(0, 0, 0.01, 0.01), shapely.box(0.005, 0, 0.015, 0.01)], dtype=object)
+
+    simplified = simplify_polygons(overlapping, TOLERANCE)
+
+    assert shapely.is_valid(simplified).all()
+    assert shapely.area(simplified) == pytest.approx(shapely.area(overlapping))
+
+def test_simplify_rounds_coordinates():
+    polygon = np.array([shapely.box(0.1234567891, 0.1, 0.2, 0.2)], dtype=object)
+
+    coords = shapely.get_coordinates(simplify_polygons(polygon, TOLERANCE))
+
+    np.testing.assert_allclose(coords / CHOROPLETH_PRECISION, np.round(coords / CHOROPLETH_PRECISION), atol=1e-6)
+
+def test_choropleth_indicators_of_tables():
+    assert choropleth_indicators(["farmpolygons"]) == VI_INDICATORS
+    assert choropleth_indicators(["peakvidistribution", "highndmidays"]) == VI_INDICATORS
+    assert choropleth_indicators(["soildata"]) == SOIL_INDICATORS
+    assert choropleth_indicators(["highndmidays", "ndvipeaksperfarm"]) == []
+
+def test_choropleth_query():
+    assert "FROM peakvidistribution p" in choropleth_query("ndmi_max")
+    assert "FROM soildata" in choropleth_query("ph")
+
+    with pytest.raises(ValueError, match="Invalid map indicator"):
+        choropleth_query("ph; DROP TABLE soildata")
@@ -0,0 +1,94 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+
+from regen_queue import dedupe
+from regen_queue.admission import Admission, AdmissionRejected
+from regen_queue.celery_app import INTERACTIVE_QUEUE
+from regen_queue.dedupe import get_dedupe_stats, request_fingerprint, submit_vi_request
+from regen_queue.jobs import FAILED, SUCCEEDED
+
+SQUARE = "POLYGON((36 -1, 36.01 -1, 36.01 -0.99, 36 -0.99, 36 -1))"
+# The same square from another starting vertex, clockwise and with float noise
+SQUARE_REORDERED = "POLYGON((36.01 -0.99, 36.0100000001 -1, 36 -1, 36 -0.99, 36.01 -0.99))"
+OTHER = "POLYGON((37 -1, 37.01 -1, 37.01 -0.99, 37 -0.99, 37 -1))"
+DATES = ("2020-01-01", "2025-01-01")
+
+def test_fingerprint_ignores_vertex_order_orientation_and_noise():
+    assert request_fingerprint([SQUARE], *DATES) == request_fingerprint([SQUARE_REORDERED], *DATES)
+
+def test_fingerprint_ignores_polygon_order():
+    assert request_fingerprint([SQUARE, OTHER], *DATES) == request_fingerprint([OTHER, SQUARE], *DATES)
+
+def test_fingerprint_depends_on_geometries_and_dates():
+    fingerprint = request_fingerprint([SQUARE], *DATES)
+
+    assert fingerprint != request_fingerprint([OTHER], *DATES)
+    assert fingerprint != request_fingerprint([SQUARE], "2021-01-01", DATES[1])
+
+def test_repeated_polygons_are_not_fingerprinted():
+    assert request_fingerprint([SQUARE, SQUARE_REORDERED], *DATES) is None
+
+@pytest.fixture
+def backend():
+    # Fake Redis, recorded enqueues and job statuses set by each test
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    enqueued = []
+    statuses = {}
+
+    def enqueue(roi_records, payload, user_id, client, submission):
+        enqueued.append(submission)
+        return Admission(INTERACTIVE_QUEUE, 0, 3)
+
+    with mock.patch.object(dedupe, "get_redis", return_value=redis_client), \
+            mock.patch.object(dedupe, "_enqueue", side_effect=enqueue), \
+            mock.patch.object(dedupe, "get_job_status", side_effect=statuses.get), \
+            mock.patch.object(dedupe, "default_date_range", return_value=DATES):
+        yield redis_client, enqueued, statuses
+
+def records(*wkts: str) -> list[dict]:
+    return [{"uuid": f"uuid-{i}", "geometry": wkt} for i, wkt in enumerate(wkts)]
+
+def test_identical_submission_reuses_the_claimed_job(backend):
+    _, enqueued, _ = backend
+
+    first = submit_vi_request(records(SQUARE, OTHER), user_id="a")
+    second = submit_vi_request(records(OTHER, SQUARE_REORDERED), user_id="b")
+
+    assert not first.reused and first.estimated_wait == 3
+    assert second.reused and second.job_id == first.job_id and second.task_id == first.task_id
+    assert [submission.job_id for submission in enqueued] == [first.job_id]
+    assert get_dedupe_stats() == {"hits": 1, "misses": 1, "skipped": 0, "requests": 2}
+
+def test_finished_jobs_are_reused_but_failed_jobs_are_not(backend):
+    _, enqueued, statuses = backend
+
+    first = submit_vi_request(records(SQUARE))
+    statuses[first.job_id] = {"status": SUCCEEDED}
+    assert submit_vi_request(records(SQUARE)).reused
+
+    statuses[first.job_id] = {"status": FAILED}
+    retried = submit_vi_request(records(SQUARE))
+
+    assert not retried.reused and retried.job_id != first.job_id
+    assert len(enqueued) == 2
+
+def test_rejected_submission_releases_the_claim(backend):
+    redis_client, _, _ = backend
+
+    with mock.patch.object(dedupe, "_enqueue", side_effect=AdmissionRejected("busy")):
+        with pytest.raises(AdmissionRejected):
+            submit_vi_request(records(SQUARE))
+
+    assert redis_client.get(f"dedupe:{request_fingerprint([SQUARE], *DATES)}") is None
+    assert not submit_vi_request(records(SQUARE)).reused
+
+def test_submissions_with_repeated_polygons_always_enqueue(backend):
+    _, enqueued, _ = backend
+
+    submit_vi_request(records(SQUARE, SQUARE))
+    submit_vi_request(records(SQUARE, SQUARE))
+
+    assert len(enqueued) == 2
+    assert get_dedupe_stats()["skipped"] == 2
@@ -0,0 +1,38 @@
+import pytest
+
+from services.earth_engine_images import FILMSTRIP_MAX_FRAMES, filmstrip_dates, snap_to_acquisition
+
+ACQUISITIONS = ["2024-03-01", "2024-03-06", "2024-03-16"]
+
+def test_snap_to_acquisition_exact_date():
+    assert snap_to_acquisition(ACQUISITIONS, "2024-03-06") == "2024-03-06"
+
+def test_snap_to_acquisition_nearest_date():
+    assert snap_to_acquisition(ACQUISITIONS, "2024-03-07") == "2024-03-06"
+    assert snap_to_acquisition(ACQUISITIONS, "2024-03-14") == "2024-03-16"
+
+def test_snap_to_acquisition_outside_index():
+    assert snap_to_acquisition(ACQUISITIONS, "2023-12-31") == "2024-03-01"
+    assert snap_to_acquisition(ACQUISITIONS, "2025-01-01") == "2024-03-16"
+
+def test_snap_to_acquisition_tie_takes_earlier_date():
+    assert snap_to_acquisition(ACQUISITIONS, "2024-03-11") == "2024-03-06"
+
+def test_snap_to_acquisition_empty_index():
+    assert snap_to_acquisition([], "2024-03-06") is None
+
+def test_filmstrip_dates_sorted_and_deduplicated():
+    assert filmstrip_dates(["2024-03-16", "2024-03-01", "2024-03-16"]) == ["2024-03-01", "2024-03-16"]
+
+def test_filmstrip_dates_capped():
+    dates = [f"2024-01-{day:02d}" for day in range(1, 31)]
+
+    assert filmstrip_dates(dates) == dates[:FILMSTRIP_MAX_FRAMES]
+
+def test_filmstrip_dates_snapped_to_acquisitions():
+    # Both dates snap to the same acquisition, which then appears once
+    assert filmstrip_dates(["2024-03-07", "2024-03-05", "2024-03-15"], ACQUISITIONS) == ["2024-03-06", "2024-03-16"]
+
+def test_filmstrip_dates_rejects_invalid_dates():
+    with pytest.raises(ValueError):
+        filmstrip_dates(["2024-02-30"])
@@ -0,0 +1,102 @@
+import time
+
+import fakeredis
+import pytest
+import redis
+
+from utils import ee_budget
+from utils.ee_budget import (
+    BUCKET_KEY,
+    EE_BURST,
+    EE_MAX_CONCURRENCY,
+    SLOTS_KEY,
+    EEBudgetExhausted,
+    acquire_ee_slot,
+    ee_slot,
+    get_ee_budget_stats,
+    release_ee_slot
+)
+
+@pytest.fixture
+def redis_client(monkeypatch) -> fakeredis.FakeRedis:
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(ee_budget, "get_redis", lambda: client)
+
+    return client
+
+def rewind_bucket(redis_client: fakeredis.FakeRedis, seconds: float) -> None:
+    # Moves the last refill of the token bucket back in time, as if `seconds` had passed
+    redis_client.hset(BUCKET_KEY, "ts", float(redis_client.hget(BUCKET_KEY, "ts")) - seconds)
+
+def test_acquire_and_release(redis_client):
+    token = acquire_ee_slot(timeout=0)
+
+    assert token is not None
+    assert redis_client.zscore(SLOTS_KEY, token) > time.time()
+
+    release_ee_slot(token)
+
+    assert redis_client.zcard(SLOTS_KEY) == 0
+    assert get_ee_budget_stats()["acquired"] == 1
+
+def test_saturated_when_every_slot_is_in_use(redis_client):
+    tokens = [acquire_ee_slot(timeout=0) for _ in range(EE_MAX_CONCURRENCY)]
+    assert None not in tokens
+
+    assert acquire_ee_slot(timeout=0) is None
+
+    stats = get_ee_budget_stats()
+    assert stats["in_flight"] == EE_MAX_CONCURRENCY
+    assert stats["saturated"] == 1 and stats["timeouts"] == 1
+
+    release_ee_slot(tokens[0])
+    rewind_bucket(redis_client, 1)
+    assert acquire_ee_slot(timeout=0) is not None
+
+def test_expired_leases_free_their_slots(redis_client):
+    redis_client.zadd(SLOTS_KEY, {f"crashed-{i}": time.time() - 1 for i in range(EE_MAX_CONCURRENCY)})
+
+    assert acquire_ee_slot(timeout=0) is not None
+    assert redis_client.zcard(SLOTS_KEY) == 1
+
+def test_throttled_until_the_bucket_refills(redis_client):
+    for _ in range(int(EE_BURST)):
+        release_ee_slot(acquire_ee_slot(timeout=0))
+
+    assert acquire_ee_slot(timeout=0) is None
+    assert get_ee_budget_stats()["throttled"] == 1
+
+    rewind_bucket(redis_client, 1 / ee_budget.EE_REQUESTS_PER_SECOND)
+
+    assert acquire_ee_slot(timeout=0) is not None
+
+def test_refill_is_capped_at_the_burst(redis_client):
+    release_ee_slot(acquire_ee_slot(timeout=0))
+    rewind_bucket(redis_client, 3600)
+
+    assert get_ee_budget_stats()["tokens_available"] == EE_BURST
+
+def test_slot_is_held_for_the_block_and_released(redis_client):
+    with ee_slot(timeout=0):
+        assert redis_client.zcard(SLOTS_KEY) == 1
+
+    assert redis_client.zcard(SLOTS_KEY) == 0
+
+def test_slot_raises_when_the_budget_is_exhausted(redis_client):
+    redis_client.zadd(SLOTS_KEY, {f"busy-{i}": time.time() + 60 for i in range(EE_MAX_CONCURRENCY)})
+
+    with pytest.raises(EEBudgetExhausted):
+        with ee_slot(timeout=0):
+            pass
+
+def test_slot_fails_open_without_redis(monkeypatch):
+    def unavailable():
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(ee_budget, "get_redis", unavailable)
+    ran = []
+
+    with ee_slot(timeout=0):
+        ran.append(1)
+
+    assert ran == [1]
@@ -0,0 +1,94 @@
+import json
+import uuid
+
+import fakeredis
+import pytest
+from flask import Flask
+
+from regen_queue.jobs import FAILED, RUNNING, SUCCEEDED, job_channel
+from routes import events
+
+def parse(chunk: str) -> tuple[str, dict]:
+    event, data = chunk.strip().split("\n")
+
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+def next_event(stream) -> tuple[str, dict]:
+    # Skips heartbeats, which also stand in for the ignored subscribe confirmations
+    chunk = next(stream)
+    while chunk.startswith(":"):
+        chunk = next(stream)
+
+    return parse(chunk)
+
+@pytest.fixture
+def jobs(monkeypatch):
+    # Job statuses read by the stream, and the Redis its change notifications go through
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    statuses = {}
+    monkeypatch.setattr(events, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(events, "get_job_status", statuses.get)
+
+    return redis_client, statuses
+
+def test_streams_changes_until_every_job_finished(jobs):
+    redis_client, statuses = jobs
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    statuses.update({first: {"status": RUNNING, "progress": 10}, second: {"status": RUNNING, "progress": 0}})
+
+    stream = events._stream_jobs([first, second])
+    assert next_event(stream) == ("job", {"job_id": first, "status": RUNNING, "progress": 10})
+    assert next_event(stream)[1]["job_id"] == second
+
+    statuses[first] = {"status": SUCCEEDED, "progress": 100}
+    redis_client.publish(job_channel(first), "{}")
+    assert next_event(stream) == ("job", {"job_id": first, "status": SUCCEEDED, "progress": 100})
+
+    statuses[second] = {"status": FAILED, "progress": 0}
+    redis_client.publish(job_channel(second), "{}")
+    assert next_event(stream)[1]["status"] == FAILED
+    assert next_event(stream) == ("done", {"job_ids": [first, second]})
+
+    with pytest.raises(StopIteration):
+        next(stream)
+
+def test_finished_and_missing_jobs_end_the_stream_at_once(jobs):
+    _, statuses = jobs
+    finished, missing = str(uuid.uuid4()), str(uuid.uuid4())
+    statuses[finished] = {"status": SUCCEEDED, "progress": 100}
+
+    chunks = list(events._stream_jobs([finished, missing]))
+
+    assert [parse(chunk)[0] for chunk in chunks] == ["job", "job", "done"]
+    assert parse(chunks[1])[1] == {"job_id": missing, "status": "missing"}
+
+def test_idle_stream_sends_heartbeats(jobs, monkeypatch):
+    _, statuses = jobs
+    job_id = str(uuid.uuid4())
+    statuses[job_id] = {"status": RUNNING, "progress": 0}
+    monkeypatch.setattr(events, "HEARTBEAT_INTERVAL", 0.01)
+
+    stream = events._stream_jobs([job_id])
+    next(stream)
+
+    assert next(stream) == ": heartbeat\n\n"
+
+@pytest.mark.parametrize("ids", ["", "not-a-job-id", ",".join(str(uuid.uuid4()) for _ in range(events.MAX_JOBS_PER_STREAM + 1))])
+def test_route_rejects_invalid_job_ids(ids):
+    app = Flask(__name__)
+    app.register_blueprint(events.events_bp)
+
+    assert app.test_client().get("/events/jobs", query_string={"ids": ids}).status_code == 400
+
+def test_route_streams_events(jobs):
+    _, statuses = jobs
+    job_id = str(uuid.uuid4())
+    statuses[job_id] = {"status": SUCCEEDED, "progress": 100}
+    app = Flask(__name__)
+    app.register_blueprint(events.events_bp)
+
+    response = app.test_client().get("/events/jobs", query_string={"ids": job_id})
+
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.get_data(as_text=True).count("event: ") == 2
@@ -0,0 +1,58 @@
+import pytest
+import shapely
+from pyproj import Transformer
+from shapely.ops import transform
+
+from utils.geometry import (
+    EQUAL_AREA_CRS,
+    WGS84,
+    areas_acres,
+    canonical_wkt,
+    centroids_lat_lon,
+    valid_polygon_mask,
+    wkt_to_geometries
+)
+
+SQUARE = "POLYGON((36 -1, 36.01 -1, 36.01 -0.99, 36 -0.99, 36 -1))"
+TRIANGLE = "POLYGON((35 0, 35.02 0, 35 0.02, 35 0))"
+
+def test_centroids_match_the_per_polygon_computation():
+    geometries = wkt_to_geometries([SQUARE, TRIANGLE])
+
+    lats, lons = centroids_lat_lon(geometries)
+
+    to_equal_area = Transformer.from_crs(WGS84, EQUAL_AREA_CRS, always_xy=True)
+    for geometry, lat, lon in zip(geometries, lats, lons):
+        centroid = transform(to_equal_area.transform, geometry).centroid
+        lon_expected, lat_expected = to_equal_area.transform(centroid.x, centroid.y, direction="INVERSE")
+        assert (lat, lon) == pytest.approx((lat_expected, lon_expected), abs=1e-9)
+
+    assert (lats[0], lons[0]) == pytest.approx((-0.995, 36.005), abs=1e-6)
+
+def test_area_in_acres():
+    # 0.01 degree square at the equator, about 1.11 km on a side
+    assert areas_acres(wkt_to_geometries([SQUARE]))[0] == pytest.approx(305, rel=0.01)
+
+def test_valid_polygon_mask():
+    geometries = wkt_to_geometries(
+        [
+            SQUARE,
+            "MULTIPOLYGON(((36 -1, 36.01 -1, 36.01 -0.99, 36 -1)))",
+            "POLYGON((0 0, 1 1, 1 0, 0 1, 0 0))", # self-intersecting
+            "POLYGON EMPTY",
+            "not a polygon",
+        ],
+        on_invalid="ignore"
+    )
+
+    assert valid_polygon_mask(geometries).tolist() == [True, False, False, False, False]
+
+def test_invalid_wkt_raises_by_default():
+    with pytest.raises(shapely.errors.GEOSException):
+        wkt_to_geometries(["not a polygon"])
+
+def test_canonical_wkt_is_independent_of_vertex_order():
+    reversed_square = "POLYGON((36 -1, 36 -0.99, 36.01 -0.99, 36.01 -1, 36 -1))"
+
+    assert canonical_wkt(SQUARE) == canonical_wkt(reversed_square)
+    assert canonical_wkt(SQUARE) != canonical_wkt(TRIANGLE)
@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from isda_stub_server import StubConfig, create_app
+from services.isda_soil_data import TOKEN_REFRESH_MARGIN, TOKEN_TTL, IsdaClient, _token_lifetime
+
+NAIROBI = (-1.2921, 36.8219)
+
+def jwt(claims: dict[str, Any]) -> str:
+    def encode(obj: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode(claims)}.signature"
+
+def test_token_lifetime_from_the_exp_claim():
+    assert _token_lifetime(jwt({"exp": time.time() + 600}), expires_in=60) == pytest.approx(600, abs=2)
+
+def test_token_lifetime_of_an_expired_token():
+    assert _token_lifetime(jwt({"exp": time.time() - 600})) == 0.0
+
+def test_token_lifetime_falls_back_to_expires_in_then_default():
+    assert _token_lifetime("opaque-token", expires_in="120") == 120.0
+    assert _token_lifetime(jwt({"sub": "user"}), expires_in=None) == TOKEN_TTL
+    assert _token_lifetime("opaque-token", expires_in="soon") == TOKEN_TTL
+
+def run_against_stub(config: StubConfig, scenario: Callable[[IsdaClient], Awaitable[None]]) -> dict[str, int]:
+    # Runs `scenario` with a client of the local iSDA stand-in and returns the stand-in's counters
+    async def run() -> dict[str, int]:
+        async with TestServer(create_app(config)) as server:
+            client = IsdaClient("user", "secret", base_url=str(server.make_url("")), max_concurrency=4, hedge_after=None)
+            try:
+                await scenario(client)
+            finally:
+                await client.close()
+
+            stats_client = IsdaClient(base_url=str(server.make_url("")))
+            try:
+                session = await stats_client._ensure_session()
+                async with session.get(server.make_url("/_stats")) as response:
+                    return await response.json()
+            finally:
+                await stats_client.close()
+
+    return asyncio.run(run())
+
+FAST = StubConfig(latency=0.01, jitter=0.0)
+
+def test_concurrent_requests_share_one_login_and_the_pool():
+    async def scenario(client: IsdaClient) -> None:
+        responses = await asyncio.gather(*(client.get_soil_property(*NAIROBI, "ph") for _ in range(12)))
+        assert all(response["property"]["ph"] for response in responses)
+
+    stats = run_against_stub(FAST, scenario)
+
+    assert stats["logins"] == 1 and stats["requests"] == 12
+    assert stats["connections"] <= 4 + 1 # the concurrency limit, plus the login connection
+
+def test_token_close_to_expiry_is_renewed():
+    async def scenario(client: IsdaClient) -> None:
+        await client.get_soil_property(*NAIROBI, "ph")
+        await client.get_soil_property(*NAIROBI, "ph")
+
+    # Tokens expiring within the refresh margin are never reused
+    stats = run_against_stub(StubConfig(latency=0.01, jitter=0.0, token_ttl=TOKEN_REFRESH_MARGIN // 2), scenario)
+
+    assert stats["logins"] == 2
+
+def test_revoked_token_triggers_one_new_login():
+    async def scenario(client: IsdaClient) -> None:
+        await client.get_soil_property(*NAIROBI, "ph")
+        client._token = jwt({"exp": time.time() + 3600}) # valid locally, unknown to the server
+        await client.get_soil_property(*NAIROBI, "ph")
+
+    stats = run_against_stub(FAST, scenario)
+
+    assert stats["unauthorized"] == 1 and stats["logins"] == 2 and stats["requests"] == 3
+
+def test_token_survives_a_new_event_loop():
+    # Celery tasks drive the long-lived client from successive event loops
+    async def scenario(client: IsdaClient) -> None:
+        for _ in range(2):
+            await asyncio.to_thread(asyncio.run, client.get_soil_property(*NAIROBI, "ph"))
+        await asyncio.to_thread(asyncio.run, client.close())
+
+    stats = run_against_stub(FAST, scenario)
+
+    assert stats["logins"] == 1 and stats["requests"] == 2
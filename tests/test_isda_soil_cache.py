@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.isda_soil_cache import CELL_SIZE, SoilCellCache, cell_centre, snap_to_cell, snap_to_cells
+from services.isda_soil_data import SOIL_DEPTH, SOIL_PROPERTIES, fetch_cell_properties
+
+NAIROBI = (-1.2921, 36.8219)
+
+def test_snap_to_cell_around_origin():
+    assert snap_to_cell(1e-6, 1e-6) == (0, 0)
+    assert snap_to_cell(-1e-6, -1e-6) == (-1, -1)
+
+def test_snap_to_cell_groups_points_of_one_cell():
+    # ~1 m apart, well inside a 30 m cell
+    lat, lon = cell_centre(snap_to_cell(*NAIROBI))
+
+    assert snap_to_cell(lat + 5e-6, lon + 5e-6) == snap_to_cell(lat, lon)
+
+def test_snap_to_cell_separates_neighbouring_cells():
+    col, row = snap_to_cell(*NAIROBI)
+    lat, lon = cell_centre((col, row))
+    step = np.degrees(CELL_SIZE / 6378137.0) # one cell width in longitude
+
+    assert snap_to_cell(lat, lon + step) == (col + 1, row)
+
+def test_cell_centre_round_trips():
+    cell = snap_to_cell(*NAIROBI)
+
+    assert snap_to_cell(*cell_centre(cell)) == cell
+
+def test_snap_to_cells_matches_scalar_version():
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-35, 37, 200)
+    lons = rng.uniform(-18, 52, 200)
+
+    assert snap_to_cells(lats, lons) == [snap_to_cell(lat, lon) for lat, lon in zip(lats, lons)]
+
+class FakeIsdaClient:
+    def __init__(self, failing: set[str] = frozenset()):
+        self.failing = failing
+        self.requests = 0
+
+    async def get_soil_property(self, lat: float, lon: float, prop: str, depth: str = SOIL_DEPTH) -> dict:
+        self.requests += 1
+        if prop in self.failing:
+            raise ConnectionError(f"{prop} unavailable")
+
+        return {"property": {prop: [{"value": {"value": 1.0}}]}}
+
+def test_fetch_cell_properties_serves_cached_cells(tmp_path):
+    cache = SoilCellCache(tmp_path / "soil.sqlite3")
+    cell = snap_to_cell(*NAIROBI)
+
+    first = FakeIsdaClient()
+    asyncio.run(fetch_cell_properties(first, [cell], cache))
+    second = FakeIsdaClient()
+    values = asyncio.run(fetch_cell_properties(second, [cell], cache))
+
+    assert first.requests == len(SOIL_PROPERTIES)
+    assert second.requests == 0
+    assert values[cell]["ph"] == 1.0
+
+def test_fetch_cell_properties_partial_failures(tmp_path):
+    cache = SoilCellCache(tmp_path / "soil.sqlite3")
+    cell = snap_to_cell(*NAIROBI)
+    client = FakeIsdaClient(failing={"ph"})
+
+    values = asyncio.run(fetch_cell_properties(client, [cell], cache, partial=True))
+
+    assert values[cell]["ph"] is None
+    assert values[cell]["clay_content"] == 1.0
+    # Successful values are cached, the failed one is not
+    assert set(cache.get_many([cell], SOIL_PROPERTIES, SOIL_DEPTH)) == {
+        (prop, cell) for prop in SOIL_PROPERTIES if prop != "ph"
+    }
+
+def test_fetch_cell_properties_raises_failures_by_default(tmp_path):
+    client = FakeIsdaClient(failing={"ph"})
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(fetch_cell_properties(client, [snap_to_cell(*NAIROBI)], SoilCellCache(tmp_path / "soil.sqlite3")))
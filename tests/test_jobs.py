@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+import redis
+
+from regen_queue import jobs
+from regen_queue.jobs import (
+    FAILED,
+    PROGRESS_PERSIST_STEP,
+    RUNNING,
+    SUCCEEDED,
+    add_job_items_done,
+    get_job_status,
+    mark_job_finished,
+    mark_job_started,
+    update_job_progress
+)
+
+class JobsTable:
+    # Records the updates written to the jobs table through the Supabase client chain, and serves `rows` to selects
+    def __init__(self):
+        self.updates = []
+        self.rows = []
+
+    def table(self, name):
+        return self
+
+    def update(self, fields):
+        self.updates.append(fields)
+        return self
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def limit(self, count):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+@pytest.fixture
+def backend(monkeypatch):
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    table = JobsTable()
+    monkeypatch.setattr(jobs, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(jobs, "get_service_supabase_client", lambda: table)
+
+    return redis_client, table
+
+def test_chunks_are_counted_once(backend):
+    redis_client, _ = backend
+
+    add_job_items_done("job", 0, 2, total=4)
+    add_job_items_done("job", 0, 2, total=4) # redelivered to another worker
+    add_job_items_done("job", 1, 1, total=4)
+
+    assert redis_client.get("job-items:job") == "3"
+    assert redis_client.smembers("job:job:chunks") == {"0", "1"}
+    assert redis_client.hget("job:job", "progress") == "75"
+    assert 0 < redis_client.ttl("job:job:chunks") <= jobs.JOB_MIRROR_TTL
+
+def test_progress_stays_below_100_until_the_job_finishes(backend):
+    redis_client, _ = backend
+
+    add_job_items_done("job", 0, 4, total=4)
+    assert redis_client.hget("job:job", "progress") == "99"
+
+    mark_job_finished("job")
+    assert redis_client.hget("job:job", "progress") == "100"
+
+def test_untracked_work_is_not_counted(backend):
+    redis_client, _ = backend
+
+    add_job_items_done(None, 0, 2, total=4)
+
+    assert redis_client.keys("*") == []
+
+def test_table_is_written_in_steps_shared_by_the_workers(backend):
+    redis_client, table = backend
+
+    for progress in (5, PROGRESS_PERSIST_STEP + 2, PROGRESS_PERSIST_STEP + 5, 2 * PROGRESS_PERSIST_STEP + 2):
+        update_job_progress("job", progress)
+
+    assert table.updates == [{"progress": PROGRESS_PERSIST_STEP + 2}, {"progress": 2 * PROGRESS_PERSIST_STEP + 2}]
+    assert redis_client.hget("job:job", "progress") == str(2 * PROGRESS_PERSIST_STEP + 2)
+
+    mark_job_finished("job")
+    assert redis_client.get("job-persisted:job") is None
+
+def test_progress_goes_to_the_table_without_redis(backend, monkeypatch):
+    _, table = backend
+
+    def unavailable():
+        raise redis.ConnectionError("down")
+
+    monkeypatch.setattr(jobs, "get_redis", unavailable)
+
+    update_job_progress("job", 1)
+
+    assert table.updates == [{"progress": 1}]
+
+def test_only_the_first_stage_records_the_start(backend):
+    redis_client, table = backend
+
+    mark_job_started("job")
+    mark_job_started("job") # a later stage of the same graph
+
+    assert len(table.updates) == 1
+    assert table.updates[0]["status"] == RUNNING and table.updates[0]["started_at"]
+    assert redis_client.hget("job:job", "status") == RUNNING
+
+def test_status_is_read_from_the_mirror(backend):
+    redis_client, table = backend
+    redis_client.hset("job:job", mapping={"status": RUNNING, "progress": "40", "error": ""})
+
+    assert get_job_status("job") == {"status": RUNNING, "progress": 40, "error": None}
+
+def test_status_falls_back_to_the_table_and_repopulates_the_mirror(backend):
+    redis_client, table = backend
+    table.rows = [{"job_id": "job", "status": SUCCEEDED, "progress": 100, "error": None}]
+
+    assert get_job_status("job")["status"] == SUCCEEDED
+    assert redis_client.hget("job:job", "status") == SUCCEEDED
+
+    table.rows = []
+    assert get_job_status("unknown") is None
+
+@pytest.mark.parametrize(
+    ("state", "retval", "status"),
+    [("SUCCESS", [], SUCCEEDED), ("FAILURE", ValueError("no observations"), FAILED), ("RETRY", None, None)]
+)
+def test_postrun_records_the_final_status(backend, state, retval, status):
+    redis_client, _ = backend
+
+    jobs._on_task_postrun(kwargs={"job_id": "job"}, retval=retval, state=state)
+
+    assert redis_client.hget("job:job", "status") == status
+    if status == FAILED:
+        assert redis_client.hget("job:job", "error") == "no observations"
+
+def test_stages_mark_the_parent_job_started_but_do_not_finish_it(backend):
+    redis_client, _ = backend
+
+    jobs._on_task_prerun(kwargs={"parent_job_id": "job"})
+    jobs._on_task_postrun(kwargs={"parent_job_id": "job"}, retval="ref", state="SUCCESS")
+
+    assert redis_client.hget("job:job", "status") == RUNNING
@@ -0,0 +1,106 @@
+from unittest import mock
+
+import fakeredis
+import pytest
+import redis
+from flask import Flask
+
+from services import region_cache
+from services.region_cache import bump_table_versions, cached_region_result, init_region_cache, region_cache_context
+
+class Counter:
+    # Zero-argument compute function counting its calls
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self) -> int:
+        self.calls += 1
+        return self.calls
+
+@pytest.fixture
+def app(monkeypatch):
+    # A web app with an in-process value cache and table versions in (fake) Redis
+    monkeypatch.delenv("CACHE_REDIS_URL", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setattr(region_cache, "get_redis", lambda: versions)
+    monkeypatch.setattr(region_cache, "_standalone_app", None)
+    versions = fakeredis.FakeRedis(decode_responses=True)
+
+    app = Flask(__name__)
+    init_region_cache(app)
+
+    with app.app_context():
+        yield app
+
+def test_results_are_cached(app):
+    compute = Counter()
+
+    assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 1
+    assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 1
+    assert compute.calls == 1
+
+def test_entries_are_keyed_by_region_and_indicator(app):
+    compute = Counter()
+
+    cached_region_result("map", ["farmpolygons"], "Kajiado", compute, indicator="ndvi")
+    cached_region_result("map", ["farmpolygons"], "Kajiado", compute, indicator="ndmi")
+    cached_region_result("map", ["farmpolygons"], "Machakos", compute, indicator="ndvi")
+
+    assert compute.calls == 3
+
+def test_bump_invalidates_only_readers_of_the_tables(app):
+    moisture, soil = Counter(), Counter()
+    cached_region_result("moisture", ["moisturecontent", "farmpolygons"], "Kajiado", moisture)
+    cached_region_result("soil", ["soildata"], "Kajiado", soil)
+
+    bump_table_versions("farmpolygons")
+
+    assert cached_region_result("moisture", ["moisturecontent", "farmpolygons"], "Kajiado", moisture) == 2
+    assert cached_region_result("soil", ["soildata"], "Kajiado", soil) == 1
+
+def test_bump_from_a_worker_invalidates_the_web_cache(app):
+    compute = Counter()
+    cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute)
+
+    # Workers use a standalone app with their own value cache; versions are shared through Redis
+    standalone = Flask("worker")
+    init_region_cache(standalone)
+    with standalone.app_context():
+        bump_table_versions("moisturecontent")
+
+    assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 2
+
+def test_local_versions_without_redis(app, monkeypatch):
+    def not_configured():
+        raise RuntimeError("Missing REDIS_URL")
+
+    monkeypatch.setattr(region_cache, "get_redis", not_configured)
+    monkeypatch.setattr(region_cache, "_local_versions", {})
+    compute = Counter()
+
+    cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute)
+    bump_table_versions("moisturecontent")
+
+    assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 2
+
+def test_failures_never_break_inserts_or_reads(app):
+    broken = mock.Mock()
+    broken.pipeline.side_effect = redis.ConnectionError("down")
+    broken.mget.side_effect = redis.ConnectionError("down")
+    compute = Counter()
+
+    with mock.patch.object(region_cache, "get_redis", return_value=broken):
+        bump_table_versions("moisturecontent")
+        assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 1
+        assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", compute) == 2
+
+def test_region_cache_context_outside_an_app(monkeypatch):
+    monkeypatch.delenv("CACHE_REDIS_URL", raising=False)
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setattr(region_cache, "get_redis", lambda: fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(region_cache, "_standalone_app", None)
+    assert not region_cache.has_app_context()
+
+    with region_cache_context():
+        assert region_cache.has_app_context()
+        assert cached_region_result("moisture", ["moisturecontent"], "Kajiado", lambda: "value") == "value"
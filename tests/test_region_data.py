@@ -0,0 +1,65 @@
+import pytest
+
+from services.region_data import REGION_SUMMARY_TABLES, load_region_tables, region_tables_query
+
+def test_query_has_one_subquery_per_table():
+    query = region_tables_query({"highndmidays": ["year", "high_ndmi_days"], "moisturecontent": ["counts"]})
+    subqueries = query.split("\nUNION ALL\n")
+
+    assert len(subqueries) == 2
+    assert subqueries[0].startswith("SELECT 'highndmidays' AS source")
+    assert "SELECT year, high_ndmi_days FROM highndmidays WHERE region = :region" in subqueries[0]
+    assert "SELECT counts FROM moisturecontent WHERE region = :region" in subqueries[1]
+
+def test_query_aggregates_rows_as_json_with_empty_default():
+    query = region_tables_query({"highndmidays": ["year"]})
+
+    assert "COALESCE(json_agg(t), '[]'::json)" in query
+    assert query.endswith("AS data")
+
+def test_query_of_the_summary_tables():
+    query = region_tables_query(REGION_SUMMARY_TABLES)
+
+    assert query.count("UNION ALL") == len(REGION_SUMMARY_TABLES) - 1
+    assert query.count(":region") == len(REGION_SUMMARY_TABLES)
+
+@pytest.mark.parametrize(
+    "tables",
+    [
+        {"highndmidays; DROP TABLE farmpolygons": ["year"]},
+        {"highndmidays": ["year) t; --"]},
+        {"HighNdmiDays": ["year"]},
+        {"highndmidays": ["1year"]},
+    ]
+)
+def test_query_rejects_unsafe_identifiers(tables):
+    with pytest.raises(ValueError, match="Invalid SQL identifier"):
+        region_tables_query(tables)
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    def execute(self, query, params):
+        self.params = params
+        return FakeResult(self.rows)
+
+def test_load_region_tables_returns_a_frame_per_table():
+    tables = {"highndmidays": ["year", "high_ndmi_days"], "moisturecontent": ["moisture_content", "counts"]}
+    conn = FakeConnection([("highndmidays", [{"year": 2024, "high_ndmi_days": 12}]), ("moisturecontent", [])])
+
+    frames = load_region_tables(conn, "Kiambu", tables)
+
+    assert conn.params == {"region": "Kiambu"}
+    assert frames["highndmidays"].to_dict("records") == [{"year": 2024, "high_ndmi_days": 12}]
+    # Empty tables keep their columns
+    assert frames["moisturecontent"].empty
+    assert list(frames["moisturecontent"].columns) == ["moisture_content", "counts"]
@@ -0,0 +1,217 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.error import HTTPError, URLError
+
+import pytest
+
+from services import earth_engine_images
+from services.earth_engine_timeseries import is_transient_ee_error
+from utils import resilience
+from utils.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    EndpointPolicy,
+    call_external,
+    register_endpoint
+)
+
+RESET_TIMEOUT = 0.05 # seconds
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker("test", failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_success_resets_the_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+def test_half_open_admits_a_single_trial(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT)
+
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+@pytest.mark.parametrize(("trial_succeeds", "state"), [(True, CLOSED), (False, OPEN)])
+def test_half_open_trial_closes_or_reopens(breaker, trial_succeeds, state):
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT)
+    breaker.before_call()
+
+    if trial_succeeds:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+    assert breaker.state == state
+
+def test_released_trial_leaves_the_breaker_half_open(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT)
+    breaker.before_call()
+
+    breaker.release_trial()
+
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+def test_listeners_run_outside_the_lock(breaker, monkeypatch):
+    # A listener reading the breaker would deadlock if it ran under the breaker lock
+    events = []
+    monkeypatch.setattr(resilience, "_listeners", [lambda change: events.append((change["state"], breaker.snapshot()["state"]))])
+
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert events == [(OPEN, OPEN)]
+
+def _endpoint(name: str, **policy) -> str:
+    register_endpoint(name, EndpointPolicy(**{"timeout": 1.0, "retries": 0, "backoff_base": 0.0, **policy}))
+    return name
+
+def test_call_external_does_not_count_non_failures_as_failures():
+    name = _endpoint("test.non_failure", failure_threshold=1)
+
+    with pytest.raises(KeyError):
+        call_external(name, lambda: {}["missing"], is_failure=lambda e: False)
+
+    assert resilience.get_breaker(name).state == CLOSED
+
+def test_call_external_opens_on_failures():
+    name = _endpoint("test.failure", failure_threshold=1)
+
+    def fail():
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        call_external(name, fail)
+    with pytest.raises(CircuitOpenError):
+        call_external(name, lambda: "ok")
+
+def test_lease_wait_is_outside_the_attempt_timeout():
+    name = _endpoint("test.lease_wait", timeout=0.1)
+
+    @contextmanager
+    def slow_lease():
+        time.sleep(0.2)
+        yield
+
+    assert call_external(name, lambda: "ok", lease=slow_lease) == "ok"
+
+def test_refused_lease_releases_the_trial_without_a_failure():
+    name = _endpoint("test.lease_refused", failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    breaker = resilience.get_breaker(name)
+    breaker.record_failure()
+    time.sleep(RESET_TIMEOUT)
+
+    @contextmanager
+    def refused():
+        raise RuntimeError("no budget")
+        yield
+
+    with pytest.raises(RuntimeError):
+        call_external(name, lambda: "ok", lease=refused)
+
+    assert breaker.state == HALF_OPEN
+    assert call_external(name, lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+def test_timed_out_calls_keep_their_lease_and_are_bounded():
+    name = _endpoint("test.abandoned", timeout=0.05, failure_threshold=100, max_abandoned=1)
+    breaker = resilience.get_breaker(name)
+    release = threading.Event()
+    leases = []
+
+    @contextmanager
+    def lease():
+        leases.append(1)
+        yield
+        leases.pop()
+
+    with pytest.raises(TimeoutError):
+        call_external(name, release.wait, lease=lease)
+    assert breaker.abandoned == 1 and leases == [1]
+
+    # The abandoned call is still running, so the next attempt fails without taking a lease
+    with pytest.raises(TimeoutError, match="still running"):
+        call_external(name, lambda: "ok", lease=lease)
+    assert leases == [1]
+
+    release.set()
+    deadline = time.monotonic() + 1
+    while breaker.abandoned and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert breaker.abandoned == 0 and leases == []
+
+def _http_error(code: int) -> HTTPError:
+    return HTTPError("https://earthengine.googleapis.com/thumbnails", code, "error", {}, None)
+
+@pytest.mark.parametrize(
+    "error, transient",
+    [
+        (_http_error(400), False),
+        (_http_error(404), False),
+        (_http_error(429), True),
+        (_http_error(503), True),
+        (URLError("connection refused"), True),
+        (TimeoutError(), True),
+        (ValueError("bad geometry"), False),
+    ]
+)
+def test_transient_ee_errors(error, transient):
+    assert is_transient_ee_error(error) is transient
+
+def test_client_errors_are_not_retried_and_do_not_open_the_breaker():
+    name = _endpoint("test.client_error", retries=2, failure_threshold=1)
+    calls = []
+
+    def not_found():
+        calls.append(1)
+        raise _http_error(404)
+
+    with pytest.raises(HTTPError):
+        call_external(name, not_found, is_failure=is_transient_ee_error)
+
+    assert calls == [1]
+    assert resilience.get_breaker(name).state == CLOSED
+
+class _Image:
+    def getThumbURL(self, params):
+        return "https://earthengine.googleapis.com/thumbnails/expired"
+
+def test_thumbnail_download_client_error_renders_nothing(monkeypatch):
+    def urlopen(url, timeout):
+        raise _http_error(404)
+
+    monkeypatch.setattr(earth_engine_images, "initialize_ee", lambda: None)
+    monkeypatch.setattr(earth_engine_images, "convert_wkt_to_ee_geometry", lambda wkt: wkt)
+    monkeypatch.setattr(earth_engine_images, "get_rgb_image", lambda geometry, date: _Image())
+    monkeypatch.setattr(earth_engine_images, "ee_slot", nullcontext)
+    monkeypatch.setattr(earth_engine_images, "urlopen", urlopen)
+
+    wkt = "POLYGON((36 -1, 36.01 -1, 36.01 -0.99, 36 -0.99, 36 -1))"
+
+    assert earth_engine_images.render_rgb_thumbnail(wkt, "2024-03-06") is None
@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from services.result_store import cleanup_results, delete_result, read_result, write_result
+
+@pytest.fixture
+def store(tmp_path, monkeypatch) -> Path:
+    monkeypatch.setenv("RESULT_STORE_URI", tmp_path.as_uri())
+
+    return tmp_path
+
+def series() -> pd.DataFrame:
+    return pd.DataFrame({
+        "uuid": ["a", "a", "b"],
+        "date": pd.to_datetime(["2024-03-01", "2024-03-06", "2024-03-01"]),
+        "ndvi": [0.31, 0.42, None],
+    })
+
+def test_round_trip(store):
+    ref = write_result(series(), "vi")
+
+    assert ref.startswith(f"{store.as_uri()}/vi-") and ref.endswith(".parquet")
+    pd.testing.assert_frame_equal(read_result(ref), series())
+    pd.testing.assert_frame_equal(read_result(ref, cached=False), series())
+
+def test_results_get_their_own_files(store):
+    first, second = write_result(series(), "vi"), write_result(series().head(1), "vi")
+
+    assert first != second
+    assert len(read_result(second, cached=False)) == 1
+
+def test_delete_result(store):
+    ref = write_result(series(), "raw-chunk")
+
+    delete_result(ref)
+    delete_result(ref) # already gone
+
+    assert list(store.iterdir()) == []
+
+def test_cleanup_deletes_only_expired_results(store):
+    expired, fresh = write_result(series(), "vi"), write_result(series(), "vi")
+    (store / "notes.txt").write_text("not a result")
+    os.utime(store / expired.rsplit("/", 1)[1], (0, 0))
+
+    assert cleanup_results(ttl_seconds=3600) == 1
+    assert sorted(path.name for path in store.iterdir()) == sorted([fresh.rsplit("/", 1)[1], "notes.txt"])
+
+def test_cleanup_of_a_missing_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESULT_STORE_URI", (tmp_path / "missing").as_uri())
+
+    assert cleanup_results(ttl_seconds=0) == 0
@@ -0,0 +1,52 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from kombu import compression, serialization
+
+from regen_queue.serialization import SERIALIZER, dumps, loads
+
+def test_round_trip_plain_values():
+    payload = {"job_id": "abc", "total": 3, "ratio": 0.5, "flags": [True, None], "nested": {"1": b"raw"}}
+
+    assert loads(dumps(payload)) == payload
+
+def test_round_trip_dates():
+    timestamp = pd.Timestamp("2024-03-01T10:30:00")
+    payload = {"created_at": timestamp, "day": date(2024, 3, 1)}
+
+    result = loads(dumps(payload))
+
+    assert result["created_at"] == timestamp
+    assert result["day"] == date(2024, 3, 1)
+
+def test_round_trip_ndarray_keeps_dtype_and_shape():
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    result = loads(dumps({"values": array}))["values"]
+
+    assert result.dtype == np.float32
+    assert result.shape == (3, 4)
+    np.testing.assert_array_equal(result, array)
+    assert result.flags.writeable
+
+def test_numpy_scalars_and_object_arrays_become_python_values():
+    payload = {"count": np.int64(7), "mean": np.float64(0.25), "labels": np.array(["a", None], dtype=object)}
+
+    assert loads(dumps(payload)) == {"count": 7, "mean": 0.25, "labels": ["a", None]}
+
+def test_loads_accepts_latin1_strings():
+    # kombu may hand the body over as a latin-1 decoded string
+    data = dumps({"values": np.array([1, 2], dtype=np.int16)})
+
+    np.testing.assert_array_equal(loads(data.decode("latin-1"))["values"], [1, 2])
+
+def test_round_trip_through_kombu_with_compression():
+    body = {"args": [[{"uuid": "a", "ndvi": np.array([0.1, 0.2])}]], "kwargs": {"job_id": "abc"}}
+
+    content_type, encoding, data = serialization.dumps(body, serializer=SERIALIZER)
+    compressed, compression_type = compression.compress(data, "zstd")
+    result = serialization.loads(compression.decompress(compressed, compression_type), content_type, encoding)
+
+    np.testing.assert_array_equal(result["args"][0][0]["ndvi"], [0.1, 0.2])
+    assert result["kwargs"] == {"job_id": "abc"}
@@ -0,0 +1,64 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from aiohttp.test_utils import TestServer
+
+from isda_stub_server import StubConfig, create_app
+from regen_queue import tasks
+from services.isda_soil_data import SOIL_PROPERTIES, IsdaClient, main
+
+NAIROBI = "POLYGON((36.82 -1.292, 36.8202 -1.292, 36.8202 -1.2918, 36.82 -1.2918, 36.82 -1.292))"
+NAKURU = "POLYGON((36.07 -0.30, 36.0702 -0.30, 36.0702 -0.2998, 36.07 -0.2998, 36.07 -0.30))"
+
+def fetch_from_stub(df: pd.DataFrame, progress: list) -> tuple[list[dict], dict[str, int]]:
+    # Runs `main` against the local iSDA stand-in and returns the records and the stand-in's counters
+    async def run() -> tuple[list[dict], dict[str, int]]:
+        async with TestServer(create_app(StubConfig(latency=0.0, jitter=0.0))) as server:
+            client = IsdaClient("user", "secret", base_url=str(server.make_url("")), max_concurrency=4, hedge_after=None)
+            try:
+                records = await main(
+                    df,
+                    client=client,
+                    use_cache=False,
+                    progress_callback=lambda completed, total: progress.append((completed, total)),
+                    sampling="centroid"
+                )
+                session = await client._ensure_session()
+                async with session.get(server.make_url("/_stats")) as response:
+                    return records, await response.json()
+            finally:
+                await client.close()
+
+    return asyncio.run(run())
+
+def test_soil_records_per_polygon_with_cells_fetched_once():
+    df = pd.DataFrame({"uuid": ["a", "b", "c"], "geometry": [NAIROBI, NAIROBI, NAKURU]})
+    progress = []
+
+    records, stats = fetch_from_stub(df, progress)
+
+    assert [record["uuid"] for record in records] == ["a", "b", "c"]
+    assert {"bulk_density (g/cm^3)", "clay_content (%)", "ph", "texture_class"} <= records[0].keys()
+    assert records[0] == {**records[1], "uuid": "a"} # same raster cell, same values
+
+    # Polygons in the same cell share their requests
+    assert stats["requests"] == 2 * len(SOIL_PROPERTIES)
+    assert progress[-1] == (2 * len(SOIL_PROPERTIES), 2 * len(SOIL_PROPERTIES))
+
+def test_soil_task_reports_each_percentage_once(monkeypatch):
+    percents = []
+
+    def fetch_soil_records(df, progress_callback):
+        for completed in range(1, 301):
+            progress_callback(completed, 300)
+        return df.to_dict("records")
+
+    monkeypatch.setattr(tasks, "fetch_soil_records", fetch_soil_records)
+    monkeypatch.setattr(tasks, "update_job_progress", lambda job_id, percent: percents.append((job_id, percent)))
+
+    records = tasks.fetch_soil_data.run([{"uuid": "a", "geometry": NAIROBI}], job_id="job")
+
+    assert records == [{"uuid": "a", "geometry": NAIROBI}]
+    assert [percent for _, percent in percents] == list(range(0, 101))
+    assert {job_id for job_id, _ in percents} == {"job"}
@@ -0,0 +1,67 @@
+import os
+import struct
+
+from flask import Flask
+
+from services.thumbnail_cache import ThumbnailCache
+
+def png(width: int, height: int, size: int = 100) -> bytes:
+    # Signature and IHDR header of a PNG, padded to `size` bytes
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height)
+
+    return header.ljust(size, b"\0")
+
+def test_round_trip_through_a_store_uri(tmp_path):
+    writer = ThumbnailCache((tmp_path / "store").as_uri())
+    reader = ThumbnailCache((tmp_path / "store").as_uri())
+
+    writer.put("a" * 64, png(64, 192))
+
+    # Another process pointing at the same URI sees the render
+    assert reader.contains("a" * 64)
+    assert reader.get("a" * 64) == png(64, 192)
+    assert reader.image_size("a" * 64) == (64, 192)
+    assert not list((tmp_path / "store").glob("*.tmp"))
+
+def test_missing_key(tmp_path):
+    cache = ThumbnailCache(tmp_path.as_uri())
+
+    assert not cache.contains("b" * 64)
+    assert cache.get("b" * 64) is None
+    assert cache.image_size("b" * 64) is None
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(tmp_path.as_uri(), max_bytes=250)
+
+    cache.put("old", png(1, 1))
+    cache.put("used", png(1, 1))
+    os.utime(tmp_path / "used.png", (1, 1))
+    os.utime(tmp_path / "old.png", (2, 2))
+    # Reading refreshes the older file, which then outlives the untouched one
+    cache.get("used")
+    cache.put("new", png(1, 1))
+
+    assert not cache.contains("old")
+    assert cache.contains("used")
+    assert cache.contains("new")
+
+def test_route_serves_from_the_store(tmp_path, monkeypatch):
+    from routes import thumbnails
+
+    cache = ThumbnailCache(tmp_path.as_uri())
+    cache.put("c" * 64, png(8, 8))
+    monkeypatch.setattr(thumbnails, "get_thumbnail_cache", lambda: cache)
+
+    app = Flask(__name__)
+    app.register_blueprint(thumbnails.thumbnails_bp)
+    client = app.test_client()
+
+    response = client.get(f"/thumbnails/{'c' * 64}.png")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert response.data == png(8, 8)
+
+    revalidated = client.get(f"/thumbnails/{'c' * 64}.png", headers={"If-None-Match": f'"{"c" * 64}"'})
+    assert revalidated.status_code == 304
+
+    assert client.get(f"/thumbnails/{'d' * 64}.png").status_code == 404
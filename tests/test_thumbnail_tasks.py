@@ -0,0 +1,64 @@
+import fakeredis
+import pytest
+
+from regen_queue import tasks
+from services import thumbnail_cache
+from services.thumbnail_cache import ThumbnailCache, filmstrip_key
+
+WKT = "POLYGON((36 -1, 36.01 -1, 36.01 -0.99, 36 -0.99, 36 -1))"
+ACQUISITIONS = {"2024-03-01", "2024-03-16"}
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Shared thumbnail store and Redis, with Earth Engine answering from ACQUISITIONS
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    renders = []
+
+    def render(wkt, dates):
+        renders.append(list(dates))
+        return b"\x89PNG" + ",".join(dates).encode()
+
+    monkeypatch.setattr(tasks, "get_redis", lambda: redis_client)
+    monkeypatch.setattr(thumbnail_cache, "_cache", ThumbnailCache(tmp_path.as_uri()))
+    monkeypatch.setattr(thumbnail_cache, "render_rgb_filmstrip", render)
+    monkeypatch.setattr(tasks, "available_acquisitions", lambda wkt, dates: [d for d in dates if d in ACQUISITIONS])
+
+    return redis_client, renders
+
+def test_repeated_request_with_a_dropped_date_is_a_cache_hit(store, monkeypatch):
+    redis_client, renders = store
+    dates = ["2024-03-01", "2024-03-06", "2024-03-16"]
+    enqueued = []
+    monkeypatch.setattr(tasks.render_rgb_filmstrip, "apply_async", lambda args, task_id: enqueued.append(task_id))
+
+    key, frame_dates, task_id = tasks.enqueue_rgb_filmstrip(WKT, dates)
+    assert key is None and frame_dates == dates and enqueued == [task_id]
+
+    # The worker drops the date without an acquisition
+    result = tasks.render_rgb_filmstrip.run(WKT, dates)
+    assert result == {"key": filmstrip_key(WKT, ["2024-03-01", "2024-03-16"]), "dates": ["2024-03-01", "2024-03-16"]}
+    assert redis_client.get(f"thumbnail-task:{filmstrip_key(WKT, dates)}") is None
+
+    assert tasks.enqueue_rgb_filmstrip(WKT, dates) == (result["key"], result["dates"], None)
+    assert enqueued == [task_id] and renders == [["2024-03-01", "2024-03-16"]]
+
+def test_alias_of_an_evicted_strip_renders_again(store, monkeypatch):
+    redis_client, _ = store
+    dates = ["2024-03-01", "2024-03-06"]
+    tasks.render_rgb_filmstrip.run(WKT, dates)
+    thumbnail_cache._cache.filesystem.delete_file(thumbnail_cache._cache.path(filmstrip_key(WKT, ["2024-03-01"])))
+    monkeypatch.setattr(tasks.render_rgb_filmstrip, "apply_async", lambda args, task_id: None)
+
+    key, frame_dates, task_id = tasks.enqueue_rgb_filmstrip(WKT, dates)
+
+    assert key is None and frame_dates == dates and task_id is not None
+
+def test_strip_without_dropped_dates_needs_no_alias(store):
+    redis_client, _ = store
+    dates = ["2024-03-01", "2024-03-16"]
+
+    result = tasks.render_rgb_filmstrip.run(WKT, dates)
+
+    assert result["key"] == filmstrip_key(WKT, dates)
+    assert redis_client.keys("filmstrip-alias:*") == []
+    assert tasks.enqueue_rgb_filmstrip(WKT, dates) == (result["key"], dates, None)
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from celery.concurrency import get_implementation
+
+from regen_queue import worker
+
+@pytest.mark.parametrize(
+    ("pool", "warmed"),
+    [("solo", True), ("threads", True), ("gevent", True), ("eventlet", True), ("prefork", False)]
+)
+def test_worker_init_warms_pools_that_run_tasks_in_process(pool, warmed):
+    # Celery hands `worker_init` the pool class, which prefork children warm up themselves
+    sender = SimpleNamespace(pool_cls=get_implementation(pool))
+
+    with mock.patch.object(worker, "warm_up_worker") as warm_up:
+        worker._on_worker_init(sender=sender)
+
+    assert warm_up.called is warmed
+
+def test_pool_given_by_name():
+    assert worker._pool_name("solo") == "solo"
+    assert worker._pool_name(get_implementation("solo")) == "celery.concurrency.solo.TaskPool"
+
+def test_prefork_children_warm_up_after_the_fork():
+    with mock.patch.object(worker, "warm_up_worker") as warm_up:
+        worker._on_worker_process_init()
+
+    warm_up.assert_called_once()
+
+def test_preprocessing_warm_up_runs_the_real_stack():
+    worker.warm_up_preprocessing()
+
+def test_warm_up_failures_are_logged_not_raised():
+    with mock.patch.object(worker, "initialize_ee", side_effect=RuntimeError("no credentials")), \
+            mock.patch.object(worker, "warm_up_preprocessing", side_effect=ValueError("bad schema")), \
+            mock.patch.object(worker.logger, "warning") as warning:
+        worker.warm_up_worker()
+
+    assert warning.call_count == 2